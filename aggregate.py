@@ -0,0 +1,186 @@
+"""
+Glimpsy - Server-Side Aggregation
+Group-by, metrics and time bucketing over a dataset DataFrame, returning only the aggregated series
+"""
+
+import re
+import pandas as pd
+from filters import date_format, parse_dates
+
+BASIC_OPS = {'sum', 'mean', 'count', 'min', 'max', 'median'}
+DECOMPOSABLE_OPS = {'sum', 'mean', 'count', 'min', 'max'}
+PERCENTILE_OP = re.compile(r'^p(\d{1,2}(?:\.\d+)?)$')
+
+TIME_BUCKETS = {
+    'day': 'D',
+    'week': 'W',
+    'month': 'M',
+    'quarter': 'Q',
+    'year': 'Y',
+}
+
+
+def parse_metrics(metrics, columns):
+    """Normalize metric specs to (column, op, output name) tuples
+
+    Accepts a list of {"column", "op", "as"} dicts or a {"column": ["op", ...]} mapping.
+    """
+    if isinstance(metrics, dict):
+        metrics = [{'column': col, 'op': op}
+                   for col, ops in metrics.items()
+                   for op in (ops if isinstance(ops, list) else [ops])]
+    if not metrics:
+        metrics = [{'op': 'count'}]
+
+    parsed = []
+    for metric in metrics:
+        if not isinstance(metric, dict):
+            raise ValueError('Each metric must be an object with "column" and "op"')
+        column = metric.get('column')
+        op = str(metric.get('op', '')).lower()
+        if op not in BASIC_OPS and not PERCENTILE_OP.match(op):
+            raise ValueError(f'Unknown metric op: {op}')
+        if column is None and op != 'count':
+            raise ValueError(f'Metric {op} needs a column')
+        if column is not None and column not in columns:
+            raise ValueError(f'Unknown metric column: {column}')
+        name = metric.get('as') or (f'{column}_{op}' if column is not None else op)
+        parsed.append((column, op, name))
+    return parsed
+
+
+def parse_time_bucket(time_bucket, columns):
+    """Validate a {"column", "interval"} time bucket spec"""
+    if not time_bucket:
+        return None
+    if not isinstance(time_bucket, dict):
+        raise ValueError('time_bucket must be an object with column and interval')
+    column = time_bucket.get('column')
+    interval = str(time_bucket.get('interval', 'day')).lower()
+    if column not in columns:
+        raise ValueError(f'Unknown time bucket column: {column}')
+    if interval not in TIME_BUCKETS:
+        raise ValueError(f"Time bucket interval must be one of: {', '.join(TIME_BUCKETS)}")
+    return column, interval
+
+
+def bucket_dates(series, interval, format=None):
+    """Floor dates to the start of their day/week/month/quarter/year, as ISO date strings"""
+    dates = parse_dates(series, format)
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_localize(None)
+    starts = dates.dt.to_period(TIME_BUCKETS[interval]).dt.start_time
+    return starts.dt.strftime('%Y-%m-%d')
+
+
+def metric_source(column, op):
+    """Name of the working column feeding a metric: raw values for count, numbers otherwise"""
+    return f"__{'raw' if op == 'count' else 'num'}__{column}"
+
+
+def metric_series(grouped, column, op):
+    """Compute one metric per group"""
+    if op == 'count':
+        return grouped.size() if column is None else grouped[column].count()
+    values = grouped[column]
+    match = PERCENTILE_OP.match(op)
+    if match:
+        return values.quantile(float(match.group(1)) / 100)
+    return getattr(values, op)()
+
+
+def working_frame(df, keys, bucket, metrics):
+    """Only the key and metric columns of df, with metrics coerced to numbers once"""
+    frame = pd.DataFrame(index=df.index)
+    if bucket:
+        bucket_column, interval, format = bucket
+        frame[bucket_column] = bucket_dates(df[bucket_column], interval, format)
+    for col in keys:
+        if col not in frame.columns:
+            frame[col] = df[col]
+    for column, op, _ in metrics:
+        source = metric_source(column, op)
+        if column is None or source in frame.columns:
+            continue
+        frame[source] = df[column] if op == 'count' else pd.to_numeric(df[column], errors='coerce')
+    return frame
+
+
+def group_frame(frame, keys):
+    if keys:
+        return frame.groupby(keys, dropna=False, sort=True)
+    return frame.groupby(lambda _: 0)
+
+
+def partial_aggregates(frame, keys, metrics):
+    """Per-group partial results of decomposable metrics, to be combined by merge_partials"""
+    grouped = group_frame(frame, keys)
+    partials = {}
+    for column, op, name in metrics:
+        source = None if column is None else metric_source(column, op)
+        if op == 'mean':
+            partials[f'{name}__sum'] = metric_series(grouped, source, 'sum')
+            partials[f'{name}__count'] = metric_series(grouped, source, 'count')
+        else:
+            partials[name] = metric_series(grouped, source, op)
+    return pd.DataFrame(partials)
+
+
+def merge_partials(partials, keys, metrics):
+    """Combine the partial results of each row partition into one row per group"""
+    combined = pd.concat(partials)
+    grouped = combined.groupby(level=list(range(combined.index.nlevels)), dropna=False, sort=True)
+    result = {}
+    for _, op, name in metrics:
+        if op == 'mean':
+            result[name] = grouped[f'{name}__sum'].sum() / grouped[f'{name}__count'].sum()
+        else:
+            # Counts add up; sums, minimums and maximums combine with themselves
+            result[name] = getattr(grouped[name], 'sum' if op == 'count' else op)()
+    result = pd.DataFrame(result)
+    if keys:
+        result.index.names = keys
+    return result
+
+
+def aggregate_frame(df, group_by=None, metrics=None, time_bucket=None, map_partitions=None):
+    """Aggregate df into one row per group; returns a DataFrame of keys and metrics
+
+    With map_partitions(fn, df) -> [fn(partition), ...], metrics that combine across partitions
+    (count, sum, mean, min, max) are computed per partition and merged; medians and
+    percentiles need every row of a group at once and are always computed in one pass.
+    """
+    columns = list(df.columns)
+    group_by = list(group_by or [])
+    unknown = [col for col in group_by if col not in columns]
+    if unknown:
+        raise ValueError(f"Unknown group_by columns: {', '.join(map(str, unknown))}")
+    metrics = parse_metrics(metrics, columns)
+    bucket = parse_time_bucket(time_bucket, columns)
+
+    keys = [bucket[0]] if bucket else []
+    keys += [col for col in group_by if col not in keys]
+
+    if bucket:
+        # Partitions parse the bucket column with the format of the whole column
+        bucket = (*bucket, date_format(df[bucket[0]]))
+
+    if map_partitions is not None and all(op in DECOMPOSABLE_OPS for _, op, _ in metrics):
+        partials = map_partitions(
+            lambda part: partial_aggregates(working_frame(part, keys, bucket, metrics), keys, metrics), df)
+        result = merge_partials(partials, keys, metrics)
+    else:
+        grouped = group_frame(working_frame(df, keys, bucket, metrics), keys)
+        result = pd.DataFrame({
+            name: metric_series(grouped, None if column is None else metric_source(column, op), op)
+            for column, op, name in metrics
+        })
+
+    if keys:
+        result = result.reset_index()
+    else:
+        result = result.reset_index(drop=True)
+        if len(result) == 0:
+            # Empty input still yields one row of totals
+            result = pd.DataFrame([{name: (0 if op in ('count', 'sum') else None) for _, op, name in metrics}])
+    return result
@@ -8,6 +8,33 @@ const API_BASE_URL = 'http://localhost:5000/api';
 class GlimpsyAPI {
     constructor() {
         this.baseURL = API_BASE_URL;
+        // Ask for column-oriented rows (no repeated keys) and expand them here
+        this.compactRows = true;
+    }
+
+    // { col: [values] } -> [{ col: value }]
+    static columnsToRecords(columns) {
+        const names = Object.keys(columns);
+        const length = names.length ? columns[names[0]].length : 0;
+        const records = new Array(length);
+        for (let i = 0; i < length; i++) {
+            const record = {};
+            for (const name of names) record[name] = columns[name][i];
+            records[i] = record;
+        }
+        return records;
+    }
+
+    // Request rows in the compact layout and return them as records, like the default layout
+    async requestRows(endpoint, options = {}) {
+        if (!this.compactRows) return this.request(endpoint, options);
+        const separator = endpoint.includes('?') ? '&' : '?';
+        const data = await this.request(`${endpoint}${separator}layout=columns`, options);
+        if (data.layout === 'columns') {
+            data.data = GlimpsyAPI.columnsToRecords(data.data);
+            delete data.layout;
+        }
+        return data;
     }
 
     async request(endpoint, options = {}) {
@@ -52,8 +79,20 @@ class GlimpsyAPI {
         return this.request('/datasets');
     }
 
-    async getDataset(datasetId) {
-        return this.request(`/datasets/${datasetId}`);
+    // params: { offset, limit, sort: 'col' | '-col', columns: [...] } - all optional
+    async getDataset(datasetId, params = {}) {
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== null) {
+                query.append(key, Array.isArray(value) ? value.join(',') : value);
+            }
+        });
+        const suffix = query.toString() ? `?${query}` : '';
+        return this.requestRows(`/datasets/${datasetId}${suffix}`);
+    }
+
+    async getDatasetProfile(datasetId) {
+        return this.request(`/datasets/${datasetId}/profile`);
     }
 
     async uploadDataset(file, name, description = '') {
@@ -76,6 +115,18 @@ class GlimpsyAPI {
                 throw new Error(data.error || `HTTP error! status: ${response.status}`);
             }
             
+            // Ingestion runs in the background; wait for the job to commit the dataset
+            if (response.status === 202) {
+                const job = await this.waitForJob(data.job_id);
+                const dataset = await this.getDataset(job.dataset_id, { limit: 0 });
+                return {
+                    id: dataset.id,
+                    name: dataset.name,
+                    row_count: dataset.row_count,
+                    columns: dataset.columns
+                };
+            }
+            
             return data;
         } catch (error) {
             console.error('Upload failed:', error);
@@ -83,21 +134,92 @@ class GlimpsyAPI {
         }
     }
 
+    // Ingestion jobs
+    // mode: 'append' (default) or 'upsert', which replaces rows matching keyColumns
+    async appendDataset(datasetId, file, mode = 'append', keyColumns = null) {
+        const formData = new FormData();
+        formData.append('file', file);
+        formData.append('mode', mode);
+        if (keyColumns) {
+            formData.append('key', Array.isArray(keyColumns) ? keyColumns.join(',') : keyColumns);
+        }
+        return this.request(`/datasets/${datasetId}/append`, {
+            method: 'POST',
+            body: formData
+        });
+    }
+
+    async getJob(jobId) {
+        return this.request(`/jobs/${jobId}`);
+    }
+
+    async waitForJob(jobId, onProgress = null, intervalMs = 500) {
+        while (true) {
+            const job = await this.getJob(jobId);
+            if (onProgress) onProgress(job);
+            if (job.status === 'completed') return job;
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Ingestion failed');
+            }
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+
     async deleteDataset(datasetId) {
         return this.request(`/datasets/${datasetId}`, {
             method: 'DELETE'
         });
     }
 
-    async filterDataset(datasetId, filters) {
-        return this.request(`/datasets/${datasetId}/filter`, {
+    async filterDataset(datasetId, filters, params = {}) {
+        return this.requestRows(`/datasets/${datasetId}/filter`, {
             method: 'POST',
-            body: { filters }
+            body: { filters, ...params }
         });
     }
 
-    async exportDataset(datasetId, filters = {}) {
-        const params = new URLSearchParams({ filters: JSON.stringify(filters) });
+    // Rows with a text value containing query; params: { offset, limit (default 100), sort, columns }
+    async searchDataset(datasetId, query, params = {}) {
+        const search = new URLSearchParams({ q: query });
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== null) {
+                search.append(key, Array.isArray(value) ? value.join(',') : value);
+            }
+        });
+        return this.requestRows(`/datasets/${datasetId}/search?${search}`);
+    }
+
+    // spec: { rate_column, principal_column, term_column, term_unit, group_by, filters,
+    //         scenarios: [{ name, bps, shocks: [{ column, values: { value: bps } } | { column, ranges: [{ min, max, bps }] }] }] }
+    async runScenarios(datasetId, spec) {
+        return this.request(`/datasets/${datasetId}/scenarios`, {
+            method: 'POST',
+            body: spec
+        });
+    }
+
+    // params: { x, y, width, method: 'lttb' | 'minmax', start, end, filters }
+    async getTimeSeries(datasetId, params = {}) {
+        const search = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== null) {
+                search.append(key, key === 'filters' ? JSON.stringify(value) : value);
+            }
+        });
+        return this.request(`/datasets/${datasetId}/series?${search}`);
+    }
+
+    // spec: { group_by: [...], metrics: [{ column, op }], time_bucket: { column, interval }, filters }
+    async aggregateDataset(datasetId, spec) {
+        return this.requestRows(`/datasets/${datasetId}/aggregate`, {
+            method: 'POST',
+            body: spec
+        });
+    }
+
+    // format: 'csv' (default), 'ndjson' or 'parquet'
+    async exportDataset(datasetId, filters = {}, format = 'csv') {
+        const params = new URLSearchParams({ filters: JSON.stringify(filters), format });
         const url = `${this.baseURL}/datasets/${datasetId}/export?${params}`;
         
         try {
@@ -110,7 +232,7 @@ class GlimpsyAPI {
             const downloadUrl = window.URL.createObjectURL(blob);
             const a = document.createElement('a');
             a.href = downloadUrl;
-            a.download = `dataset_${datasetId}_export.csv`;
+            a.download = `dataset_${datasetId}_export.${format}`;
             document.body.appendChild(a);
             a.click();
             document.body.removeChild(a);
@@ -122,6 +244,25 @@ class GlimpsyAPI {
     }
 
     // Portfolio comparison operations
+    async getIngestionRules() {
+        return this.request('/ingestion-rules');
+    }
+
+    // rule: { name, api_url, constraints: { interval_seconds, pagination, records_path, key, ... },
+    //         formatting_rules: { rename, columns, types, defaults, required }, is_active }
+    async createIngestionRule(rule) {
+        return this.request('/ingestion-rules', {
+            method: 'POST',
+            body: rule
+        });
+    }
+
+    async runIngestionRule(ruleId) {
+        return this.request(`/ingestion-rules/${ruleId}/run`, {
+            method: 'POST'
+        });
+    }
+
     async getPortfolioComparisons() {
         return this.request('/portfolio-comparisons');
     }
@@ -130,16 +271,27 @@ class GlimpsyAPI {
         return this.request(`/portfolio-comparisons/${comparisonId}`);
     }
 
-    async createPortfolioComparison(dataset1Id, dataset2Id, name) {
+    async createPortfolioComparison(dataset1Id, dataset2Id, name, keyColumn = null) {
         return this.request('/portfolio-comparisons', {
             method: 'POST',
             body: {
                 dataset1_id: dataset1Id,
                 dataset2_id: dataset2Id,
-                name: name
+                name: name,
+                key_column: keyColumn
             }
         });
     }
+
+    // params: { key, group_by, status: 'added' | 'removed' | 'changed' | 'unchanged', offset, limit }
+    async getPortfolioComparisonDiff(comparisonId, params = {}) {
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([key, value]) => {
+            if (value !== undefined && value !== null) query.append(key, value);
+        });
+        const suffix = query.toString() ? `?${query}` : '';
+        return this.request(`/portfolio-comparisons/${comparisonId}/diff${suffix}`);
+    }
 }
 
 // Export for use in other files
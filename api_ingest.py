@@ -0,0 +1,628 @@
+"""
+Glimpsy - Scheduled API Ingestion
+Runs the active api_ingestion_rules on their intervals: pages are fetched concurrently over pooled
+keep-alive connections, formatted page by page as they arrive and written to the rule's dataset in batches
+"""
+
+import sys
+import json
+import asyncio
+import threading
+import http.client
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qsl, urlencode, urlunsplit
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from append import UPSERT
+from jobs import JOB_RUNNING, JOB_COMPLETED, JOB_FAILED
+
+POLL_SECONDS = 30  # how often the scheduler looks for due rules
+DEFAULT_INTERVAL = 3600
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 2
+RETRY_DELAY = 1.0  # seconds, doubled after each failed attempt
+MAX_PAGES = 10000
+BATCH_ROWS = 50000  # formatted rows written to the dataset at once
+BUFFER_PAGES = 4  # pages per fetch slot that may wait for the writer before fetching stops
+HEARTBEAT_SECONDS = 30  # how often a running rule records that its run is alive
+CLAIM_TIMEOUT = 120  # seconds without a heartbeat after which a run is taken to have died
+PAGINATION_TYPES = ['page', 'offset']
+FORMAT_TYPES = ['string', 'int', 'float', 'bool', 'date', 'datetime']
+TRUE_VALUES = {'true', '1', 'yes', 'y', 't'}
+FALSE_VALUES = {'false', '0', 'no', 'n', 'f'}
+
+
+class FetchError(Exception):
+    """An API page that could not be fetched"""
+
+
+def create_rules_table(cursor):
+    """Create api_ingestion_rules, adding the run-state columns to tables from older versions"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS api_ingestion_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            api_url TEXT NOT NULL,
+            constraints TEXT,
+            formatting_rules TEXT,
+            is_active INTEGER DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    existing = {row[1] for row in cursor.execute('PRAGMA table_info(api_ingestion_rules)').fetchall()}
+    if 'dataset_id' not in existing:
+        cursor.execute('ALTER TABLE api_ingestion_rules ADD COLUMN dataset_id INTEGER '
+                       'REFERENCES datasets(id) ON DELETE SET NULL')
+    for col, definition in [('last_run_at', 'TIMESTAMP'), ('last_status', 'TEXT'), ('last_error', 'TEXT'),
+                            ('last_row_count', 'INTEGER'), ('heartbeat_at', 'TIMESTAMP')]:
+        if col not in existing:
+            cursor.execute(f'ALTER TABLE api_ingestion_rules ADD COLUMN {col} {definition}')
+
+
+def fail_interrupted_rules(cursor):
+    """Mark rules that were still running when the server stopped as failed, so they run again"""
+    cursor.execute('''
+        UPDATE api_ingestion_rules SET last_status = ?, last_error = 'Interrupted by server restart'
+        WHERE last_status = ?
+    ''', (JOB_FAILED, JOB_RUNNING))
+
+
+def load_json(value, name):
+    if value is None or value == '':
+        return {}
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError as e:
+            raise ValueError(f'{name} is not valid JSON: {e}') from e
+    if not isinstance(value, dict):
+        raise ValueError(f'{name} must be an object')
+    return value
+
+
+def positive_number(value, name, kind=float):
+    try:
+        number = kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if number <= 0:
+        raise ValueError(f'{name} must be positive')
+    return number
+
+
+def parse_pagination(spec):
+    """Page-number or offset pagination: {"type", "param", "start", "size_param", "size", "max_pages"}"""
+    if not spec:
+        return None
+    if not isinstance(spec, dict):
+        raise ValueError('pagination must be an object')
+    kind = spec.get('type', 'page')
+    if kind not in PAGINATION_TYPES:
+        raise ValueError(f"pagination type must be one of: {', '.join(PAGINATION_TYPES)}")
+    size = spec.get('size')
+    pagination = {
+        'type': kind,
+        'param': str(spec.get('param') or kind),
+        'start': int(spec.get('start', 1 if kind == 'page' else 0)),
+        'size_param': spec.get('size_param'),
+        'size': None if size is None else positive_number(size, 'pagination size', int),
+        'max_pages': positive_number(spec.get('max_pages', MAX_PAGES), 'max_pages', int)
+    }
+    if kind == 'offset' and pagination['size'] is None:
+        raise ValueError('Offset pagination needs a page size')
+    return pagination
+
+
+def parse_formatting(spec):
+    """Formatting rules: {"rename", "columns", "types", "defaults", "required"}"""
+    formatting = {
+        'rename': spec.get('rename') or {},
+        'columns': spec.get('columns') or None,
+        'types': spec.get('types') or {},
+        'defaults': spec.get('defaults') or {},
+        'required': spec.get('required') or []
+    }
+    for key in ('rename', 'types', 'defaults'):
+        if not isinstance(formatting[key], dict):
+            raise ValueError(f'formatting_rules.{key} must be an object')
+    for key in ('columns', 'required'):
+        if formatting[key] is not None and not isinstance(formatting[key], list):
+            raise ValueError(f'formatting_rules.{key} must be a list of column names')
+    for col, kind in formatting['types'].items():
+        if kind not in FORMAT_TYPES:
+            raise ValueError(f"Type of {col} must be one of: {', '.join(FORMAT_TYPES)}")
+    return formatting
+
+
+def parse_rule(rule):
+    """Validate an api_ingestion_rules row (or request body) into the settings of a run
+
+    constraints hold interval_seconds, pagination, records_path, concurrency, timeout, retries,
+    headers, mode and key; formatting_rules are applied to every page. Every run fetches the whole
+    API again, so rows are upserted by key: appending them would store them again on each run.
+    """
+    api_url = rule['api_url']
+    if not api_url or urlsplit(api_url).scheme not in ('http', 'https'):
+        raise ValueError('api_url must be an http or https URL')
+    constraints = load_json(rule['constraints'], 'constraints')
+    formatting = load_json(rule['formatting_rules'], 'formatting_rules')
+
+    mode = constraints.get('mode', UPSERT)
+    if mode != UPSERT:
+        raise ValueError('Rules must upsert: every run fetches all rows again, so appends would duplicate them')
+    key = constraints.get('key') or []
+    key = [key] if isinstance(key, str) else list(key)
+    if not key:
+        raise ValueError('Rules need key columns to upsert by (constraints.key)')
+    headers = constraints.get('headers') or {}
+    if not isinstance(headers, dict):
+        raise ValueError('headers must be an object')
+
+    return {
+        'id': rule.get('id'),
+        'name': rule['name'],
+        'api_url': api_url,
+        'dataset_id': rule.get('dataset_id'),
+        'interval': positive_number(constraints.get('interval_seconds', DEFAULT_INTERVAL), 'interval_seconds'),
+        'pagination': parse_pagination(constraints.get('pagination')),
+        'records_path': constraints.get('records_path'),
+        'concurrency': positive_number(constraints.get('concurrency', DEFAULT_CONCURRENCY), 'concurrency', int),
+        'timeout': positive_number(constraints.get('timeout', DEFAULT_TIMEOUT), 'timeout'),
+        'retries': max(0, int(constraints.get('retries', DEFAULT_RETRIES))),
+        'headers': {str(name): str(value) for name, value in headers.items()},
+        'mode': mode,
+        'key': key,
+        'formatting': parse_formatting(formatting)
+    }
+
+
+def rule_to_dict(rule):
+    """A rules row as returned by the API, with its JSON settings decoded"""
+    result = dict(rule)
+    for key in ('constraints', 'formatting_rules'):
+        try:
+            result[key] = json.loads(result[key]) if result[key] else {}
+        except ValueError:
+            pass
+    result['is_active'] = bool(result['is_active'])
+    return result
+
+
+def create_rule(conn, rule):
+    """Insert a validated rule and return its id"""
+    cursor = conn.execute('''
+        INSERT INTO api_ingestion_rules (name, api_url, constraints, formatting_rules, is_active)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (rule['name'], rule['api_url'], json.dumps(rule.get('constraints') or {}),
+          json.dumps(rule.get('formatting_rules') or {}), int(bool(rule.get('is_active', True)))))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def get_rule(conn, rule_id):
+    rule = conn.execute('SELECT * FROM api_ingestion_rules WHERE id = ?', (rule_id,)).fetchone()
+    return dict(rule) if rule else None
+
+
+def update_rule(conn, rule_id, **fields):
+    assignments = ', '.join(f'{key} = ?' for key in fields)
+    conn.execute(f'UPDATE api_ingestion_rules SET {assignments} WHERE id = ?', (*fields.values(), rule_id))
+    conn.commit()
+
+
+# Rules that are not running, or whose run stopped sending heartbeats: its process died
+CLAIMABLE = f"""
+    (last_status IS NULL OR last_status != ? OR heartbeat_at IS NULL
+     OR heartbeat_at < datetime('now', '-{CLAIM_TIMEOUT} seconds'))
+"""
+
+
+def claim_rule(conn, rule_id):
+    """Mark a rule running unless a live run has it, so no two runs of a rule overlap across processes
+
+    Returns the rule row, or None when it is missing or already running.
+    """
+    cursor = conn.execute(f'''
+        UPDATE api_ingestion_rules
+        SET last_status = ?, last_error = NULL, last_run_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND {CLAIMABLE}
+    ''', (JOB_RUNNING, rule_id, JOB_RUNNING))
+    conn.commit()
+    return get_rule(conn, rule_id) if cursor.rowcount else None
+
+
+def is_due(rule, now):
+    """Whether a rule's interval has passed since its last run started, or that run died"""
+    if not rule['last_run_at'] or rule['last_status'] == JOB_RUNNING:
+        return True
+    try:
+        interval = parse_rule(rule)['interval']
+    except (ValueError, TypeError):
+        interval = DEFAULT_INTERVAL  # let the run record why the rule is invalid
+    last_run = datetime.strptime(rule['last_run_at'], '%Y-%m-%d %H:%M:%S')
+    return (now - last_run).total_seconds() >= interval
+
+
+def page_url(api_url, params):
+    """api_url with the given query parameters set"""
+    parts = urlsplit(api_url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    query.update({name: str(value) for name, value in params.items()})
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def page_params(pagination, number):
+    """Query parameters of the number-th page (counting from 0)"""
+    if pagination is None:
+        return {}
+    step = pagination['size'] if pagination['type'] == 'offset' else 1
+    params = {pagination['param']: pagination['start'] + number * step}
+    if pagination['size_param'] and pagination['size'] is not None:
+        params[pagination['size_param']] = pagination['size']
+    return params
+
+
+def extract_records(payload, records_path):
+    """The list of records in a page, found by a dotted path into the JSON payload"""
+    for key in (records_path.split('.') if records_path else []):
+        if not isinstance(payload, dict) or key not in payload:
+            raise ValueError(f'records_path {records_path} not found in the response')
+        payload = payload[key]
+    if payload is None:
+        return []
+    if isinstance(payload, dict):
+        return [payload]
+    if not isinstance(payload, list):
+        raise ValueError('The response holds no list of records (set constraints.records_path)')
+    return payload
+
+
+def convert_column(series, kind):
+    """Convert a column to a formatting type, leaving values that don't convert missing"""
+    if kind == 'string':
+        return series.where(series.isna(), series.astype(str))
+    if kind == 'float':
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    if kind == 'int':
+        numbers = pd.to_numeric(series, errors='coerce')
+        return numbers.where(numbers % 1 == 0).astype('Int64')
+    if kind == 'bool':
+        text = series.astype(str).str.strip().str.lower()
+        flags = pd.Series(pd.NA, index=series.index, dtype='boolean')
+        flags[text.isin(TRUE_VALUES)] = True
+        flags[text.isin(FALSE_VALUES)] = False
+        return flags
+    # Dates are stored as ISO text, like dates read from an uploaded CSV
+    dates = pd.to_datetime(series, errors='coerce', format='mixed', utc=True)
+    text = dates.dt.strftime('%Y-%m-%d' if kind == 'date' else '%Y-%m-%d %H:%M:%S')
+    return text.where(dates.notna(), None)
+
+
+def format_records(records, formatting):
+    """Apply a rule's formatting to one page of records
+
+    Nested objects are flattened to dotted column names before renaming. Missing columns named by
+    columns, types or defaults are added, so every page of a rule yields the same columns.
+    """
+    df = pd.json_normalize(records) if records else pd.DataFrame()
+    df.columns = [str(col) for col in df.columns]
+    df = df.rename(columns=formatting['rename'])
+    if formatting['columns']:
+        df = df.reindex(columns=formatting['columns'])
+    for col in list(formatting['types']) + list(formatting['defaults']):
+        if col not in df.columns:
+            df[col] = None
+    for col, value in formatting['defaults'].items():
+        df[col] = df[col].where(df[col].notna(), value)
+    for col, kind in formatting['types'].items():
+        df[col] = convert_column(df[col], kind)
+    if formatting['required']:
+        missing = [col for col in formatting['required'] if col not in df.columns]
+        if missing and len(df):
+            raise ValueError(f"Required columns missing from the response: {', '.join(missing)}")
+        df = df.dropna(subset=[col for col in formatting['required'] if col in df.columns])
+    return df.reset_index(drop=True)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections per host, each used by one request at a time
+
+    Requests block, so they run on the fetch threads of a run; at most one connection per
+    thread is open to each host.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, scheme, host):
+        with self.lock:
+            connections = self.idle.get((scheme, host))
+            if connections:
+                return connections.pop()
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, timeout=self.timeout)
+
+    def release(self, scheme, host, connection):
+        with self.lock:
+            self.idle.setdefault((scheme, host), []).append(connection)
+
+    def get_json(self, url, headers):
+        """(status, decoded JSON body or None) of a GET request"""
+        parts = urlsplit(url)
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        connection = self.acquire(parts.scheme, parts.netloc)
+        try:
+            connection.request('GET', path, headers={'Accept': 'application/json', **headers})
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            # Includes keep-alive connections the server closed while idle
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self.release(parts.scheme, parts.netloc, connection)
+        if response.status >= 400:
+            return response.status, None
+        try:
+            return response.status, json.loads(body) if body else None
+        except ValueError as e:
+            raise ValueError(f'{url} did not return JSON: {e}') from e
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle = {}
+
+
+class IngestionRun:
+    """One run of a rule: concurrent page fetches feeding a single formatting and writing task
+
+    Pages are fetched in order of page number by rule concurrency tasks and written in that
+    order. A fetch task needs a slot before it fetches a page and the slot is only freed once the
+    page has been formatted, so fetching pauses while the writer catches up.
+    """
+
+    def __init__(self, rule, write_batch, batch_rows=BATCH_ROWS):
+        self.rule = rule
+        self.write_batch = write_batch  # (rule, frame) -> dataset id, called on a worker thread
+        self.batch_rows = batch_rows
+        self.pool = ConnectionPool(rule['timeout'])
+        self.executor = ThreadPoolExecutor(max_workers=rule['concurrency'], thread_name_prefix='glimpsy-api')
+        self.slots = None
+        self.pages = None
+        self.next_page = 0
+        self.last_page = None  # number of the last page, once a short or empty page is seen
+        self.stats = {'pages': 0, 'rows': 0, 'batches': 0}
+
+    def page_limit(self):
+        pagination = self.rule['pagination']
+        limit = pagination['max_pages'] if pagination else 1
+        return limit if self.last_page is None else min(limit, self.last_page + 1)
+
+    async def fetch(self, url):
+        """Records of one page, retrying connection errors and 429/5xx responses"""
+        loop = asyncio.get_running_loop()
+        error = None
+        for attempt in range(self.rule['retries'] + 1):
+            if attempt:
+                await asyncio.sleep(RETRY_DELAY * 2 ** (attempt - 1))
+            try:
+                status, payload = await loop.run_in_executor(
+                    self.executor, self.pool.get_json, url, self.rule['headers'])
+            except (OSError, http.client.HTTPException) as e:
+                error = f'{url}: {e}'
+                continue
+            if status < 400:
+                return extract_records(payload, self.rule['records_path'])
+            error = f'{url} returned HTTP {status}'
+            if status != 429 and status < 500:
+                break
+        raise FetchError(error)
+
+    async def fetch_pages(self):
+        pagination = self.rule['pagination']
+        while True:
+            await self.slots.acquire()
+            number = self.next_page
+            if number >= self.page_limit():
+                self.slots.release()
+                return
+            self.next_page += 1
+            records = await self.fetch(page_url(self.rule['api_url'], page_params(pagination, number)))
+            size = pagination['size'] if pagination else None
+            if pagination is None or not records or (size is not None and len(records) < size):
+                self.last_page = number if self.last_page is None else min(self.last_page, number)
+            await self.pages.put((number, records))
+
+    async def write_pages(self):
+        """Format pages in page order as they arrive and write them every batch_rows rows"""
+        loop = asyncio.get_running_loop()
+        waiting = {}
+        expected = 0
+        batch, batch_rows = [], 0
+        while True:
+            item = await self.pages.get()
+            if item is None:
+                break
+            waiting[item[0]] = item[1]
+            while expected in waiting and expected < self.page_limit():
+                records = waiting.pop(expected)
+                expected += 1
+                frame = await loop.run_in_executor(None, format_records, records, self.rule['formatting'])
+                self.slots.release()
+                self.stats['pages'] += 1
+                if len(frame):
+                    batch.append(frame)
+                    batch_rows += len(frame)
+                if batch_rows >= self.batch_rows:
+                    await self.flush(batch)
+                    batch, batch_rows = [], 0
+        # Pages fetched past the last page are dropped
+        await self.flush(batch)
+
+    async def flush(self, batch):
+        if not batch:
+            return
+        frame = pd.concat(batch, ignore_index=True)
+        self.rule['dataset_id'] = await asyncio.to_thread(self.write_batch, self.rule, frame)
+        self.stats['rows'] += len(frame)
+        self.stats['batches'] += 1
+
+    async def run(self):
+        """Fetch, format and write every page; returns page, row and batch counts"""
+        concurrency = self.rule['concurrency']
+        self.slots = asyncio.Semaphore(concurrency * BUFFER_PAGES)
+        self.pages = asyncio.Queue()
+        writer = asyncio.ensure_future(self.write_pages())
+        fetchers = asyncio.gather(*[self.fetch_pages() for _ in range(concurrency)])
+        try:
+            # The writer only returns after the end marker, so finishing first means a failed write,
+            # which would leave the fetchers waiting for slots
+            await asyncio.wait([fetchers, writer], return_when=asyncio.FIRST_COMPLETED)
+            if writer.done():
+                writer.result()
+            fetchers.result()
+            await self.pages.put(None)
+            await writer
+        finally:
+            fetchers.cancel()
+            writer.cancel()
+            await asyncio.gather(fetchers, writer, return_exceptions=True)
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.pool.close()
+        return dict(self.stats)
+
+
+async def run_rule(connect, rule_id, write_batch, batch_rows=BATCH_ROWS):
+    """Claim a rule, run it and record the outcome on its row
+
+    connect returns a database connection. Returns the run's counts, or None when the rule is
+    missing or already running.
+    """
+    def claim():
+        conn = connect()
+        try:
+            return claim_rule(conn, rule_id)
+        finally:
+            conn.close()
+
+    def record(**fields):
+        conn = connect()
+        try:
+            update_rule(conn, rule_id, **fields)
+        finally:
+            conn.close()
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+            try:
+                await asyncio.to_thread(record, heartbeat_at=datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+            except Exception as e:
+                print(f'API ingestion rule {rule_id}: heartbeat failed: {e}', file=sys.stderr)
+
+    row = await asyncio.to_thread(claim)
+    if row is None:
+        return None
+    beating = asyncio.ensure_future(heartbeat())
+    try:
+        return await run_claimed(row, write_batch, batch_rows, record)
+    finally:
+        beating.cancel()
+
+
+async def run_claimed(row, write_batch, batch_rows, record):
+    """Run a claimed rule and record its outcome with record(**fields)"""
+    dataset_id = row['dataset_id']
+    try:
+        rule = parse_rule(row)
+        run = IngestionRun(rule, write_batch, batch_rows)
+        try:
+            stats = await run.run()
+        finally:
+            dataset_id = rule['dataset_id']
+    except Exception as e:
+        await asyncio.to_thread(record, last_status=JOB_FAILED, last_error=str(e), dataset_id=dataset_id)
+        return {'status': JOB_FAILED, 'error': str(e), 'dataset_id': dataset_id}
+    await asyncio.to_thread(record, last_status=JOB_COMPLETED, last_row_count=stats['rows'], dataset_id=dataset_id)
+    return {'status': JOB_COMPLETED, 'dataset_id': dataset_id, **stats}
+
+
+def run_rule_now(connect, rule_id, write_batch):
+    """run_rule from a thread without an event loop, for runs started through the API"""
+    return asyncio.run(run_rule(connect, rule_id, write_batch))
+
+
+class IngestionScheduler:
+    """Starts each due active rule on an asyncio event loop, checking every poll_seconds
+
+    start() runs the loop on a daemon thread of the server process; run_forever() runs it in the
+    calling thread, for a process that only schedules.
+    """
+
+    def __init__(self, connect, write_batch, poll_seconds=POLL_SECONDS):
+        self.connect = connect
+        self.write_batch = write_batch
+        self.poll_seconds = poll_seconds
+        self.thread = None
+        self.loop = None
+        self.stopping = None
+        self.stop_requested = False
+        self.tasks = set()
+
+    def due_rules(self):
+        conn = self.connect()
+        try:
+            rules = conn.execute(f'''
+                SELECT * FROM api_ingestion_rules WHERE is_active = 1 AND {CLAIMABLE}
+            ''', (JOB_RUNNING,)).fetchall()
+        finally:
+            conn.close()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)  # CURRENT_TIMESTAMP is UTC
+        return [rule['id'] for rule in rules if is_due(dict(rule), now)]
+
+    async def tick(self):
+        for rule_id in await asyncio.to_thread(self.due_rules):
+            task = asyncio.ensure_future(run_rule(self.connect, rule_id, self.write_batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        if self.stop_requested:
+            self.stopping.set()
+        while not self.stopping.is_set():
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f'API ingestion scheduler: {e}', file=sys.stderr)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+        if self.tasks:
+            await asyncio.wait(self.tasks)
+
+    def run_forever(self):
+        asyncio.run(self.serve())
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run_forever, name='glimpsy-api-ingest', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop scheduling and wait for running rules to finish; safe to call from a signal handler"""
+        self.stop_requested = True
+        if self.loop is not None and self.stopping is not None:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
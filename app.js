@@ -201,6 +201,7 @@ class GlimpsyApp {
             this.currentData = dataset.data;
             this.filteredData = [...dataset.data];
             this.columns = dataset.columns;
+            this.appliedFilters = {};
 
             // Show filter section
             const filterSection = document.getElementById('filterSection');
@@ -531,6 +532,7 @@ class GlimpsyApp {
         try {
             const result = await api.filterDataset(this.currentDataset.id, filters);
             this.filteredData = result.data;
+            this.appliedFilters = filters;
             this.updateVisualization();
             this.updateSummaryStats();
             this.updateDataTable();
@@ -604,6 +606,7 @@ class GlimpsyApp {
         });
 
         this.filteredData = [...this.currentData];
+        this.appliedFilters = {};
         this.updateVisualization();
         this.updateSummaryStats();
         this.updateDataTable();
@@ -611,6 +614,7 @@ class GlimpsyApp {
     }
 
     updateVisualization() {
+        this.seriesRequest = null;
         if (!this.filteredData || this.filteredData.length === 0) {
             const chartArea = document.getElementById('chartArea');
             if (chartArea) {
@@ -644,16 +648,53 @@ class GlimpsyApp {
         const chartArea = document.getElementById('chartArea');
         if (!chartArea) return;
 
-        const xData = this.filteredData.map(row => row[xAxis]);
-        const yData = this.filteredData.map(row => parseFloat(row[yAxis]) || 0);
-
-        let trace;
         let layout = {
             title: `${xAxis} vs ${yAxis}`,
             height: 500,
             margin: { l: 50, r: 50, t: 50, b: 50 }
         };
 
+        // Line and scatter charts over a date column are downsampled by the server
+        if ((chartType === 'line' || chartType === 'scatter') && this.currentDataset &&
+            this.detectColumnTypes().date.includes(xAxis)) {
+            this.plotTimeSeries(chartArea, chartType, xAxis, yAxis, layout);
+            return;
+        }
+
+        this.plotRows(chartArea, chartType, xAxis, yAxis, layout);
+    }
+
+    async plotTimeSeries(chartArea, chartType, xAxis, yAxis, layout) {
+        const request = this.seriesRequest = {};
+        try {
+            const series = await api.getTimeSeries(this.currentDataset.id, {
+                x: xAxis,
+                y: yAxis,
+                width: Math.max(chartArea.clientWidth || 0, 100),
+                method: chartType === 'scatter' ? 'minmax' : 'lttb',
+                filters: this.appliedFilters || {}
+            });
+            // A newer chart was requested while this one loaded
+            if (request !== this.seriesRequest) return;
+            const trace = {
+                x: series.data.x,
+                y: series.data.y,
+                type: 'scatter',
+                mode: chartType === 'scatter' ? 'markers' : 'lines'
+            };
+            Plotly.newPlot(chartArea, [trace], layout);
+        } catch (error) {
+            if (request !== this.seriesRequest) return;
+            console.warn('Downsampled series failed, plotting loaded rows:', error);
+            this.plotRows(chartArea, chartType, xAxis, yAxis, layout);
+        }
+    }
+
+    plotRows(chartArea, chartType, xAxis, yAxis, layout) {
+        const xData = this.filteredData.map(row => row[xAxis]);
+        const yData = this.filteredData.map(row => parseFloat(row[yAxis]) || 0);
+
+        let trace;
         switch (chartType) {
             case 'line':
                 trace = { x: xData, y: yData, type: 'scatter', mode: 'lines+markers' };
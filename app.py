@@ -3,16 +3,58 @@ Glimpsy - Full-Stack Data Exploration Application
 Backend: Flask with SQLite
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import sqlite3
-import pandas as pd
 import json
 import os
-import io
 from datetime import datetime
 from werkzeug.utils import secure_filename
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from db import WAL_PRAGMA, connect, get_connection, create_indexes, delete_orphans
+from storage import (
+    ROW_GROUP_ROWS, DatasetLayout,
+    read_frame, iter_frames, read_schema, delete_frame, frame_to_records, frame_to_columns,
+    dataset_lock, staging_path, commit_staged, commit_part, discard_staged, read_rows, part_paths, compact_frame,
+    write_deleted, read_profiler, write_profiler, layout_signature, read_indexes, write_indexes,
+    read_rollups, write_rollups,
+    migrate_json_datasets
+)
+from ingest import ingest_file, arrow_schema
+from append import APPEND, UPSERT, APPEND_MODES, read_delta, align_delta, dedupe_delta, replaced_rows
+from filters import filter_mask, settle_date_formats
+from indexes import build_indexes, indexed_filter_mask, add_zone_maps
+from shared import load_shared_frame, refresh_shared
+from parallel import PartitionPool
+from search import normalize_query, search_rows
+from query import Query
+from downsample import (
+    build_rollups, rollup_key, rollup_points, index_range, numeric_values, series_values, downsample,
+    parse_series_params, format_times
+)
+from scenario import Portfolio, parse_model, parse_scenarios, scenario_columns, scenario_key, with_deltas
+from column_profile import DatasetProfiler, profile_frame
+from comparison import compare_frames, diff_details, DETAIL_STATUSES
+from aggregate import aggregate_frame
+from export import EXPORT_FORMATS
+from cache import DatasetCache, normalize_filters
+from encoding import (
+    LAYOUT_ARROW, LAYOUT_COLUMNS, ARROW_MIMETYPE, FastJSONProvider,
+    negotiate_layout, frame_to_arrow, compress_response
+)
+from instrumentation import init_instrumentation, phase, timed, gauge, render_metrics
+from jobs import (
+    JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED,
+    create_jobs_table, fail_interrupted_jobs, create_job, update_job, get_job
+)
+from api_ingest import (
+    POLL_SECONDS, IngestionScheduler, create_rules_table, fail_interrupted_rules, parse_rule, rule_to_dict,
+    create_rule, get_rule, run_rule_now
+)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -22,13 +64,62 @@ CORS(app)
 UPLOAD_FOLDER = 'uploads'
 DATABASE = 'glimpsy.db'
 ALLOWED_EXTENSIONS = {'csv', 'parquet'}
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_FILE_SIZE = int(os.environ.get('GLIMPSY_MAX_FILE_MB', 5 * 1024)) * 1024 * 1024  # 5GB
+INGEST_MEMORY_BUDGET = int(os.environ.get('GLIMPSY_INGEST_MEMORY_MB', 64)) * 1024 * 1024  # per-chunk budget
+INGEST_WORKERS = int(os.environ.get('GLIMPSY_INGEST_WORKERS', 2))
+DATASET_CACHE_BUDGET = int(os.environ.get('GLIMPSY_CACHE_MB', 512)) * 1024 * 1024
+EXPORT_BATCH_ROWS = 50000
+SEARCH_PAGE_ROWS = 100  # search hits returned when no limit is given
+BUILD_INDEXES = os.environ.get('GLIMPSY_INDEXES', 'true').lower() in ('1', 'true', 'yes')
+SHARED_FRAMES = os.environ.get('GLIMPSY_SHARED_FRAMES', '').lower() in ('1', 'true', 'yes')
+QUERY_WORKERS = int(os.environ.get('GLIMPSY_QUERY_WORKERS', os.cpu_count() or 1))
+PARTITION_ROWS = int(os.environ.get('GLIMPSY_PARTITION_ROWS', 250000))  # smallest partition worth a thread
+API_INGEST = os.environ.get('GLIMPSY_API_INGEST', 'true').lower() in ('1', 'true', 'yes')
+API_POLL_SECONDS = float(os.environ.get('GLIMPSY_API_POLL_SECONDS', POLL_SECONDS))
+APPEND_COMPACT_PARTS = 32  # appended part files a dataset may have before it is rewritten as one
+SERVER_TIMING = os.environ.get('GLIMPSY_SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+PROFILE_SLOW_MS = os.environ.get('GLIMPSY_PROFILE_SLOW_MS')  # unset disables profiling
+PROFILE_SAMPLE_RATE = float(os.environ.get('GLIMPSY_PROFILE_SAMPLE_RATE', 1.0))
+PROFILE_FOLDER = 'profiles'
 
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
+app.config['INGEST_MEMORY_BUDGET'] = INGEST_MEMORY_BUDGET
+app.config['BUILD_INDEXES'] = BUILD_INDEXES
+app.config['QUERY_WORKERS'] = QUERY_WORKERS
+app.config['PARTITION_ROWS'] = PARTITION_ROWS
+app.config['API_INGEST'] = API_INGEST
+app.config['API_POLL_SECONDS'] = API_POLL_SECONDS
+app.config['SHARED_FRAMES'] = SHARED_FRAMES  # serve.py turns this on for its worker processes
+app.config['SERVER_TIMING'] = SERVER_TIMING
+app.config['PROFILE_SLOW_MS'] = float(PROFILE_SLOW_MS) if PROFILE_SLOW_MS else None
+app.config['PROFILE_SAMPLE_RATE'] = PROFILE_SAMPLE_RATE
+app.config['PROFILE_DIR'] = PROFILE_FOLDER
+
+# Faster JSON encoding; instrumentation wraps it to time serialization
+app.json = FastJSONProvider(app)
+
+# Phase timings, /metrics histograms and optional Server-Timing headers and profiles
+init_instrumentation(app)
+
+
+# Registered after the instrumentation hooks so it runs before them and is counted in the total
+@app.after_request
+def compress(response):
+    with phase('compress'):
+        return compress_response(response)
+
+# Background ingestion runs here so uploads don't hold a request worker
+ingest_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix='glimpsy-ingest')
+
+# Filters and aggregations over large frames are split into row partitions run here
+query_pool = PartitionPool(app.config['QUERY_WORKERS'], app.config['PARTITION_ROWS'])
+
+# Parsed datasets and filter results shared across requests
+dataset_cache = DatasetCache(DATASET_CACHE_BUDGET)
 
 
 def allowed_file(filename):
@@ -37,15 +128,17 @@ def allowed_file(filename):
 
 
 def get_db_connection():
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get a pooled database connection with row factory
+
+    Callers still call close(), which returns the connection to the pool.
+    """
+    return get_connection(DATABASE)
 
 
 def init_db():
     """Initialize database tables"""
-    conn = sqlite3.connect(DATABASE)
+    conn = connect(DATABASE)
+    conn.execute(WAL_PRAGMA)
     cursor = conn.cursor()
     
     # Datasets table
@@ -59,6 +152,10 @@ def init_db():
             file_type TEXT NOT NULL,
             columns TEXT NOT NULL,
             row_count INTEGER DEFAULT 0,
+            storage_format TEXT DEFAULT 'parquet',
+            column_types TEXT,
+            column_profile TEXT,
+            revision INTEGER DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
@@ -81,107 +178,569 @@ def init_db():
             name TEXT NOT NULL,
             dataset1_id INTEGER NOT NULL,
             dataset2_id INTEGER NOT NULL,
+            key_column TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (dataset1_id) REFERENCES datasets(id) ON DELETE CASCADE,
             FOREIGN KEY (dataset2_id) REFERENCES datasets(id) ON DELETE CASCADE
         )
     ''')
     
-    # API ingestion rules (for future use)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS api_ingestion_rules (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            api_url TEXT NOT NULL,
-            constraints TEXT,
-            formatting_rules TEXT,
-            is_active INTEGER DEFAULT 1,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    # API ingestion rules, run on a schedule by api_ingest
+    create_rules_table(cursor)
+    fail_interrupted_rules(cursor)
+    
+    # Background ingestion jobs
+    create_jobs_table(cursor)
+    fail_interrupted_jobs(cursor)
+    
+    # Datasets created before columnar storage keep their rows in dataset_records
+    existing = {row[1] for row in cursor.execute('PRAGMA table_info(datasets)').fetchall()}
+    if 'storage_format' not in existing:
+        cursor.execute("ALTER TABLE datasets ADD COLUMN storage_format TEXT DEFAULT 'json'")
+    if 'column_types' not in existing:
+        cursor.execute('ALTER TABLE datasets ADD COLUMN column_types TEXT')
+    if 'column_profile' not in existing:
+        cursor.execute('ALTER TABLE datasets ADD COLUMN column_profile TEXT')
+    if 'revision' not in existing:
+        cursor.execute('ALTER TABLE datasets ADD COLUMN revision INTEGER DEFAULT 0')
+    comparison_columns = {row[1] for row in cursor.execute('PRAGMA table_info(portfolio_comparisons)').fetchall()}
+    if 'key_column' not in comparison_columns:
+        cursor.execute('ALTER TABLE portfolio_comparisons ADD COLUMN key_column TEXT')
+    
+    # Indexes, and cleanup of rows orphaned before foreign keys were enforced
+    create_indexes(cursor)
+    delete_orphans(cursor)
+    
+    conn.commit()
+    
+    migrated = migrate_json_datasets(conn)
+    if migrated:
+        print(f"Migrated {migrated} dataset(s) to columnar storage")
+    
+    conn.release()
+
+
+@timed('load')
+def load_dataset_frame(dataset, columns=None):
+    """Load a dataset's rows as a typed DataFrame, from the cache when possible
+
+    The returned frame may be shared with other requests and must not be modified.
+    """
+    dataset_cache.sync(dataset['id'], dataset['revision'])
+    df = dataset_cache.get_frame(dataset['id'])
+    if df is not None:
+        return df[columns] if columns else df
+    
+    if app.config['SHARED_FRAMES']:
+        # Mapping the whole dataset costs no more than mapping a few columns
+        df = load_shared_frame(dataset['id'], layout_signature(dataset['id']))
+        dataset_cache.put_frame(dataset['id'], df)
+        return df[columns] if columns else df
+    
+    # Projected reads go straight to storage; only full frames are cached
+    if columns:
+        return read_frame(dataset['id'], columns=columns)
+    
+    df = read_frame(dataset['id'])
+    dataset_cache.put_frame(dataset['id'], df)
+    return df
+
+
+def index_dataset(dataset_id):
+    """Build and save the column indexes and time-series rollups of a dataset's current rows,
+    one column at a time
+
+    Returns None, saving nothing, if the rows changed during the build: the rebuild scheduled
+    by that change replaces them.
+    """
+    signature = layout_signature(dataset_id)
+    layout = DatasetLayout(dataset_id)
+    columns = read_schema(dataset_id).names
+    read_column = lambda col: read_frame(dataset_id, columns=[col])[col]
+    indexes = build_indexes(read_column, columns)
+    if indexes['row_count'] == layout.row_count:
+        # Date ranges per row group, so queries can skip groups without reading them
+        add_zone_maps(indexes, layout.group_starts, layout.group_rows)
+    # Charts of a numeric column over a date column draw from these without reading rows
+    rollups = build_rollups(indexes, read_column)
+
+    if layout_signature(dataset_id) != signature:
+        return None
+    indexes['signature'] = rollups['signature'] = signature
+    write_indexes(dataset_id, indexes, signature)
+    write_rollups(dataset_id, rollups, signature)
+    dataset_cache.put(('indexes', dataset_id), indexes)
+    dataset_cache.put(('rollups', dataset_id), rollups)
+    return indexes
+
+
+def dataset_indexes(dataset_id):
+    """A dataset's column indexes, or None while they are missing or out of date"""
+    signature = layout_signature(dataset_id)
+    indexes = dataset_cache.get(('indexes', dataset_id))
+    if indexes is None or indexes['signature'] != signature:
+        indexes = read_indexes(dataset_id, signature)
+        if indexes is not None:
+            dataset_cache.put(('indexes', dataset_id), indexes)
+    return indexes
+
+
+def dataset_rollups(dataset_id):
+    """A dataset's time-series rollups, or None while they are missing or out of date"""
+    signature = layout_signature(dataset_id)
+    rollups = dataset_cache.get(('rollups', dataset_id))
+    if rollups is None or rollups['signature'] != signature:
+        rollups = read_rollups(dataset_id, signature)
+        if rollups is not None:
+            dataset_cache.put(('rollups', dataset_id), rollups)
+    return rollups
+
+
+def schedule_index_build(dataset_id):
+    """Rebuild a dataset's indexes in the background after its rows changed"""
+    if app.config['BUILD_INDEXES']:
+        ingest_executor.submit(index_dataset, dataset_id)
+
+
+def resident_frame(dataset):
+    """A dataset's full frame if it is already in memory, or None to query storage for just what is needed
+
+    Memory-mapped frames in shared mode count as resident: mapping reads nothing up front.
+    """
+    if app.config['SHARED_FRAMES']:
+        return load_dataset_frame(dataset)
+    dataset_cache.sync(dataset['id'], dataset['revision'])
+    return dataset_cache.get_frame(dataset['id'])
+
+
+def dataset_query(dataset):
+    """A query over a dataset's stored rows that shares the indexes, filter masks and scan pool"""
+    return Query(dataset['id'], json.loads(dataset['columns']), indexes=dataset_indexes(dataset['id']),
+                 masks=dataset_cache, scan=query_pool.filter_mask)
+
+
+def explain_requested(source):
+    return str(source.get('explain', '')).lower() in ('1', 'true', 'yes')
+
+
+def filter_dataset_mask(dataset, df, filters, columns):
+    """Mask of the rows of a dataset frame matching filters, cached per equivalent filter spec"""
+    filter_key = normalize_filters(filters, columns)
+    mask = dataset_cache.get_mask(dataset['id'], filter_key)
+    if mask is None or len(mask) != len(df):
+        mask = indexed_filter_mask(dataset_indexes(dataset['id']), df, filters, columns, scan=query_pool.filter_mask)
+        dataset_cache.put_mask(dataset['id'], filter_key, mask)
+    return mask
+
+
+@timed('filter')
+def filter_dataset_frame(dataset, df, filters, columns):
+    """Apply filters to a dataset frame, reusing the cached mask of an equivalent filter spec"""
+    if normalize_filters(filters, columns) == '{}':
+        return df
+    return df[filter_dataset_mask(dataset, df, filters, columns)].reset_index(drop=True)
+
+
+@timed('search')
+def search_dataset_frame(dataset, df, query, columns):
+    """Rows of a dataset frame with a value containing query, reusing cached hits"""
+    key = ('search', dataset['id'], query)
+    rows = dataset_cache.get(key)
+    if rows is None:
+        rows = search_rows(dataset_indexes(dataset['id']), df, query, columns)
+        dataset_cache.put(key, rows)
+    return df.iloc[rows].reset_index(drop=True)
+
+
+@timed('downsample')
+def downsample_series(dataset, params, filters, columns):
+    """(times, values, source) of a series downsampled to the requested width, cached per request
+
+    Without filters the points come from the dataset's rollups, whose size doesn't depend on
+    the row count. Filtered series, zooms finer than the rollups and datasets whose rollups
+    are still being rebuilt take the rows in range from the x column's index and read their
+    y values, or read both columns of the matching rows when the index is missing.
+    """
+    dataset_cache.sync(dataset['id'], dataset['revision'])
+    filter_key = normalize_filters(filters, columns)
+    key = ('series', dataset['id'], filter_key, json.dumps(params, sort_keys=True))
+    cached = dataset_cache.get(key)
+    if cached is not None:
+        return cached['times'], cached['values'], cached['source']
+    
+    points = None
+    rollups = dataset_rollups(dataset['id']) if filter_key == '{}' else None
+    rollup = rollups['columns'].get(rollup_key(params['x'], params['y'])) if rollups else None
+    if rollup is not None:
+        points = rollup_points(rollup, params['start'], params['end'], params['width'])
+        source = 'rollup'
+    if points is None:
+        indexes = dataset_indexes(dataset['id'])
+        index = indexes['columns'].get(params['x']) if indexes else None
+        df = resident_frame(dataset)
+        if index is not None and index.get('date'):
+            # The index holds the parsed dates in order: only the y values of rows in range are read
+            times, rows = index_range(index, params['start'], params['end'])
+            if filter_key != '{}':
+                if df is not None:
+                    mask = filter_dataset_mask(dataset, df, filters, columns)
+                else:
+                    with phase('query'):
+                        mask = np.zeros(indexes['row_count'], dtype=bool)
+                        mask[dataset_query(dataset).where(filters).matching_positions()] = True
+                times, rows = times[mask[rows]], rows[mask[rows]]
+            with phase('query'):
+                if df is not None:
+                    column = df[params['y']].iloc[rows]
+                else:
+                    column = DatasetLayout(dataset['id']).read(rows, [params['y']])[params['y']]
+            values = numeric_values(column)
+            valid = ~np.isnan(values)
+            times, values = times[valid], values[valid]
+        else:
+            if df is not None:
+                frame = filter_dataset_frame(dataset, df, filters, columns)
+            else:
+                with phase('query'):
+                    frame = dataset_query(dataset).where(filters).frame([params['x'], params['y']])
+            times, values = series_values(frame, params['x'], params['y'])
+            first = 0 if params['start'] is None else np.searchsorted(times, params['start'], side='left')
+            stop = len(times) if params['end'] is None else np.searchsorted(times, params['end'], side='right')
+            times, values = times[first:stop], values[first:stop]
+        points = times, values
+        source = 'rows'
+    
+    times, values = points
+    lo = params['start'] if params['start'] is not None else (times[0] if len(times) else 0)
+    hi = params['end'] if params['end'] is not None else (times[-1] if len(times) else 0)
+    keep = downsample(times, values, lo, hi, params['width'], params['method'])
+    times, values = times[keep], values[keep]
+    dataset_cache.put(key, {'times': times, 'values': values, 'source': source})
+    return times, values, source
+
+
+@timed('scenario')
+def run_scenarios(dataset, df, filter_key, model, scenarios):
+    """Evaluate each scenario over a filtered frame, reusing cached results of identical scenarios
+
+    Results carry their change from the unshocked portfolio, which is cached like any scenario.
+    """
+    model_key = json.dumps(model, sort_keys=True)
+    portfolio = None
+    
+    def evaluate(scenario):
+        nonlocal portfolio
+        key = ('scenario', dataset['id'], filter_key, model_key, scenario_key(scenario))
+        result = dataset_cache.get(key)
+        if result is None:
+            if portfolio is None:
+                portfolio = Portfolio(df, model)
+            result = portfolio.evaluate(scenario)
+            dataset_cache.put(key, result)
+        return result
+    
+    base = evaluate({'bps': 0.0, 'shocks': []})
+    return base, [{'name': scenario['name'], 'bps': scenario['bps'], **with_deltas(evaluate(scenario), base)}
+                  for scenario in scenarios]
+
+
+@timed('serialize')
+def to_records(df):
+    """frame_to_records, timed as the request's serialize phase"""
+    return frame_to_records(df)
+
+
+def frame_response(payload, df):
+    """Respond with payload plus df's rows as 'data', in the layout the client negotiated
+
+    Records (the default) and columns are JSON; for Arrow the rows are the IPC stream
+    and the rest of payload travels as JSON in the schema metadata.
+    """
+    layout = negotiate_layout()
+    if layout == LAYOUT_ARROW:
+        with phase('serialize'):
+            body = frame_to_arrow(df, payload)
+        response = Response(body, mimetype=ARROW_MIMETYPE)
+    else:
+        if layout == LAYOUT_COLUMNS:
+            with phase('serialize'):
+                payload = {**payload, 'layout': LAYOUT_COLUMNS, 'data': frame_to_columns(df)}
+        else:
+            payload = {**payload, 'data': to_records(df)}
+        response = jsonify(payload)
+    response.vary.add('Accept')
+    return response
+
+
+def split_param(value):
+    """Accept a list or a comma-separated string and return a list of names"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    return [str(v).strip() for v in value if str(v).strip()]
+
+
+def parse_page_params(source, columns):
+    """Read offset/limit/sort/columns from query args or a JSON body and validate them"""
+    try:
+        offset = int(source.get('offset') or 0)
+        limit = source.get('limit')
+        limit = int(limit) if limit not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError('offset and limit must be integers')
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError('offset and limit must not be negative')
+    
+    # Sort keys: "col" ascending, "-col" descending
+    sort = []
+    for key in split_param(source.get('sort')):
+        name = key[1:] if key.startswith('-') else key
+        if name not in columns:
+            raise ValueError(f'Unknown sort column: {name}')
+        sort.append((name, not key.startswith('-')))
+    
+    projection = split_param(source.get('columns'))
+    unknown = [col for col in projection if col not in columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    
+    return {'offset': offset, 'limit': limit, 'sort': sort, 'columns': projection}
+
+
+def page_frame(df, params):
+    """Sort, slice and project a DataFrame; returns the page and the total row count"""
+    if params['sort']:
+        df = df.sort_values(
+            by=[name for name, _ in params['sort']],
+            ascending=[ascending for _, ascending in params['sort']],
+            kind='mergesort',
+            na_position='last'
         )
-    ''')
+    total = len(df)
+    stop = params['offset'] + params['limit'] if params['limit'] is not None else None
+    df = df.iloc[params['offset']:stop]
+    if params['columns']:
+        df = df[params['columns']]
+    return df, total
+
+
+def iter_export_frames(dataset, filters, columns, projection=None):
+    """Yield filtered batches of a dataset without materializing the whole result"""
+    dataset_cache.sync(dataset['id'], dataset['revision'])
+    cached = dataset_cache.get_frame(dataset['id'])
+    if cached is not None:
+        batches = (cached.iloc[start:start + EXPORT_BATCH_ROWS]
+                   for start in range(0, max(len(cached), 1), EXPORT_BATCH_ROWS))
+    else:
+        batches = iter_frames(dataset['id'], EXPORT_BATCH_ROWS)
+    
+    formats = {}
+    for batch in batches:
+        if filters:
+            # Parse every batch's dates with the format of the dataset's first value
+            settle_date_formats(formats, batch, columns)
+            batch = batch[filter_mask(batch, filters, columns, formats)]
+        if projection:
+            batch = batch[projection]
+        yield batch
+
+
+def save_dataset(file_path, filename, file_ext, name, description, on_progress=None):
+    """Ingest a saved upload into the columnar store and register it in datasets"""
+    # Stream the file into the columnar store in bounded-memory chunks
+    try:
+        ingested = ingest_file(file_path, file_ext, app.config['INGEST_MEMORY_BUDGET'], on_progress)
+    except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise ValueError(f'Error reading file: {str(e)}') from e
+    
+    columns = ingested['columns']
+    row_count = ingested['row_count']
+    
+    # Store in database
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        INSERT INTO datasets (name, description, filename, file_path, file_type, columns, row_count,
+                              storage_format, column_types, column_profile)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'parquet', ?, ?)
+    ''', (name, description, filename, file_path, file_ext, json.dumps(columns), row_count,
+          json.dumps(ingested['column_types']), json.dumps(ingested['profile'])))
+    
+    dataset_id = cursor.lastrowid
+    
+    # Move the staged file into place; the row is only committed once the file exists
+    try:
+        commit_staged(ingested['staging_path'], dataset_id)
+        write_profiler(dataset_id, ingested['profiler'])
+    except Exception:
+        conn.rollback()
+        conn.close()
+        discard_staged(ingested['staging_path'])
+        raise
     
     conn.commit()
     conn.close()
+    
+    # Indexes are built in the background; queries scan until they are ready
+    schedule_index_build(dataset_id)
+    
+    return {
+        'id': dataset_id,
+        'name': name,
+        'row_count': row_count,
+        'columns': columns
+    }
+
 
+def dataset_profiler(dataset_id):
+    """A dataset's column profiler, rebuilt from its rows for datasets stored without one"""
+    profiler = read_profiler(dataset_id)
+    if profiler is None:
+        profiler = DatasetProfiler()
+        for frame in iter_frames(dataset_id, EXPORT_BATCH_ROWS):
+            profiler.update(frame)
+    return profiler
 
-def apply_filters(data, filters, columns):
-    """Apply filters to dataset - general purpose filter engine"""
-    filtered = data.copy()
-    
-    if not filters:
-        return filtered
-    
-    # Date range filters - check all date-like columns
-    if filters.get('start_date') or filters.get('end_date'):
-        date_columns = [col for col in columns if any(keyword in col.lower() for keyword in ['date', 'time', 'created', 'updated'])]
-        if date_columns:
-            for date_col in date_columns:
-                try:
-                    if filters.get('start_date'):
-                        start_date = pd.to_datetime(filters['start_date'])
-                        filtered = [
-                            row for row in filtered
-                            if pd.to_datetime(row.get(date_col, ''), errors='coerce') >= start_date
-                        ]
-                    if filters.get('end_date'):
-                        end_date = pd.to_datetime(filters['end_date'])
-                        filtered = [
-                            row for row in filtered
-                            if pd.to_datetime(row.get(date_col, ''), errors='coerce') <= end_date
-                        ]
-                except:
-                    pass
-    
-    # Column-specific filters (general format: column_name: [values])
-    for column_name, filter_value in filters.items():
-        if column_name in ['start_date', 'end_date']:
-            continue  # Already handled
-        
-        if column_name not in columns:
-            continue
-        
-        # Skip empty filters
-        if filter_value is None or filter_value == '' or (isinstance(filter_value, list) and len(filter_value) == 0):
-            continue
-        
-        # Categorical filter (list of values)
-        if isinstance(filter_value, list):
-            if 'all' not in [str(v).lower() for v in filter_value]:
-                filtered = [
-                    row for row in filtered
-                    if str(row.get(column_name, '')).lower() in [str(v).lower() for v in filter_value]
-                ]
-        
-        # Range filter (min/max object)
-        elif isinstance(filter_value, dict):
-            if 'min' in filter_value and filter_value['min'] is not None:
-                try:
-                    min_val = float(filter_value['min'])
-                    filtered = [
-                        row for row in filtered
-                        if pd.to_numeric(row.get(column_name, 0), errors='coerce') >= min_val
-                    ]
-                except:
-                    pass
-            
-            if 'max' in filter_value and filter_value['max'] is not None:
-                try:
-                    max_val = float(filter_value['max'])
-                    filtered = [
-                        row for row in filtered
-                        if pd.to_numeric(row.get(column_name, 0), errors='coerce') <= max_val
-                    ]
-                except:
-                    pass
-        
-        # Single value filter (exact match)
-        elif filter_value:
-            filtered = [
-                row for row in filtered
-                if str(row.get(column_name, '')).lower() == str(filter_value).lower()
-            ]
-    
-    return filtered
+
+def append_rows(dataset, delta, mode, key_columns):
+    """Store only the new rows of an append or upsert and update counts, profile and cache
+
+    Upserts mask the stored rows they replace instead of rewriting them; the dataset is
+    compacted into one file once it has APPEND_COMPACT_PARTS parts.
+    """
+    dataset_id = dataset['id']
+    columns = json.loads(dataset['columns'])
+    column_types = json.loads(dataset['column_types'] or '{}')
+    
+    schema = read_schema(dataset_id)
+    table = align_delta(delta, columns, schema)
+    delta = table.to_pandas()
+    deletions, positions = {}, np.array([], dtype=np.int64)
+    if mode == UPSERT:
+        delta = dedupe_delta(delta, key_columns)
+        table = pa.Table.from_pandas(delta, schema=schema, preserve_index=False)
+        deletions, positions = replaced_rows(dataset_id, delta, key_columns)
+    
+    if len(delta) == 0:
+        return {'appended': 0, 'replaced': 0, 'row_count': dataset['row_count']}
+    
+    profiler = dataset_profiler(dataset_id)
+    if deletions:
+        profiler.remove(pd.concat([read_rows(part, rows) for part, rows in deletions.items()]))
+    profiler.update(delta)
+    profile = profiler.result()
+    for col, column_profile in profile['columns'].items():
+        column_profile['dtype'] = column_types.get(col, column_profile['dtype'])
+    row_count = dataset['row_count'] + len(delta) - len(positions)
+    
+    staged = staging_path()
+    pq.write_table(table, staged, row_group_size=ROW_GROUP_ROWS)
+    
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE datasets SET row_count = ?, column_profile = ?, revision = revision + 1,
+                            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', (row_count, json.dumps(profile), dataset_id))
+    try:
+        commit_part(staged, dataset_id)
+        for part, rows in deletions.items():
+            write_deleted(part, rows)
+        write_profiler(dataset_id, profiler)
+    except Exception:
+        conn.rollback()
+        conn.close()
+        discard_staged(staged)
+        raise
+    conn.commit()
+    conn.close()
+    
+    update_cached_dataset(dataset_id, columns, delta, positions)
+    dataset_cache.set_revision(dataset_id, dataset['revision'] + 1)
+    
+    if len(part_paths(dataset_id)) > APPEND_COMPACT_PARTS:
+        compact_frame(dataset_id)
+    if app.config['SHARED_FRAMES']:
+        refresh_shared(dataset_id)
+    schedule_index_build(dataset_id)
+    
+    return {'appended': len(delta), 'replaced': len(positions), 'row_count': row_count}
+
+
+def update_cached_dataset(dataset_id, columns, delta, replaced):
+    """Bring a dataset's cached frame and filter masks up to date with appended rows
+
+    Rows at the replaced positions are dropped and the delta is added at the end, matching
+    the stored row order; other cached results for the dataset are invalidated. Memory-mapped
+    frames are dropped instead: concatenating would copy them into this process.
+    """
+    def update(key, value):
+        if key[0] not in ('frame', 'mask') or (key[0] == 'frame' and app.config['SHARED_FRAMES']):
+            return None
+        keep = np.ones(len(value), dtype=bool)
+        keep[replaced] = False
+        if key[0] == 'frame':
+            return pd.concat([value[keep], delta], ignore_index=True)
+        return np.concatenate([value[keep], filter_mask(delta, json.loads(key[2]), columns)])
+    
+    dataset_cache.update_dataset(dataset_id, update)
+
+
+def write_api_batch(rule, frame):
+    """Store one batch of formatted rows of an API ingestion rule and return its dataset id
+
+    The first batch creates the rule's dataset, or a new one if it was deleted; later batches
+    and later runs are upserted by the rule's key. Columns the dataset doesn't have
+    are dropped and missing ones are left empty, so a rule without formatting columns keeps the
+    columns of its first batch.
+    """
+    dataset_id = rule['dataset_id']
+    if dataset_id is not None:
+        with dataset_lock(dataset_id):
+            # Re-read under the lock: another append may have changed the row count
+            conn = get_db_connection()
+            dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+            conn.close()
+            if dataset:
+                delta = frame.reindex(columns=json.loads(dataset['columns']))
+                append_rows(dataset, delta, rule['mode'], rule['key'])
+                return dataset_id
+    
+    if rule['mode'] == UPSERT:
+        frame = dedupe_delta(frame, rule['key'])
+    filename = f"{secure_filename(rule['name']) or 'api'}.parquet"
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4()}_{filename}")
+    table = pa.Table.from_pandas(frame, schema=arrow_schema(frame), preserve_index=False)
+    pq.write_table(table, file_path, row_group_size=ROW_GROUP_ROWS)
+    result = save_dataset(file_path, filename, 'parquet', rule['name'], f"Ingested from {rule['api_url']}")
+    return result['id']
+
+
+# Runs the active API ingestion rules; started by python app.py, or in its own process by serve.py
+ingestion_scheduler = IngestionScheduler(get_db_connection, write_api_batch, app.config['API_POLL_SECONDS'])
+
+
+def run_ingest_job(job_id, file_path, filename, file_ext, name, description):
+    """Worker-pool entry point: ingest an upload and record progress on its job"""
+    conn = get_db_connection()
+    try:
+        update_job(conn, job_id, status=JOB_RUNNING)
+        result = save_dataset(
+            file_path, filename, file_ext, name, description,
+            on_progress=lambda rows: update_job(conn, job_id, rows_processed=rows)
+        )
+        update_job(conn, job_id, status=JOB_COMPLETED, rows_processed=result['row_count'],
+                   dataset_id=result['id'])
+    except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        update_job(conn, job_id, status=JOB_FAILED, error=str(e))
+    finally:
+        conn.close()
 
 
 # ==================== ROUTES ====================
@@ -195,6 +754,8 @@ def root():
         'endpoints': {
             'health': '/api/health',
             'datasets': '/api/datasets',
+            'jobs': '/api/jobs/<job_id>',
+            'ingestion_rules': '/api/ingestion-rules',
             'portfolio_comparisons': '/api/portfolio-comparisons'
         }
     })
@@ -210,6 +771,22 @@ def health_check():
     })
 
 
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    """Dataset cache size and hit/miss/eviction counters"""
+    return jsonify(dataset_cache.stats())
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request latency histograms and cache gauges in Prometheus text format"""
+    cache = dataset_cache.stats()
+    lines = []
+    for name in ('entries', 'bytes_used', 'budget_bytes', 'hits', 'misses', 'evictions'):
+        lines += gauge(f'glimpsy_cache_{name}', f'Dataset cache {name.replace("_", " ")}', cache[name])
+    return Response(render_metrics(lines), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/datasets', methods=['GET'])
 def get_datasets():
     """Get all datasets"""
@@ -238,26 +815,43 @@ def get_dataset(dataset_id):
             conn.close()
             return jsonify({'error': 'Dataset not found'}), 404
         
-        # Get records
-        records = conn.execute('''
-            SELECT record_data FROM dataset_records WHERE dataset_id = ?
-        ''', (dataset_id,)).fetchall()
         conn.close()
         
-        # Parse records
-        data = [json.loads(record['record_data']) for record in records]
         columns = json.loads(dataset['columns'])
+        try:
+            params = parse_page_params(request.args, columns)
+            negotiate_layout()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify({
+        df = resident_frame(dataset)
+        if df is not None:
+            page, total = page_frame(df, params)
+            plan = {'source': 'memory'}
+        else:
+            # Read only the page's rows and columns (and the sort columns) from storage
+            query = dataset_query(dataset).select(params['columns']).order_by(params['sort']) \
+                .slice(params['offset'], params['limit'])
+            with phase('query'):
+                page, total = query.rows()
+            plan = query.explain()
+        
+        payload = {
             'id': dataset['id'],
             'name': dataset['name'],
             'description': dataset['description'],
             'columns': columns,
-            'data': data,
+            'total_count': total,
+            'offset': params['offset'],
+            'limit': params['limit'],
+            'column_types': json.loads(dataset['column_types'] or '{}'),
             'row_count': dataset['row_count'],
             'file_type': dataset['file_type'],
             'created_at': dataset['created_at']
-        })
+        }
+        if explain_requested(request.args):
+            payload['plan'] = plan
+        return frame_response(payload, page)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -288,54 +882,29 @@ def upload_dataset():
         # Save file
         file.save(file_path)
         
-        # Read file based on type
         file_ext = filename.rsplit('.', 1)[1].lower()
-        try:
-            if file_ext == 'csv':
-                df = pd.read_csv(file_path)
-            elif file_ext == 'parquet':
-                df = pd.read_parquet(file_path)
-            else:
-                os.remove(file_path)
-                return jsonify({'error': 'Unsupported file type'}), 400
-        except Exception as e:
-            os.remove(file_path)
-            return jsonify({'error': f'Error reading file: {str(e)}'}), 400
         
-        # Process data
-        df = df.fillna('')
-        records = df.to_dict('records')
-        columns = list(df.columns)
-        row_count = len(records)
+        # Ingest inline only when the client asks to wait for the result
+        if request.form.get('wait', 'false').lower() in ('1', 'true', 'yes'):
+            try:
+                with phase('ingest'):
+                    result = save_dataset(file_path, filename, file_ext, name, description)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({**result, 'message': 'Dataset uploaded successfully'}), 201
         
-        # Store in database
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO datasets (name, description, filename, file_path, file_type, columns, row_count)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (name, description, filename, file_path, file_ext, json.dumps(columns), row_count))
-        
-        dataset_id = cursor.lastrowid
-        
-        # Store records
-        for record in records:
-            cursor.execute('''
-                INSERT INTO dataset_records (dataset_id, record_data)
-                VALUES (?, ?)
-            ''', (dataset_id, json.dumps(record)))
-        
-        conn.commit()
+        job_id = create_job(conn, 'upload', filename)
         conn.close()
         
+        ingest_executor.submit(run_ingest_job, job_id, file_path, filename, file_ext, name, description)
+        
         return jsonify({
-            'id': dataset_id,
-            'name': name,
-            'message': 'Dataset uploaded successfully',
-            'row_count': row_count,
-            'columns': columns
-        }), 201
+            'job_id': job_id,
+            'status': JOB_QUEUED,
+            'status_url': f'/api/jobs/{job_id}',
+            'message': 'Upload accepted, ingestion is running in the background'
+        }), 202
         
     except Exception as e:
         if os.path.exists(file_path):
@@ -343,6 +912,73 @@ def upload_dataset():
         return jsonify({'error': f'Error processing file: {str(e)}'}), 500
 
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_ingest_job(job_id):
+    """Get status and progress of a background ingestion job"""
+    try:
+        conn = get_db_connection()
+        job = get_job(conn, job_id)
+        conn.close()
+        
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/datasets/<int:dataset_id>/append', methods=['POST'])
+def append_dataset(dataset_id):
+    """Append rows to a dataset, or upsert them by key, without re-ingesting the stored rows"""
+    try:
+        conn = get_db_connection()
+        dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        conn.close()
+        
+        if not dataset:
+            return jsonify({'error': 'Dataset not found'}), 404
+        
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'File type not allowed. Only CSV and Parquet files are supported.'}), 400
+        
+        mode = request.form.get('mode', APPEND)
+        if mode not in APPEND_MODES:
+            return jsonify({'error': f"mode must be one of: {', '.join(APPEND_MODES)}"}), 400
+        key_columns = split_param(request.form.get('key'))
+        if mode == UPSERT and not key_columns:
+            return jsonify({'error': 'Upserts need key columns (key=<column>)'}), 400
+        
+        filename = secure_filename(file.filename)
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4()}_{filename}")
+        file.save(file_path)
+        
+        try:
+            with phase('ingest'):
+                delta = read_delta(file_path, filename.rsplit('.', 1)[1].lower())
+                with dataset_lock(dataset_id):
+                    # Re-read under the lock: another append may have changed the row count
+                    conn = get_db_connection()
+                    dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+                    conn.close()
+                    result = append_rows(dataset, delta, mode, key_columns)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        finally:
+            os.remove(file_path)
+        
+        return jsonify({'id': dataset_id, 'mode': mode, **result})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/datasets/<int:dataset_id>', methods=['DELETE'])
 def delete_dataset(dataset_id):
     """Delete a dataset"""
@@ -357,6 +993,8 @@ def delete_dataset(dataset_id):
         # Delete file
         if os.path.exists(dataset['file_path']):
             os.remove(dataset['file_path'])
+        delete_frame(dataset_id)
+        dataset_cache.invalidate(dataset_id)
         
         # Delete from database
         conn.execute('DELETE FROM datasets WHERE id = ?', (dataset_id,))
@@ -368,6 +1006,38 @@ def delete_dataset(dataset_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/datasets/<int:dataset_id>/profile', methods=['GET'])
+def get_dataset_profile(dataset_id):
+    """Get per-column statistics computed at ingest time"""
+    try:
+        conn = get_db_connection()
+        dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        
+        if not dataset:
+            conn.close()
+            return jsonify({'error': 'Dataset not found'}), 404
+        
+        if dataset['column_profile']:
+            profile = json.loads(dataset['column_profile'])
+        else:
+            # Datasets ingested before profiling: compute once and store it
+            profile = profile_frame(load_dataset_frame(dataset))
+            conn.execute('UPDATE datasets SET column_profile = ? WHERE id = ?',
+                         (json.dumps(profile), dataset_id))
+            conn.commit()
+        conn.close()
+        
+        return jsonify({
+            'id': dataset['id'],
+            'name': dataset['name'],
+            'columns': json.loads(dataset['columns']),
+            'row_count': profile['row_count'],
+            'column_profiles': profile['columns']
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/datasets/<int:dataset_id>/filter', methods=['POST'])
 def filter_dataset(dataset_id):
     """Apply filters to a dataset"""
@@ -379,70 +1049,245 @@ def filter_dataset(dataset_id):
             conn.close()
             return jsonify({'error': 'Dataset not found'}), 404
         
-        # Get records
-        records = conn.execute('''
-            SELECT record_data FROM dataset_records WHERE dataset_id = ?
-        ''', (dataset_id,)).fetchall()
         conn.close()
         
-        # Parse records
-        data = [json.loads(record['record_data']) for record in records]
         columns = json.loads(dataset['columns'])
         
-        # Get filter parameters
-        filters = request.json.get('filters', {})
+        # Get filter and paging parameters
+        body = request.json or {}
+        filters = body.get('filters', {})
+        try:
+            params = parse_page_params(body, columns)
+            negotiate_layout()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Apply filters
-        filtered_data = apply_filters(data, filters, columns)
+        df = resident_frame(dataset)
+        if df is not None:
+            # Apply filters, then sort and page before serializing
+            filtered = filter_dataset_frame(dataset, df, filters, columns)
+            page, total = page_frame(filtered, params)
+            original_count = len(df)
+            plan = {'source': 'memory'}
+        else:
+            query = dataset_query(dataset).where(filters).select(params['columns']) \
+                .order_by(params['sort']).slice(params['offset'], params['limit'])
+            with phase('query'):
+                page, total = query.rows()
+            original_count = query.get_layout().row_count
+            plan = query.explain()
+        
+        payload = {
+            'row_count': total,
+            'total_count': total,
+            'original_count': original_count,
+            'offset': params['offset'],
+            'limit': params['limit']
+        }
+        if explain_requested(body):
+            payload['plan'] = plan
+        return frame_response(payload, page)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/datasets/<int:dataset_id>/search', methods=['GET'])
+def search_dataset(dataset_id):
+    """Find rows with a value containing q (case-insensitive), a page at a time"""
+    try:
+        conn = get_db_connection()
+        dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        conn.close()
+        
+        if not dataset:
+            return jsonify({'error': 'Dataset not found'}), 404
+        
+        columns = json.loads(dataset['columns'])
+        query = normalize_query(request.args.get('q'))
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        try:
+            params = parse_page_params(request.args, columns)
+            negotiate_layout()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if request.args.get('limit') in (None, ''):
+            params['limit'] = SEARCH_PAGE_ROWS
+        
+        df = load_dataset_frame(dataset)
+        page, total = page_frame(search_dataset_frame(dataset, df, query, columns), params)
+        
+        return frame_response({
+            'query': query,
+            'total_count': total,
+            'original_count': len(df),
+            'offset': params['offset'],
+            'limit': params['limit']
+        }, page)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/datasets/<int:dataset_id>/series', methods=['GET'])
+def get_dataset_series(dataset_id):
+    """A numeric column over a date column, downsampled to about one point per pixel for charts"""
+    try:
+        conn = get_db_connection()
+        dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        conn.close()
+        
+        if not dataset:
+            return jsonify({'error': 'Dataset not found'}), 404
+        
+        columns = json.loads(dataset['columns'])
+        try:
+            params = parse_series_params(request.args, columns)
+            filters_str = request.args.get('filters', '{}')
+            filters = json.loads(filters_str) if filters_str else {}
+            times, values, source = downsample_series(dataset, params, filters, columns)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         return jsonify({
-            'data': filtered_data,
-            'row_count': len(filtered_data),
-            'original_count': len(data)
+            'x': params['x'],
+            'y': params['y'],
+            'method': params['method'],
+            'width': params['width'],
+            'source': source,
+            'point_count': len(times),
+            'data': {'x': format_times(times), 'y': values.tolist()}
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/datasets/<int:dataset_id>/export', methods=['GET'])
-def export_dataset(dataset_id):
-    """Export filtered dataset as CSV"""
+@app.route('/api/datasets/<int:dataset_id>/scenarios', methods=['POST'])
+def run_dataset_scenarios(dataset_id):
+    """Recompute portfolio interest, value and yield under a batch of rate shock scenarios"""
     try:
         conn = get_db_connection()
         dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        conn.close()
         
         if not dataset:
-            conn.close()
             return jsonify({'error': 'Dataset not found'}), 404
         
-        # Get filter parameters
-        filters_str = request.args.get('filters', '{}')
-        filters = json.loads(filters_str) if filters_str else {}
+        columns = json.loads(dataset['columns'])
+        body = request.json or {}
+        try:
+            model = parse_model(body, columns)
+            scenarios = parse_scenarios(body.get('scenarios'), columns)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        filters = body.get('filters', {})
+        df = resident_frame(dataset)
+        if df is not None:
+            filtered = filter_dataset_frame(dataset, df, filters, columns)
+            original_count = len(df)
+        else:
+            query = dataset_query(dataset).where(filters)
+            with phase('query'):
+                filtered = query.frame(scenario_columns(model, scenarios))
+            original_count = query.get_layout().row_count
+        base, results = run_scenarios(dataset, filtered, normalize_filters(filters, columns), model, scenarios)
+        
+        return jsonify({
+            'row_count': len(filtered),
+            'original_count': original_count,
+            'base': base,
+            'scenarios': results
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/datasets/<int:dataset_id>/aggregate', methods=['POST'])
+def aggregate_dataset(dataset_id):
+    """Group, bucket and summarize a dataset, returning only the aggregated series"""
+    try:
+        conn = get_db_connection()
+        dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+        conn.close()
+        
+        if not dataset:
+            return jsonify({'error': 'Dataset not found'}), 404
+        
+        columns = json.loads(dataset['columns'])
+        body = request.json or {}
+        
+        filters = body.get('filters', {})
         
-        # Get records
-        records = conn.execute('''
-            SELECT record_data FROM dataset_records WHERE dataset_id = ?
-        ''', (dataset_id,)).fetchall()
+        try:
+            negotiate_layout()
+            df = resident_frame(dataset)
+            if df is not None:
+                # Apply the same filters as /filter
+                filtered = filter_dataset_frame(dataset, df, filters, columns)
+                with phase('aggregate'):
+                    result = aggregate_frame(
+                        filtered,
+                        group_by=body.get('group_by'),
+                        metrics=body.get('metrics'),
+                        time_bucket=body.get('time_bucket'),
+                        map_partitions=query_pool.map
+                    )
+                source_row_count = len(filtered)
+                plan = {'source': 'memory'}
+            else:
+                # Read only the filter, key and metric columns from storage
+                query = dataset_query(dataset).where(filters) \
+                    .group_by(body.get('group_by'), body.get('metrics'), body.get('time_bucket'))
+                with phase('query'):
+                    result, source_row_count = query.aggregate(map_partitions=query_pool.map)
+                plan = query.explain()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        payload = {
+            'columns': list(result.columns),
+            'row_count': len(result),
+            'source_row_count': source_row_count
+        }
+        if explain_requested(body):
+            payload['plan'] = plan
+        return frame_response(payload, result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/datasets/<int:dataset_id>/export', methods=['GET'])
+def export_dataset(dataset_id):
+    """Export filtered dataset as a streamed CSV, NDJSON or Parquet download"""
+    try:
+        conn = get_db_connection()
+        dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
         conn.close()
         
-        # Parse records
-        data = [json.loads(record['record_data']) for record in records]
+        if not dataset:
+            return jsonify({'error': 'Dataset not found'}), 404
+        
         columns = json.loads(dataset['columns'])
         
-        # Apply filters
-        filtered_data = apply_filters(data, filters, columns)
+        # Get filter and format parameters
+        filters_str = request.args.get('filters', '{}')
+        filters = json.loads(filters_str) if filters_str else {}
+        export_format = request.args.get('format', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f"Unsupported export format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        projection = split_param(request.args.get('columns'))
+        unknown = [col for col in projection if col not in columns]
+        if unknown:
+            return jsonify({'error': f"Unknown columns: {', '.join(unknown)}"}), 400
         
-        # Create DataFrame and convert to CSV
-        df = pd.DataFrame(filtered_data)
-        output = io.StringIO()
-        df.to_csv(output, index=False)
-        output.seek(0)
+        chunks, mimetype, extension = EXPORT_FORMATS[export_format]
+        frames = iter_export_frames(dataset, filters, columns, projection)
+        download_name = f"{secure_filename(dataset['name']) or 'dataset'}_export.{extension}"
         
-        return send_file(
-            io.BytesIO(output.getvalue().encode()),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f"{dataset['name']}_export.csv"
+        return Response(
+            chunks(frames, read_schema(dataset['id'], projection or None)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
         )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -477,6 +1322,7 @@ def create_portfolio_comparison():
         dataset1_id = data.get('dataset1_id')
         dataset2_id = data.get('dataset2_id')
         name = data.get('name', f'Comparison {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+        key_column = data.get('key_column') or None
         
         if not dataset1_id or not dataset2_id:
             return jsonify({'error': 'Both dataset IDs are required'}), 400
@@ -487,18 +1333,23 @@ def create_portfolio_comparison():
         conn = get_db_connection()
         
         # Verify datasets exist
-        dataset1 = conn.execute('SELECT id FROM datasets WHERE id = ?', (dataset1_id,)).fetchone()
-        dataset2 = conn.execute('SELECT id FROM datasets WHERE id = ?', (dataset2_id,)).fetchone()
+        dataset1 = conn.execute('SELECT id, columns FROM datasets WHERE id = ?', (dataset1_id,)).fetchone()
+        dataset2 = conn.execute('SELECT id, columns FROM datasets WHERE id = ?', (dataset2_id,)).fetchone()
         
         if not dataset1 or not dataset2:
             conn.close()
             return jsonify({'error': 'One or both datasets not found'}), 404
         
+        if key_column and (key_column not in json.loads(dataset1['columns'])
+                           or key_column not in json.loads(dataset2['columns'])):
+            conn.close()
+            return jsonify({'error': f'Key column {key_column} must exist in both datasets'}), 400
+        
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO portfolio_comparisons (name, dataset1_id, dataset2_id)
-            VALUES (?, ?, ?)
-        ''', (name, dataset1_id, dataset2_id))
+            INSERT INTO portfolio_comparisons (name, dataset1_id, dataset2_id, key_column)
+            VALUES (?, ?, ?, ?)
+        ''', (name, dataset1_id, dataset2_id, key_column))
         
         comparison_id = cursor.lastrowid
         conn.commit()
@@ -509,6 +1360,7 @@ def create_portfolio_comparison():
             'name': name,
             'dataset1_id': dataset1_id,
             'dataset2_id': dataset2_id,
+            'key_column': key_column,
             'message': 'Portfolio comparison created successfully'
         }), 201
     except Exception as e:
@@ -530,17 +1382,11 @@ def get_portfolio_comparison(comparison_id):
         
         # Get dataset 1
         dataset1_row = conn.execute('SELECT * FROM datasets WHERE id = ?', (comparison['dataset1_id'],)).fetchone()
-        records1 = conn.execute('''
-            SELECT record_data FROM dataset_records WHERE dataset_id = ?
-        ''', (comparison['dataset1_id'],)).fetchall()
-        data1 = [json.loads(record['record_data']) for record in records1]
+        data1 = to_records(load_dataset_frame(dataset1_row))
         
         # Get dataset 2
         dataset2_row = conn.execute('SELECT * FROM datasets WHERE id = ?', (comparison['dataset2_id'],)).fetchone()
-        records2 = conn.execute('''
-            SELECT record_data FROM dataset_records WHERE dataset_id = ?
-        ''', (comparison['dataset2_id'],)).fetchall()
-        data2 = [json.loads(record['record_data']) for record in records2]
+        data2 = to_records(load_dataset_frame(dataset2_row))
         
         conn.close()
         
@@ -575,6 +1421,130 @@ def get_portfolio_comparison(comparison_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/portfolio-comparisons/<int:comparison_id>/diff', methods=['GET'])
+def get_portfolio_comparison_diff(comparison_id):
+    """Diff summary of a comparison, with paged per-key details on demand"""
+    try:
+        conn = get_db_connection()
+        comparison = conn.execute('''
+            SELECT * FROM portfolio_comparisons WHERE id = ?
+        ''', (comparison_id,)).fetchone()
+        
+        if not comparison:
+            conn.close()
+            return jsonify({'error': 'Portfolio comparison not found'}), 404
+        
+        dataset1_row = conn.execute('SELECT * FROM datasets WHERE id = ?', (comparison['dataset1_id'],)).fetchone()
+        dataset2_row = conn.execute('SELECT * FROM datasets WHERE id = ?', (comparison['dataset2_id'],)).fetchone()
+        conn.close()
+        
+        # Key and grouping parameters
+        key_columns = split_param(request.args.get('key') or comparison['key_column'])
+        if not key_columns:
+            return jsonify({'error': 'A key column is required (key=<column>)'}), 400
+        group_by = request.args.get('group_by') or None
+        status = request.args.get('status') or None
+        if status and status not in DETAIL_STATUSES:
+            return jsonify({'error': f"status must be one of: {', '.join(DETAIL_STATUSES)}"}), 400
+        try:
+            offset = int(request.args.get('offset') or 0)
+            limit = int(request.args.get('limit') or 100)
+        except ValueError:
+            return jsonify({'error': 'offset and limit must be integers'}), 400
+        if offset < 0 or limit < 1:
+            return jsonify({'error': 'offset must not be negative and limit must be positive'}), 400
+        
+        # Reuse the diff until either dataset changes
+        spec = json.dumps({'key': key_columns, 'group_by': group_by})
+        dataset_cache.sync(dataset1_row['id'], dataset1_row['revision'])
+        dataset_cache.sync(dataset2_row['id'], dataset2_row['revision'])
+        result = dataset_cache.get_comparison(comparison_id, spec)
+        if result is None:
+            try:
+                df1 = load_dataset_frame(dataset1_row)
+                df2 = load_dataset_frame(dataset2_row)
+                with phase('compare'):
+                    result = compare_frames(df1, df2, key_columns, group_by)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            dataset_cache.put_comparison(comparison_id, spec, result,
+                                         (comparison['dataset1_id'], comparison['dataset2_id']))
+        
+        details, total = diff_details(result['keys'], status, offset, limit)
+        
+        return jsonify({
+            'id': comparison['id'],
+            'name': comparison['name'],
+            'summary': result['summary'],
+            'groups': to_records(result['groups']) if result['groups'] is not None else None,
+            'details': {
+                'status': status,
+                'data': to_records(details),
+                'total_count': total,
+                'offset': offset,
+                'limit': limit
+            }
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/ingestion-rules', methods=['GET'])
+def get_ingestion_rules():
+    """List API ingestion rules with the outcome of their last run"""
+    try:
+        conn = get_db_connection()
+        rules = conn.execute('SELECT * FROM api_ingestion_rules ORDER BY created_at DESC').fetchall()
+        conn.close()
+        
+        return jsonify([rule_to_dict(rule) for rule in rules])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/ingestion-rules', methods=['POST'])
+def create_ingestion_rule():
+    """Create an API ingestion rule; active rules run every constraints.interval_seconds"""
+    try:
+        data = request.get_json(silent=True) or {}
+        
+        if not data.get('name') or not data.get('api_url'):
+            return jsonify({'error': 'name and api_url are required'}), 400
+        try:
+            parse_rule({**data, 'constraints': data.get('constraints'),
+                        'formatting_rules': data.get('formatting_rules')})
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        conn = get_db_connection()
+        rule_id = create_rule(conn, data)
+        rule = get_rule(conn, rule_id)
+        conn.close()
+        
+        return jsonify(rule_to_dict(rule)), 201
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/ingestion-rules/<int:rule_id>/run', methods=['POST'])
+def run_ingestion_rule(rule_id):
+    """Run an API ingestion rule now in the background; poll the rule for its last_status"""
+    try:
+        conn = get_db_connection()
+        rule = get_rule(conn, rule_id)
+        conn.close()
+        
+        if not rule:
+            return jsonify({'error': 'Ingestion rule not found'}), 404
+        if rule['last_status'] == JOB_RUNNING:
+            return jsonify({'error': 'Ingestion rule is already running'}), 409
+        
+        ingest_executor.submit(run_rule_now, get_db_connection, rule_id, write_api_batch)
+        return jsonify({'id': rule_id, 'status': JOB_QUEUED}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -595,4 +1565,7 @@ if __name__ == '__main__':
     print("API endpoints available at http://localhost:5000/api")
     print("Press Ctrl+C to stop the server")
     print("=" * 50)
+    # The debug reloader runs the app in a child process; schedule rules only there
+    if app.config['API_INGEST'] and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        ingestion_scheduler.start()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,90 @@
+"""
+Glimpsy - Incremental Appends and Upserts
+Validates new rows against a stored dataset and works out which stored rows an upsert replaces,
+so only the delta is parsed and written
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from storage import iter_part_columns, read_deleted, live_rows
+
+APPEND = 'append'
+UPSERT = 'upsert'
+APPEND_MODES = [APPEND, UPSERT]
+
+
+def read_delta(file_path, file_ext):
+    """Read the uploaded rows to add; deltas are expected to be small enough to hold in memory"""
+    if file_ext == 'csv':
+        df = pd.read_csv(file_path)
+    elif file_ext == 'parquet':
+        df = pd.read_parquet(file_path)
+    else:
+        raise ValueError(f'Unsupported file type: {file_ext}')
+    df.columns = [str(col) for col in df.columns]
+    return df
+
+
+def align_delta(df, columns, schema):
+    """Check the delta has exactly the stored columns and convert it to the stored column types
+
+    Returns the delta as an Arrow table in the stored schema; raises ValueError on a mismatch.
+    """
+    missing = [col for col in columns if col not in df.columns]
+    extra = [col for col in df.columns if col not in columns]
+    if missing or extra:
+        problems = []
+        if missing:
+            problems.append(f"missing columns: {', '.join(missing)}")
+        if extra:
+            problems.append(f"unexpected columns: {', '.join(extra)}")
+        raise ValueError(f"Columns do not match the dataset ({'; '.join(problems)})")
+
+    df = df[columns].copy()
+    for field in schema:
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            # Text columns may arrive looking numeric in a small delta
+            series = df[field.name]
+            df[field.name] = series.where(series.isna(), series.astype(str))
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError) as e:
+        raise ValueError(f'Rows do not match the dataset column types: {e}') from e
+
+
+def dedupe_delta(delta, key_columns):
+    """Keep the last row for each key in the delta, as later rows win"""
+    missing = [col for col in key_columns if col not in delta.columns]
+    if missing:
+        raise ValueError(f"Key columns not in the dataset: {', '.join(missing)}")
+    return delta.drop_duplicates(subset=key_columns, keep='last').reset_index(drop=True)
+
+
+def key_index(df, key_columns):
+    """Index of the key values of each row, comparable across frames"""
+    if len(key_columns) == 1:
+        return pd.Index(df[key_columns[0]])
+    return pd.MultiIndex.from_frame(df[key_columns])
+
+
+def replaced_rows(dataset_id, delta, key_columns):
+    """Stored rows whose key appears in the delta
+
+    Reads only the key columns of each part. Returns (deletions, positions): the newly replaced
+    row positions within each part, and the same rows as positions in the dataset's row order
+    as read_frame returns it.
+    """
+    incoming = key_index(delta, key_columns)
+    deletions = {}
+    positions = []
+    offset = 0
+    for part, keys in iter_part_columns(dataset_id, key_columns):
+        deleted = read_deleted(part)
+        live = live_rows(len(keys), deleted) if deleted is not None else np.ones(len(keys), dtype=bool)
+        hits = np.flatnonzero(key_index(keys, key_columns).isin(incoming) & live)
+        if len(hits):
+            deletions[part] = hits
+            positions.append(offset + np.cumsum(live)[hits] - 1)
+        offset += int(live.sum())
+    return deletions, np.concatenate(positions) if positions else np.array([], dtype=np.int64)
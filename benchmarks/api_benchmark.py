@@ -0,0 +1,219 @@
+"""
+Glimpsy - API Benchmark Suite
+Drives upload, get, filter, aggregate, export and comparison endpoints through Flask's test client
+on synthetic data, and reports latency percentiles, throughput and peak RSS as JSON
+
+Usage: python benchmarks/api_benchmark.py --rows 200000 --shape finance --output results.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import resource
+import platform
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import SHAPES, make_dataset
+
+# Filters that exercise every filter type on each shape
+SHAPE_FILTERS = {
+    'finance': {'start_date': '2021-01-01', 'Account_Type': ['CD', 'IRA'], 'Principal': {'min': 250000}},
+    'sales': {'start_date': '2021-01-01', 'Region': ['North', 'West'], 'Revenue': {'min': 10000}},
+    'health': {'start_date': '2021-01-01', 'Condition': ['Cardiac'], 'Cases': {'min': 50}},
+}
+
+SHAPE_AGGREGATES = {
+    'finance': {'group_by': ['Customer_Segment'], 'metrics': {'Principal': ['sum', 'mean', 'p95']},
+                'time_bucket': {'column': 'Date', 'interval': 'month'}},
+    'sales': {'group_by': ['Region'], 'metrics': {'Revenue': ['sum', 'mean'], 'Profit': ['sum']},
+              'time_bucket': {'column': 'Date', 'interval': 'month'}},
+    'health': {'group_by': ['Condition'], 'metrics': {'Cases': ['sum', 'p50'], 'Mortality_Rate': ['mean']},
+               'time_bucket': {'column': 'Date', 'interval': 'week'}},
+}
+
+SHAPE_KEYS = {'finance': 'Bank', 'sales': 'Product', 'health': 'Region'}
+
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No /proc: fall back to the lifetime peak
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == 'Darwin' else peak * 1024
+
+
+class RssSampler:
+    """Samples RSS on a background thread and keeps the peak seen while active"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        while not self.stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def measure(name, iterations, call, rows=None):
+    """Run call iterations times; return latency percentiles, throughput and peak RSS"""
+    latencies = []
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            began = time.perf_counter()
+            response = call()
+            body = response.get_data()  # streamed responses are generated while being read
+            latencies.append(time.perf_counter() - began)
+            if response.status_code >= 400:
+                raise SystemExit(f'{name}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}')
+        elapsed = time.perf_counter() - started
+
+    latencies_ms = np.array(latencies) * 1000
+    result = {
+        'iterations': iterations,
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'max_ms': float(latencies_ms.max()),
+        'throughput_rps': iterations / elapsed if elapsed else None,
+        'peak_rss_mb': sampler.peak / (1024 * 1024),
+        'response_bytes': len(body),
+    }
+    if rows is not None and elapsed:
+        result['rows_per_s'] = rows * iterations / elapsed
+    return result
+
+
+def run(args):
+    """Generate data, start the app in a scratch directory and benchmark each endpoint"""
+    workdir = tempfile.mkdtemp(prefix='glimpsy-bench-')
+    os.chdir(workdir)  # app.py creates its database, uploads/ and store/ relative to cwd
+
+    df = make_dataset(args.shape, args.rows, seed=args.seed, extra_columns=args.extra_columns)
+    other = make_dataset(args.shape, args.rows, seed=args.seed + 1, extra_columns=args.extra_columns)
+    upload_path = os.path.join(workdir, f'{args.shape}.{args.format}')
+    other_path = os.path.join(workdir, f'{args.shape}_other.{args.format}')
+    for frame, path in ((df, upload_path), (other, other_path)):
+        if args.format == 'parquet':
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_csv(path, index=False)
+
+    import app
+    app.init_db()
+    client = app.app.test_client()
+
+    def upload(path):
+        with open(path, 'rb') as f:
+            return client.post('/api/datasets', data={'file': (f, os.path.basename(path)), 'wait': 'true'})
+
+    results = {}
+    results['upload'] = measure('upload', args.upload_iterations, lambda: upload(upload_path), rows=args.rows)
+    dataset_id = upload(upload_path).get_json()['id']
+    other_id = upload(other_path).get_json()['id']
+
+    filters = SHAPE_FILTERS[args.shape]
+    aggregate = SHAPE_AGGREGATES[args.shape]
+
+    # The first read after an upload is a cold cache miss; measure it separately
+    app.dataset_cache.clear()
+    results['get_cold'] = measure('get_cold', 1, lambda: client.get(f'/api/datasets/{dataset_id}'), rows=args.rows)
+    results['get'] = measure('get', args.iterations, lambda: client.get(f'/api/datasets/{dataset_id}'),
+                             rows=args.rows)
+    results['get_page'] = measure('get_page', args.iterations,
+                                  lambda: client.get(f'/api/datasets/{dataset_id}?offset=1000&limit=50&sort=-Date'))
+    results['filter'] = measure('filter', args.iterations,
+                                lambda: client.post(f'/api/datasets/{dataset_id}/filter',
+                                                    json={'filters': filters, 'limit': 50}),
+                                rows=args.rows)
+    results['aggregate'] = measure('aggregate', args.iterations,
+                                   lambda: client.post(f'/api/datasets/{dataset_id}/aggregate',
+                                                       json={**aggregate, 'filters': filters}),
+                                   rows=args.rows)
+    results['profile'] = measure('profile', args.iterations,
+                                 lambda: client.get(f'/api/datasets/{dataset_id}/profile'))
+
+    filters_arg = json.dumps(filters)
+    for export_format in ('csv', 'ndjson', 'parquet'):
+        results[f'export_{export_format}'] = measure(
+            f'export_{export_format}', args.export_iterations,
+            lambda: client.get(f'/api/datasets/{dataset_id}/export',
+                               query_string={'filters': filters_arg, 'format': export_format}),
+            rows=args.rows
+        )
+
+    comparison = client.post('/api/portfolio-comparisons', json={
+        'dataset1_id': dataset_id, 'dataset2_id': other_id, 'key_column': SHAPE_KEYS[args.shape]
+    }).get_json()
+    results['comparison'] = measure('comparison', args.export_iterations,
+                                    lambda: client.get(f"/api/portfolio-comparisons/{comparison['id']}"),
+                                    rows=args.rows * 2)
+    results['comparison_diff'] = measure('comparison_diff', args.iterations,
+                                         lambda: client.get(f"/api/portfolio-comparisons/{comparison['id']}/diff"),
+                                         rows=args.rows * 2)
+
+    return {
+        'config': {
+            'shape': args.shape,
+            'rows': args.rows,
+            'columns': len(df.columns),
+            'format': args.format,
+            'iterations': args.iterations,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'workdir': workdir,
+        },
+        'cache': app.dataset_cache.stats(),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--shape', choices=list(SHAPES), default='finance')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--extra-columns', type=int, default=0)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='upload file format')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=20, help='requests per read endpoint')
+    parser.add_argument('--upload-iterations', type=int, default=3)
+    parser.add_argument('--export-iterations', type=int, default=3)
+    parser.add_argument('--output', help='write JSON results here instead of stdout')
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)  # run() changes directory
+
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, 'w') as out:
+            out.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Glimpsy - Filter Engine Benchmark
+Compares the vectorized filter engine against the original row-by-row implementation
+
+Usage: python benchmarks/filter_benchmark.py [--rows 500000] [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import apply_filters
+from storage import frame_to_records
+from synthetic import make_portfolio
+
+
+def legacy_apply_filters(data, filters, columns):
+    """Row-by-row filter engine that app.py used before filters.py (reference implementation)"""
+    filtered = data.copy()
+    
+    if not filters:
+        return filtered
+    
+    # Date range filters - check all date-like columns
+    if filters.get('start_date') or filters.get('end_date'):
+        date_columns = [col for col in columns if any(keyword in col.lower() for keyword in ['date', 'time', 'created', 'updated'])]
+        if date_columns:
+            for date_col in date_columns:
+                try:
+                    if filters.get('start_date'):
+                        start_date = pd.to_datetime(filters['start_date'])
+                        filtered = [
+                            row for row in filtered
+                            if pd.to_datetime(row.get(date_col, ''), errors='coerce') >= start_date
+                        ]
+                    if filters.get('end_date'):
+                        end_date = pd.to_datetime(filters['end_date'])
+                        filtered = [
+                            row for row in filtered
+                            if pd.to_datetime(row.get(date_col, ''), errors='coerce') <= end_date
+                        ]
+                except:
+                    pass
+    
+    # Column-specific filters (general format: column_name: [values])
+    for column_name, filter_value in filters.items():
+        if column_name in ['start_date', 'end_date']:
+            continue  # Already handled
+        
+        if column_name not in columns:
+            continue
+        
+        # Skip empty filters
+        if filter_value is None or filter_value == '' or (isinstance(filter_value, list) and len(filter_value) == 0):
+            continue
+        
+        # Categorical filter (list of values)
+        if isinstance(filter_value, list):
+            if 'all' not in [str(v).lower() for v in filter_value]:
+                filtered = [
+                    row for row in filtered
+                    if str(row.get(column_name, '')).lower() in [str(v).lower() for v in filter_value]
+                ]
+        
+        # Range filter (min/max object)
+        elif isinstance(filter_value, dict):
+            if 'min' in filter_value and filter_value['min'] is not None:
+                try:
+                    min_val = float(filter_value['min'])
+                    filtered = [
+                        row for row in filtered
+                        if pd.to_numeric(row.get(column_name, 0), errors='coerce') >= min_val
+                    ]
+                except:
+                    pass
+            
+            if 'max' in filter_value and filter_value['max'] is not None:
+                try:
+                    max_val = float(filter_value['max'])
+                    filtered = [
+                        row for row in filtered
+                        if pd.to_numeric(row.get(column_name, 0), errors='coerce') <= max_val
+                    ]
+                except:
+                    pass
+        
+        # Single value filter (exact match)
+        elif filter_value:
+            filtered = [
+                row for row in filtered
+                if str(row.get(column_name, '')).lower() == str(filter_value).lower()
+            ]
+    
+    return filtered
+
+
+
+FILTER_CASES = {
+    'date_range': {'start_date': '2021-01-01', 'end_date': '2022-06-30'},
+    'categorical': {'Account_Type': ['CD', 'IRA'], 'Bank': ['City Bank']},
+    'numeric_range': {'Principal': {'min': 250000, 'max': 750000}},
+    'exact_match': {'Status': 'active'},
+    'combined': {
+        'start_date': '2021-01-01',
+        'Customer_Segment': ['Retail', 'Corporate'],
+        'Interest_Rate': {'min': 2.0},
+        'Status': 'Active',
+    },
+}
+
+
+def best_of(repeat, func):
+    """Best wall-clock time of several runs, and the last result"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy', action='store_true', help='only time the vectorized engine')
+    args = parser.parse_args()
+
+    df = make_portfolio(args.rows)
+    columns = list(df.columns)
+    records = frame_to_records(df)
+
+    print(f"{'case':<16}{'rows out':>10}{'legacy (s)':>14}{'vectorized (s)':>16}{'speedup':>10}")
+    for case, filters in FILTER_CASES.items():
+        fast_time, fast = best_of(args.repeat, lambda: apply_filters(df, filters, columns))
+        if args.skip_legacy:
+            print(f"{case:<16}{len(fast):>10}{'-':>14}{fast_time:>16.4f}{'-':>10}")
+            continue
+        slow_time, slow = best_of(1, lambda: legacy_apply_filters(records, filters, columns))
+        if len(slow) != len(fast):
+            raise SystemExit(f"{case}: legacy returned {len(slow)} rows, vectorized {len(fast)}")
+        print(f"{case:<16}{len(fast):>10}{slow_time:>14.4f}{fast_time:>16.4f}{slow_time / fast_time:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
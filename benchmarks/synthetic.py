@@ -0,0 +1,110 @@
+"""
+Glimpsy - Synthetic Dataset Generator
+Builds datasets shaped like the files in samples/ at any size, for benchmarks
+
+Usage: python benchmarks/synthetic.py finance --rows 1000000 --output finance_1m.csv
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+
+
+def random_dates(rng, rows, start='2020-01-01', days=365 * 4):
+    """Dates as YYYY-MM-DD strings, like the sample CSVs"""
+    offsets = pd.to_timedelta(rng.integers(0, days, rows), unit='D')
+    return (pd.Timestamp(start) + offsets).strftime('%Y-%m-%d')
+
+
+def make_portfolio(rows, seed=0):
+    """Dataset shaped like samples/finance_portfolio.csv"""
+    rng = np.random.default_rng(seed)
+    principal = rng.integers(1_000, 1_000_000, rows)
+    rate = rng.uniform(0.5, 5.5, rows).round(2)
+    maturity = rng.choice([90, 180, 365, 730], rows)
+    return pd.DataFrame({
+        'Date': random_dates(rng, rows),
+        'Account_Type': rng.choice(['CD', 'Savings', 'Money Market', 'IRA'], rows),
+        'Customer_Segment': rng.choice(['Retail', 'Corporate', 'Small Business', 'Private'], rows),
+        'Bank': rng.choice(['First National', 'City Bank', 'Metro Credit', 'Union Trust'], rows),
+        'Principal': principal,
+        'Interest_Rate': rate,
+        'Days_to_Maturity': maturity,
+        'Status': rng.choice(['Active', 'Matured', 'Closed'], rows),
+        'Expected_Return': (principal * (1 + rate / 100 * maturity / 365)).round().astype(int),
+    })
+
+
+def make_sales(rows, seed=0):
+    """Dataset shaped like samples/sales_data.csv"""
+    rng = np.random.default_rng(seed)
+    units = rng.integers(10, 500, rows)
+    price = rng.choice([50, 80, 100, 120, 150], rows)
+    revenue = units * price
+    cost = (revenue * rng.uniform(0.4, 0.8, rows)).round().astype(int)
+    return pd.DataFrame({
+        'Date': random_dates(rng, rows),
+        'Product': rng.choice(['Widget A', 'Widget B', 'Gadget X', 'Device Y', 'Tool Z'], rows),
+        'Category': rng.choice(['Electronics', 'Hardware', 'Accessories'], rows),
+        'Region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'Units_Sold': units,
+        'Revenue': revenue,
+        'Cost': cost,
+        'Profit': revenue - cost,
+    })
+
+
+def make_health(rows, seed=0):
+    """Dataset shaped like samples/health_metrics.csv"""
+    rng = np.random.default_rng(seed)
+    cases = rng.integers(1, 200, rows)
+    return pd.DataFrame({
+        'Date': random_dates(rng, rows),
+        'Region': rng.choice(['North', 'South', 'East', 'West'], rows),
+        'Age_Group': rng.choice(['0-17', '18-30', '31-50', '51-70', '70+'], rows),
+        'Gender': rng.choice(['Male', 'Female'], rows),
+        'Condition': rng.choice(['Respiratory', 'Cardiac', 'Diabetes', 'Infectious'], rows),
+        'Cases': cases,
+        'Mortality_Rate': rng.uniform(0.1, 8.0, rows).round(1),
+        'Hospitalizations': (cases * rng.uniform(0.05, 0.4, rows)).round().astype(int),
+        'Recovery_Time_Days': rng.integers(3, 45, rows),
+    })
+
+
+SHAPES = {
+    'finance': make_portfolio,
+    'sales': make_sales,
+    'health': make_health,
+}
+
+
+def make_dataset(shape, rows, seed=0, extra_columns=0):
+    """Synthetic dataset of a given shape, optionally widened with extra numeric columns"""
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape {shape}; use one of: {', '.join(SHAPES)}")
+    df = SHAPES[shape](rows, seed)
+    rng = np.random.default_rng(seed + 1)
+    for i in range(extra_columns):
+        df[f'Metric_{i + 1}'] = rng.normal(100, 25, rows).round(3)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('shape', choices=list(SHAPES))
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--extra-columns', type=int, default=0)
+    parser.add_argument('--output', required=True, help='.csv or .parquet path')
+    args = parser.parse_args()
+
+    df = make_dataset(args.shape, args.rows, args.seed, args.extra_columns)
+    if args.output.endswith('.parquet'):
+        df.to_parquet(args.output, index=False)
+    else:
+        df.to_csv(args.output, index=False)
+    print(f'Wrote {len(df)} rows x {len(df.columns)} columns to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
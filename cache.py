@@ -0,0 +1,164 @@
+"""
+Glimpsy - In-Process Dataset Cache
+LRU cache of typed dataset DataFrames and filter masks, bounded by a memory budget
+"""
+
+import json
+import mmap
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from filters import is_empty_filter
+
+
+def is_mapped(array):
+    """Whether an array's memory is a file mapping rather than heap"""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def entry_size(value):
+    """Approximate in-memory size of a cached value in bytes
+
+    Memory-mapped arrays count as nothing: their pages belong to the page cache, not the heap
+    the budget is for.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return 0 if is_mapped(value) else int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(entry_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(entry_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def normalize_filters(filters, columns):
+    """Canonical JSON for a filter spec, so equivalent specs share a cache entry"""
+    normalized = {}
+    for key, value in (filters or {}).items():
+        if key not in ('start_date', 'end_date') and key not in columns:
+            continue
+        if is_empty_filter(value):
+            continue
+        if isinstance(value, list):
+            # Categorical filters are case-insensitive set membership
+            value = sorted({str(v).lower() for v in value})
+        elif isinstance(value, str) and key not in ('start_date', 'end_date'):
+            value = value.lower()
+        normalized[key] = value
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+class DatasetCache:
+    """Thread-safe LRU cache keyed by dataset id
+
+    Frames are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revisions = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key, value, datasets=None):
+        """Cache value under key; datasets lists the dataset ids it was derived from"""
+        size = entry_size(value)
+        datasets = frozenset(datasets if datasets is not None else [key[1]])
+        with self.lock:
+            if key in self.entries:
+                self.bytes_used -= self.entries.pop(key)[1]
+            if size > self.budget_bytes:
+                return
+            self.entries[key] = (value, size, datasets)
+            self.bytes_used += size
+            while self.bytes_used > self.budget_bytes:
+                _, (_, evicted_size, _) = self.entries.popitem(last=False)
+                self.bytes_used -= evicted_size
+                self.evictions += 1
+
+    def get_frame(self, dataset_id):
+        return self.get(('frame', dataset_id))
+
+    def put_frame(self, dataset_id, df):
+        self.put(('frame', dataset_id), df)
+
+    def get_mask(self, dataset_id, filter_key):
+        return self.get(('mask', dataset_id, filter_key))
+
+    def put_mask(self, dataset_id, filter_key, mask):
+        self.put(('mask', dataset_id, filter_key), mask)
+
+    def get_comparison(self, comparison_id, spec):
+        return self.get(('comparison', comparison_id, spec))
+
+    def put_comparison(self, comparison_id, spec, result, dataset_ids):
+        self.put(('comparison', comparison_id, spec), result, datasets=dataset_ids)
+
+    def sync(self, dataset_id, revision):
+        """Drop a dataset's cached values if its revision changed, possibly in another process"""
+        with self.lock:
+            known = self.revisions.get(dataset_id)
+            self.revisions[dataset_id] = revision
+        if known is not None and known != revision:
+            self.invalidate(dataset_id)
+
+    def set_revision(self, dataset_id, revision):
+        """Record that cached values are already up to date with a revision"""
+        with self.lock:
+            self.revisions[dataset_id] = revision
+
+    def invalidate(self, dataset_id):
+        """Drop every cached value derived from a dataset: its frame, filter results and comparisons"""
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if dataset_id in entry[2]]:
+                self.bytes_used -= self.entries.pop(key)[1]
+
+    def update_dataset(self, dataset_id, update):
+        """Replace every cached value derived from a dataset with update(key, value)
+
+        update returns the new value, or None to drop the entry. It runs outside the lock.
+        """
+        with self.lock:
+            items = [(key, entry[0], entry[2]) for key, entry in self.entries.items() if dataset_id in entry[2]]
+        self.invalidate(dataset_id)
+        for key, value, datasets in items:
+            value = update(key, value)
+            if value is not None:
+                self.put(key, value, datasets)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes_used = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes_used': self.bytes_used,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
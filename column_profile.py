@@ -0,0 +1,208 @@
+"""
+Glimpsy - Column Profiles
+Per-column statistics built chunk by chunk during ingest, so filter UIs never need to read the rows
+"""
+
+from collections import Counter
+import numpy as np
+import pandas as pd
+from filters import get_date_columns, parse_dates
+
+TOP_N = 10
+TRACKED_VALUES = 1000       # per-chunk value counts kept for top-N once a column gets high-cardinality
+SKETCH_SIZE = 1024          # k for the k-minimum-values distinct count estimate
+SAMPLE_SIZE = 10000         # bottom-k random sample used for approximate quantiles
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+# Share of non-null values that must parse as dates for a text column to be profiled as a date
+DATE_PARSE_RATIO = 0.9
+
+
+def to_json_value(value):
+    """Convert numpy/pandas scalars to plain JSON-ready Python values"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class ColumnProfiler:
+    """Accumulates statistics for one column across chunks"""
+
+    def __init__(self, name, is_date_name, seed=0):
+        self.name = name
+        self.is_date_name = is_date_name
+        self.dtype = None
+        self.kind = None
+        self.count = 0
+        self.null_count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.counts = Counter()
+        self.counts_pruned = False
+        self.sketch = np.array([], dtype=np.uint64)
+        self.sample_keys = np.array([], dtype=float)
+        self.sample_values = np.array([], dtype=float)
+        self.rng = np.random.default_rng(seed)
+        self.removed = False
+
+    def detect_kind(self, series):
+        if pd.api.types.is_bool_dtype(series):
+            return 'boolean'
+        if pd.api.types.is_numeric_dtype(series):
+            return 'numeric'
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return 'date'
+        values = series.dropna()
+        if self.is_date_name and len(values):
+            parsed = parse_dates(values)
+            if parsed.notna().mean() >= DATE_PARSE_RATIO:
+                return 'date'
+        return 'text'
+
+    def update(self, series):
+        if self.dtype is None:
+            self.dtype = str(series.dtype)
+        nulls = int(series.isna().sum())
+        self.null_count += nulls
+        values = series.dropna()
+        if len(values) == 0:
+            return
+        if self.kind is None:
+            self.kind = self.detect_kind(values)
+        self.count += len(values)
+
+        self.update_range(values)
+        self.update_counts(values)
+        self.update_sketch(values)
+        if self.kind == 'numeric':
+            numbers = values.to_numpy(dtype=float)
+            self.total += float(numbers.sum())
+            self.update_sample(numbers)
+
+    def remove(self, series):
+        """Take replaced rows out of the counts, totals and top values
+
+        The range, distinct-count sketch and quantile sample cannot forget values, so after
+        a removal they describe a superset of the rows and are reported as approximate.
+        """
+        self.null_count -= int(series.isna().sum())
+        values = series.dropna()
+        if len(values) == 0:
+            return
+        self.removed = True
+        self.count -= len(values)
+        if self.kind == 'numeric':
+            self.total -= float(values.to_numpy(dtype=float).sum())
+        self.counts.subtract({to_json_value(value): int(n) for value, n in values.value_counts().items()})
+        self.counts = +self.counts
+
+    def update_range(self, values):
+        if self.kind == 'date':
+            values = parse_dates(values).dropna()
+        elif self.kind == 'text':
+            values = values.astype(str)
+        if len(values) == 0:
+            return
+        low, high = values.min(), values.max()
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+
+    def update_counts(self, values):
+        counts = values.value_counts()
+        if len(counts) > TRACKED_VALUES:
+            counts = counts.head(TRACKED_VALUES)
+            self.counts_pruned = True
+        self.counts.update({to_json_value(value): int(n) for value, n in counts.items()})
+        if len(self.counts) > TRACKED_VALUES * 2:
+            self.counts = Counter(dict(self.counts.most_common(TRACKED_VALUES)))
+            self.counts_pruned = True
+
+    def update_sketch(self, values):
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        self.sketch = np.unique(np.concatenate([self.sketch, hashes]))[:SKETCH_SIZE]
+
+    def update_sample(self, numbers):
+        keys = self.rng.random(len(numbers))
+        all_keys = np.concatenate([self.sample_keys, keys])
+        all_values = np.concatenate([self.sample_values, numbers])
+        if len(all_keys) > SAMPLE_SIZE:
+            keep = np.argpartition(all_keys, SAMPLE_SIZE)[:SAMPLE_SIZE]
+            all_keys, all_values = all_keys[keep], all_values[keep]
+        self.sample_keys, self.sample_values = all_keys, all_values
+
+    def distinct_count(self):
+        if not self.counts_pruned:
+            return len(self.counts), False
+        if self.removed:
+            return max(len(self.counts), min(self.count, self.sketch_estimate())), True
+        return self.sketch_estimate(), len(self.sketch) >= SKETCH_SIZE
+
+    def sketch_estimate(self):
+        if len(self.sketch) < SKETCH_SIZE:
+            return len(self.sketch)
+        return int(round((SKETCH_SIZE - 1) * float(2 ** 64) / float(self.sketch[-1])))
+
+    def result(self):
+        distinct, approximate = self.distinct_count()
+        profile = {
+            'dtype': self.dtype,
+            'kind': self.kind or 'empty',
+            'count': self.count,
+            'null_count': self.null_count,
+            'distinct_count': distinct,
+            'distinct_approximate': approximate,
+            'min': to_json_value(self.min),
+            'max': to_json_value(self.max),
+            'top_values': [{'value': value, 'count': n} for value, n in self.counts.most_common(TOP_N)],
+            'top_values_approximate': self.counts_pruned
+        }
+        if self.removed:
+            profile['range_approximate'] = True
+        if self.kind == 'numeric':
+            profile['mean'] = self.total / self.count if self.count else None
+            if len(self.sample_values):
+                points = np.quantile(self.sample_values, QUANTILES)
+                profile['quantiles'] = {f'p{int(q * 100)}': float(v) for q, v in zip(QUANTILES, points)}
+                profile['quantiles_approximate'] = self.count > SAMPLE_SIZE or self.removed
+        return profile
+
+
+class DatasetProfiler:
+    """Profiles every column of a dataset, one chunk at a time"""
+
+    def __init__(self):
+        self.columns = None
+        self.row_count = 0
+
+    def update(self, df):
+        if self.columns is None:
+            date_columns = set(get_date_columns([str(col) for col in df.columns]))
+            self.columns = {str(col): ColumnProfiler(str(col), str(col) in date_columns, seed=i)
+                            for i, col in enumerate(df.columns)}
+        self.row_count += len(df)
+        for col in df.columns:
+            self.columns[str(col)].update(df[col])
+
+    def remove(self, df):
+        """Take rows that were replaced by an upsert out of the profile"""
+        self.row_count -= len(df)
+        for col in df.columns:
+            self.columns[str(col)].remove(df[col])
+
+    def result(self):
+        return {
+            'row_count': self.row_count,
+            'columns': {name: profiler.result() for name, profiler in (self.columns or {}).items()}
+        }
+
+
+def profile_frame(df):
+    """Profile a whole DataFrame in one go"""
+    profiler = DatasetProfiler()
+    profiler.update(df)
+    return profiler.result()
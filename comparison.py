@@ -0,0 +1,95 @@
+"""
+Glimpsy - Portfolio Comparison Diff Engine
+Joins two datasets on key columns and computes per-key and per-group deltas of their numeric columns
+"""
+
+import numpy as np
+import pandas as pd
+
+STATUS_ADDED = 'added'
+STATUS_REMOVED = 'removed'
+STATUS_CHANGED = 'changed'
+STATUS_UNCHANGED = 'unchanged'
+DETAIL_STATUSES = [STATUS_ADDED, STATUS_REMOVED, STATUS_CHANGED, STATUS_UNCHANGED]
+
+
+def numeric_columns(df1, df2, exclude):
+    """Columns numeric in both datasets, in the order of the first"""
+    def is_number(series):
+        return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+    return [col for col in df1.columns
+            if col in df2.columns and col not in exclude and is_number(df1[col]) and is_number(df2[col])]
+
+
+def totals_by(df, keys, values):
+    """Sum of the value columns per key, keeping missing keys as their own group"""
+    return df.groupby(keys, dropna=False, sort=False)[values].sum()
+
+
+def compare_frames(df1, df2, key_columns, group_by=None):
+    """Diff two datasets keyed by key_columns
+
+    Returns a dict with a JSON-ready summary, the per-key diff table and, when
+    group_by is given, a per-group table of totals and deltas.
+    """
+    for col in list(key_columns) + ([group_by] if group_by else []):
+        if col not in df1.columns or col not in df2.columns:
+            raise ValueError(f'Column {col} must exist in both datasets')
+
+    values = numeric_columns(df1, df2, set(key_columns) | {group_by})
+    left = totals_by(df1, key_columns, values)
+    right = totals_by(df2, key_columns, values)
+
+    # Outer join on the key; the indicator tells which side each key came from
+    keys = left.join(right, how='outer', lsuffix='_1', rsuffix='_2')
+    in_left = keys.index.isin(left.index)
+    in_right = keys.index.isin(right.index)
+
+    changed = np.zeros(len(keys), dtype=bool)
+    for col in values:
+        before = keys[f'{col}_1']
+        after = keys[f'{col}_2']
+        keys[f'{col}_delta'] = after.fillna(0) - before.fillna(0)
+        changed |= ~np.isclose(before.to_numpy(dtype=float), after.to_numpy(dtype=float), equal_nan=True)
+
+    keys.insert(0, 'status', np.select(
+        [~in_left, ~in_right, changed],
+        [STATUS_ADDED, STATUS_REMOVED, STATUS_CHANGED],
+        default=STATUS_UNCHANGED
+    ))
+    keys = keys.reset_index()
+
+    status_counts = keys['status'].value_counts()
+    summary = {
+        'key_columns': list(key_columns),
+        'numeric_columns': values,
+        'rows': {'dataset1': len(df1), 'dataset2': len(df2)},
+        'keys': {status: int(status_counts.get(status, 0)) for status in DETAIL_STATUSES},
+        'totals': {
+            col: {
+                'dataset1': float(df1[col].sum()),
+                'dataset2': float(df2[col].sum()),
+                'delta': float(df2[col].sum() - df1[col].sum())
+            }
+            for col in values
+        }
+    }
+
+    groups = None
+    if group_by:
+        groups = totals_by(df1, [group_by], values).join(
+            totals_by(df2, [group_by], values), how='outer', lsuffix='_1', rsuffix='_2'
+        )
+        for col in values:
+            groups[f'{col}_delta'] = groups[f'{col}_2'].fillna(0) - groups[f'{col}_1'].fillna(0)
+        groups = groups.reset_index()
+
+    return {'summary': summary, 'keys': keys, 'groups': groups}
+
+
+def diff_details(keys, status=None, offset=0, limit=100):
+    """Page through the per-key diff, optionally only keys with one status"""
+    if status:
+        keys = keys[keys['status'] == status]
+    total = len(keys)
+    return keys.iloc[offset:offset + limit], total
@@ -0,0 +1,142 @@
+"""
+Glimpsy - SQLite Connection Layer
+A process-wide pool of connections with WAL journaling, tuned pragmas and foreign keys enforced
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+
+# Stored in the database file, so it is set once when the database is initialized
+WAL_PRAGMA = 'PRAGMA journal_mode = WAL'  # readers don't block on an upload's write transaction
+
+PRAGMAS = [
+    'PRAGMA synchronous = NORMAL',    # safe with WAL, far fewer fsyncs
+    'PRAGMA foreign_keys = ON',       # makes ON DELETE CASCADE actually cascade
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA cache_size = -65536',     # 64MB page cache
+    'PRAGMA temp_store = MEMORY',
+]
+
+# Idle connections kept per database; connections opened beyond this while all are busy are
+# closed when they are returned
+POOL_SIZE = int(os.environ.get('GLIMPSY_DB_POOL_SIZE', 16))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Called with the seconds each statement took; instrumentation sets this to time the DB phase
+query_hook = None
+
+
+def timed_call(method, *args):
+    started = time.perf_counter()
+    try:
+        return method(*args)
+    finally:
+        if query_hook is not None:
+            query_hook(time.perf_counter() - started)
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports statement time to query_hook"""
+
+    def execute(self, *args):
+        return timed_call(super().execute, *args)
+
+    def executemany(self, *args):
+        return timed_call(super().executemany, *args)
+
+    def fetchone(self):
+        return timed_call(super().fetchone)
+
+    def fetchall(self):
+        return timed_call(super().fetchall)
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connection that stays open for reuse by any thread
+
+    close() rolls back uncommitted work, as a real close would discard it, and returns the
+    connection to its pool; release() closes the connection for good.
+    """
+
+    pool = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def close(self):
+        pool, self.pool = self.pool, None
+        if pool is None:
+            return  # already returned, or not from a pool
+        if self.in_transaction:
+            self.rollback()
+        try:
+            pool.put_nowait(self)
+        except queue.Full:
+            self.release()
+
+    def release(self):
+        self.pool = None
+        super().close()
+
+
+def reset_pool():
+    """Forget connections inherited from a parent process; SQLite handles must not cross a fork"""
+    global _pools
+    _pools = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_pool)
+
+
+def connect(database):
+    """Open a new tuned connection"""
+    conn = sqlite3.connect(database, factory=PooledConnection, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(database):
+    """Take an idle connection to database from the pool, opening one if none is idle
+
+    Requests run on short-lived threads, so connections are pooled per process rather than per
+    thread. close() hands the connection back.
+    """
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = _pools[database] = queue.Queue(maxsize=POOL_SIZE)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = connect(database)
+    conn.pool = pool
+    return conn
+
+
+def create_indexes(cursor):
+    """Indexes for the per-dataset lookups and the dataset listing"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_dataset_records_dataset_id ON dataset_records(dataset_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_datasets_created_at ON datasets(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_comparisons_dataset1 ON portfolio_comparisons(dataset1_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_portfolio_comparisons_dataset2 ON portfolio_comparisons(dataset2_id)')
+
+
+def delete_orphans(cursor):
+    """Remove rows left behind by deletes made while foreign keys were not enforced"""
+    cursor.execute('DELETE FROM dataset_records WHERE dataset_id NOT IN (SELECT id FROM datasets)')
+    cursor.execute('''
+        DELETE FROM portfolio_comparisons
+        WHERE dataset1_id NOT IN (SELECT id FROM datasets)
+           OR dataset2_id NOT IN (SELECT id FROM datasets)
+    ''')
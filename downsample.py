@@ -0,0 +1,262 @@
+"""
+Glimpsy - Time-Series Downsampling
+Reduces a numeric column plotted against a date column to a few points per pixel with
+Largest-Triangle-Three-Buckets or min/max per bucket, from multi-resolution rollups built at ingest
+when no filters apply, so a full chart costs the same whatever the dataset's length
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from filters import get_date_columns, parse_dates
+from indexes import SORTED
+
+LTTB = 'lttb'
+MINMAX = 'minmax'
+METHODS = [LTTB, MINMAX]
+DEFAULT_WIDTH = 1000  # pixels
+MAX_WIDTH = 10000
+ROLLUP_BUCKETS = 8192  # time buckets of the finest rollup level
+ROLLUP_FACTOR = 4  # buckets of one level merged into each bucket of the next, coarser level
+ROLLUP_LEVELS = 3  # 8192, 2048 and 512 buckets
+ROLLUP_RATIO = 2  # rollup buckets per pixel a level needs before a chart is drawn from it
+DAY_NS = 86400 * 10 ** 9
+
+
+def rollup_key(x, y):
+    return json.dumps([x, y])
+
+
+def parse_time(value, name):
+    """A start/end bound as a nanosecond timestamp, or None"""
+    if value is None or value == '':
+        return None
+    try:
+        bound = pd.to_datetime(value)
+    except (ValueError, TypeError):
+        raise ValueError(f'{name} must be a date')
+    if bound is pd.NaT or bound.tzinfo is not None:
+        raise ValueError(f'{name} must be a date without a timezone')
+    return bound.value
+
+
+def parse_series_params(args, columns):
+    """Validate x (a date-like column, as the date filters detect them), y, width, method, start and end"""
+    date_columns = get_date_columns(columns)
+    x = args.get('x') or (date_columns[0] if date_columns else None)
+    if x is None:
+        raise ValueError('Dataset has no date columns')
+    if x not in date_columns:
+        raise ValueError(f"x must be a date column: {', '.join(date_columns)}")
+    y = args.get('y')
+    if not y or y not in columns:
+        raise ValueError(f'Unknown y column: {y}')
+    try:
+        width = int(args.get('width') or DEFAULT_WIDTH)
+    except (TypeError, ValueError):
+        raise ValueError('width must be an integer')
+    if not 3 <= width <= MAX_WIDTH:
+        raise ValueError(f'width must be between 3 and {MAX_WIDTH}')
+    method = str(args.get('method') or LTTB).lower()
+    if method not in METHODS:
+        raise ValueError(f"method must be one of: {', '.join(METHODS)}")
+    params = {
+        'x': x,
+        'y': y,
+        'width': width,
+        'method': method,
+        'start': parse_time(args.get('start'), 'start'),
+        'end': parse_time(args.get('end'), 'end')
+    }
+    if params['start'] is not None and params['end'] is not None and params['start'] > params['end']:
+        raise ValueError('start must not be after end')
+    return params
+
+
+def bucket_ids(times, start, stop, buckets):
+    """Equal-width time bucket of each timestamp between start and stop, both inclusive"""
+    span = max(stop - start, 1)
+    return np.clip(((times - start) / span * buckets).astype(np.int64), 0, buckets - 1)
+
+
+def segment_extremes(segments, values):
+    """(segment ids, position of each segment's first minimum, of its first maximum)
+
+    segments must be non-decreasing and values free of NaN.
+    """
+    starts = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+    runs = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(values)]))
+
+    def first(hit):
+        positions = np.flatnonzero(hit)
+        return positions[np.r_[True, runs[positions][1:] != runs[positions][:-1]]]
+
+    lows = first(values == np.minimum.reduceat(values, starts)[runs])
+    highs = first(values == np.maximum.reduceat(values, starts)[runs])
+    return segments[starts], lows, highs
+
+
+def minmax(times, values, lo, hi, width):
+    """Positions of the lowest and highest point in each of width equal time buckets, in time order"""
+    if len(times) == 0:
+        return np.array([], dtype=np.int64)
+    _, lows, highs = segment_extremes(bucket_ids(times, lo, hi, width), values)
+    return np.unique(np.concatenate([lows, highs]))
+
+
+def lttb(times, values, threshold):
+    """Positions of the threshold points Largest-Triangle-Three-Buckets keeps, first and last included
+
+    The points between the first and last are split into threshold - 2 buckets of equal count;
+    each keeps the point forming the largest triangle with the point kept before it and the
+    average of the next bucket, which keeps the peaks and troughs that shape the line.
+    """
+    n = len(times)
+    if threshold >= n or n <= 2:
+        return np.arange(n)
+    x = (times - times[0]) / 1e9  # seconds, so the areas stay well within float precision
+    y = values
+    edges = np.r_[np.arange(threshold - 1) * (n - 2) // (threshold - 2) + 1, n]
+    # Bucket averages from prefix sums; the last "bucket" is the final point
+    counts = np.diff(edges)
+    sum_x, sum_y = np.r_[0, np.cumsum(x)], np.r_[0, np.cumsum(y)]
+    avg_x = (sum_x[edges[1:]] - sum_x[edges[:-1]]) / counts
+    avg_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / counts
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i + 1]) * (y[start:stop] - y[a])
+                      - (x[a] - x[start:stop]) * (avg_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(times, values, lo, hi, width, method):
+    """Positions of the points to plot out of points sorted by time"""
+    if method == MINMAX:
+        return minmax(times, values, lo, hi, width)
+    return lttb(times, values, width)
+
+
+def merge_buckets(values, at, pick):
+    """Combine every ROLLUP_FACTOR adjacent buckets, keeping the extreme pick (np.argmin/argmax) selects"""
+    grouped = values.reshape(-1, ROLLUP_FACTOR)
+    filled = np.where(np.isnan(grouped), np.inf if pick is np.argmin else -np.inf, grouped)
+    choice = pick(filled, axis=1)
+    rows = np.arange(len(grouped))
+    # Groups of empty buckets pick a NaN and stay empty
+    return grouped[rows, choice], at.reshape(-1, ROLLUP_FACTOR)[rows, choice]
+
+
+def build_rollup(times, values):
+    """Lowest and highest value per time bucket, with the time of each, at every rollup level
+
+    times are sorted; empty buckets hold NaN. Level 0 is the finest.
+    """
+    start, stop = int(times[0]), int(times[-1])
+    valid = ~np.isnan(values)
+    times, values = times[valid], values[valid]
+    low, high = np.full(ROLLUP_BUCKETS, np.nan), np.full(ROLLUP_BUCKETS, np.nan)
+    low_at, high_at = np.zeros(ROLLUP_BUCKETS, dtype=np.int64), np.zeros(ROLLUP_BUCKETS, dtype=np.int64)
+    if len(times):
+        ids, lows, highs = segment_extremes(bucket_ids(times, start, stop, ROLLUP_BUCKETS), values)
+        low[ids], low_at[ids] = values[lows], times[lows]
+        high[ids], high_at[ids] = values[highs], times[highs]
+
+    rollup = {'start': start, 'stop': stop, 'buckets': []}
+    for level in range(ROLLUP_LEVELS):
+        if level:
+            low, low_at = merge_buckets(low, low_at, np.argmin)
+            high, high_at = merge_buckets(high, high_at, np.argmax)
+        rollup['buckets'].append(len(low))
+        rollup.update({f'low_{level}': low, f'low_at_{level}': low_at,
+                       f'high_{level}': high, f'high_at_{level}': high_at})
+    return rollup
+
+
+def build_rollups(indexes, read_column):
+    """Rollups of every numeric column against every indexed date column
+
+    Dates come from the date column indexes, already parsed and sorted by time; numeric columns
+    are read one at a time with read_column(name). Returns {'row_count', 'columns':
+    {rollup_key(x, y): rollup}}, as storage.write_rollups saves it.
+    """
+    rollups = {'row_count': indexes['row_count'], 'columns': {}}
+    dates = {name: index for name, index in indexes['columns'].items()
+             if index.get('date') and len(index['values'])}
+    if not dates:
+        return rollups
+    numeric = [name for name, index in indexes['columns'].items() if index['kind'] == SORTED and not index.get('date')]
+    for y in numeric:
+        values = numeric_values(read_column(y))
+        for x, index in dates.items():
+            rollups['columns'][rollup_key(x, y)] = build_rollup(index['values'], values[index['rows']])
+    return rollups
+
+
+def rollup_points(rollup, lo, hi, width):
+    """(times, values) of the bucket extremes between lo and hi, in time order, from the coarsest
+    level with ROLLUP_RATIO buckets per pixel there; None when even the finest level is too coarse
+
+    Buckets straddling lo or hi only contribute extremes inside the range.
+    """
+    lo = rollup['start'] if lo is None else max(lo, rollup['start'])
+    hi = rollup['stop'] if hi is None else min(hi, rollup['stop'])
+    if lo > hi:
+        return np.array([], dtype=np.int64), np.array([])
+    for level in reversed(range(len(rollup['buckets']))):
+        first, last = bucket_ids(np.array([lo, hi]), rollup['start'], rollup['stop'], rollup['buckets'][level])
+        if last - first + 1 >= ROLLUP_RATIO * width:
+            break
+    else:
+        return None
+
+    span = slice(first, last + 1)
+    present = ~np.isnan(rollup[f'low_{level}'][span])
+    times = np.stack([rollup[f'low_at_{level}'][span], rollup[f'high_at_{level}'][span]], axis=1)[present]
+    values = np.stack([rollup[f'low_{level}'][span], rollup[f'high_{level}'][span]], axis=1)[present]
+    # Each bucket's two extremes in time order, once when they are the same point
+    order = np.argsort(times, axis=1, kind='stable')
+    times = np.take_along_axis(times, order, axis=1).ravel()
+    values = np.take_along_axis(values, order, axis=1).ravel()
+    keep = np.r_[True, (times[1:] != times[:-1]) | (values[1:] != values[:-1])] & (times >= lo) & (times <= hi)
+    return times[keep], values[keep]
+
+
+def numeric_values(series):
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+
+def index_range(index, start, end):
+    """(times, rows) of the rows of a date column index between start and end, sorted by time"""
+    times = index['values']
+    first = 0 if start is None else np.searchsorted(times, start, side='left')
+    stop = len(times) if end is None else np.searchsorted(times, end, side='right')
+    return times[first:stop], index['rows'][first:stop].astype(np.int64)
+
+
+def series_values(frame, x, y):
+    """(times, values) of a frame's rows with both a date and a number, sorted by time"""
+    dates = parse_dates(frame[x])
+    if not pd.api.types.is_datetime64_dtype(dates):
+        raise ValueError(f'{x} has timezone-aware or unparseable dates')
+    times = dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    values = numeric_values(frame[y])
+    valid = dates.notna().to_numpy() & ~np.isnan(values)
+    order = np.flatnonzero(valid)[np.argsort(times[valid], kind='stable')]
+    return times[order], values[order]
+
+
+def format_times(times):
+    """ISO timestamps at the coarsest of day, second or millisecond precision that shows every value"""
+    if np.all(times % DAY_NS == 0):
+        unit = 'D'
+    elif np.all(times % 10 ** 9 == 0):
+        unit = 's'
+    else:
+        unit = 'ms'
+    return np.datetime_as_string(times.astype('datetime64[ns]'), unit=unit).tolist()
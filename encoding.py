@@ -0,0 +1,114 @@
+"""
+Glimpsy - Response Encoding
+Content negotiation for dataset rows (JSON records, JSON columns or Arrow IPC), a faster JSON encoder
+and gzip/brotli response compression
+"""
+
+import gzip
+import json
+import pyarrow as pa
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is offered instead
+    brotli = None
+
+LAYOUT_RECORDS = 'records'
+LAYOUT_COLUMNS = 'columns'
+LAYOUT_ARROW = 'arrow'
+LAYOUTS = [LAYOUT_RECORDS, LAYOUT_COLUMNS, LAYOUT_ARROW]
+
+COLUMNS_MIMETYPE = 'application/vnd.glimpsy.columns+json'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+ACCEPT_LAYOUTS = {
+    'application/json': LAYOUT_RECORDS,
+    COLUMNS_MIMETYPE: LAYOUT_COLUMNS,
+    ARROW_MIMETYPE: LAYOUT_ARROW,
+}
+
+MIN_COMPRESS_BYTES = 1024  # smaller bodies aren't worth the CPU or the header
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4         # brotli's fast range; higher levels cost far more CPU for little gain
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when it is installed
+
+    Responses are always compact, even in debug mode, and keys are sorted as with
+    Flask's default provider.
+    """
+
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder handles
+            return super().dumps(obj)
+
+
+def negotiate_layout():
+    """Row layout for the current request: ?layout= wins, then the Accept header, then records"""
+    layout = request.args.get('layout')
+    if layout:
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of: {', '.join(LAYOUTS)}")
+        return layout
+    best = request.accept_mimetypes.best_match(list(ACCEPT_LAYOUTS), default='application/json')
+    return ACCEPT_LAYOUTS[best]
+
+
+def frame_to_arrow(df, metadata=None):
+    """An Arrow IPC stream of df, with metadata stored as JSON under the schema's 'glimpsy' key"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = {'glimpsy': json.dumps(metadata, default=str)} if metadata else None
+    table = table.replace_schema_metadata(schema_metadata)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def choose_encoding():
+    """Best content coding the client accepts: br, then gzip, else None"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    """Compress a buffered response body in place when the client accepts it"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None or (response.content_length or 0) < MIN_COMPRESS_BYTES:
+        return response
+
+    data = response.get_data()
+    if encoding == 'br':
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,74 @@
+"""
+Glimpsy - Streaming Dataset Export
+Turns an iterator of DataFrame batches into CSV, NDJSON or Parquet byte chunks for a streamed response
+"""
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+class ChunkSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def csv_chunks(frames, schema=None):
+    """CSV text, header first, one chunk per batch"""
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header).encode()
+        header = False
+
+
+def ndjson_chunks(frames, schema=None):
+    """One JSON object per line, missing values as null"""
+    for frame in frames:
+        if len(frame):
+            yield frame.to_json(orient='records', lines=True, date_format='iso').rstrip('\n').encode() + b'\n'
+
+
+def parquet_chunks(frames, schema=None):
+    """A Parquet file written one row group per batch, using the stored schema when given"""
+    sink = ChunkSink()
+    writer = None
+    for frame in frames:
+        table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema.remove_metadata())
+        writer.write_table(table.replace_schema_metadata(None))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+# format -> (chunk generator, mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': (csv_chunks, 'text/csv', 'csv'),
+    'ndjson': (ndjson_chunks, 'application/x-ndjson', 'ndjson'),
+    'parquet': (parquet_chunks, 'application/vnd.apache.parquet', 'parquet'),
+}
@@ -0,0 +1,161 @@
+"""
+Glimpsy - Vectorized Filter Engine
+Filters a dataset DataFrame with one boolean mask, parsing each filtered column once
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+DATE_KEYWORDS = ['date', 'time', 'created', 'updated']
+
+
+def get_date_columns(columns):
+    """Columns whose names look like dates, used by the start_date/end_date filters"""
+    return [col for col in columns if any(keyword in col.lower() for keyword in DATE_KEYWORDS)]
+
+
+def is_empty_filter(filter_value):
+    """Check if a filter value should be ignored"""
+    return filter_value is None or filter_value == '' or (isinstance(filter_value, list) and len(filter_value) == 0)
+
+
+def first_value(series):
+    """First value of a column that is neither missing nor an empty string, or None"""
+    values = series.to_numpy()
+    present = pd.notna(values)
+    if values.dtype == object:
+        present &= values != ''
+    present = np.flatnonzero(present)
+    return values[present[0]] if len(present) else None
+
+
+def date_format(series):
+    """The format pd.to_datetime would infer for a text column, from its first non-empty value
+
+    Row partitions parse with the whole column's format, so a partition cannot read 01/02/2020
+    as 2 January when the column as a whole reads it as 1 February.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return None
+    value = first_value(series)
+    return guess_datetime_format(value) if isinstance(value, str) else None
+
+
+def date_formats(df, columns):
+    """date_format of each date-like column of df"""
+    return {col: date_format(df[col]) for col in get_date_columns(columns) if col in df.columns}
+
+
+def settle_date_formats(formats, df, columns):
+    """Add to formats the date_format of each date-like column of df it lacks, once df has a value
+
+    Fed a dataset's batches in order, this settles each column on its first value's format, as
+    date_formats would on the whole dataset.
+    """
+    for col in get_date_columns(columns):
+        if col not in formats and col in df.columns and first_value(df[col]) is not None:
+            formats[col] = date_format(df[col])
+    return formats
+
+
+def parse_dates(series, format=None):
+    """Parse a column to datetimes, coercing unparseable values to NaT
+
+    format, as from date_format, overrides the format pd.to_datetime would infer from series.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    parsed = pd.to_datetime(series, errors='coerce', format=format)
+    # The inferred format can reject values a per-value parse accepts; retry just those
+    retry = parsed.isna() & series.notna() & (series.astype(str) != '')
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry], errors='coerce', format='mixed')
+    return parsed
+
+
+def match_text(series, wanted):
+    """Mask of rows whose lowercased string value is in wanted, missing values counting as ''"""
+    # Normalize each distinct value once rather than every row
+    codes, uniques = pd.factorize(series)
+    hits = pd.Index(uniques).astype(str).str.lower().isin(wanted)
+    return np.append(hits, '' in wanted)[codes]
+
+
+def filter_mask(df, filters, columns, formats=None):
+    """Build a boolean mask selecting the rows of df that match filters
+
+    formats, as from date_formats, sets how date columns are parsed instead of inferring it from df.
+    """
+    mask = np.ones(len(df), dtype=bool)
+
+    if not filters:
+        return mask
+
+    # Date range filters - check all date-like columns
+    if filters.get('start_date') or filters.get('end_date'):
+        for date_col in get_date_columns(columns):
+            if date_col not in df.columns:
+                continue
+            dates = None
+            for key, keep in (('start_date', lambda d, bound: d >= bound),
+                              ('end_date', lambda d, bound: d <= bound)):
+                if not filters.get(key):
+                    continue
+                try:
+                    bound = pd.to_datetime(filters[key])
+                    if dates is None:
+                        dates = parse_dates(df[date_col], (formats or {}).get(date_col))
+                    mask &= keep(dates, bound).to_numpy(dtype=bool, na_value=False)
+                except (ValueError, TypeError):
+                    break
+
+    # Column-specific filters (general format: column_name: [values])
+    for column_name, filter_value in filters.items():
+        if column_name in ['start_date', 'end_date']:
+            continue  # Already handled
+
+        if column_name not in columns or column_name not in df.columns:
+            continue
+
+        if is_empty_filter(filter_value):
+            continue
+
+        column = df[column_name]
+
+        # Categorical filter (list of values)
+        if isinstance(filter_value, list):
+            wanted = {str(v).lower() for v in filter_value}
+            if 'all' not in wanted:
+                mask &= match_text(column, wanted)
+
+        # Range filter (min/max object)
+        elif isinstance(filter_value, dict):
+            numbers = None
+            for key, keep in (('min', np.greater_equal), ('max', np.less_equal)):
+                if filter_value.get(key) is None:
+                    continue
+                try:
+                    bound = float(filter_value[key])
+                except (ValueError, TypeError):
+                    continue
+                if numbers is None:
+                    numbers = pd.to_numeric(column, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+                mask &= keep(numbers, bound)
+
+        # Single value filter (exact match)
+        elif filter_value:
+            mask &= match_text(column, {str(filter_value).lower()})
+
+    return mask
+
+
+def apply_filters(df, filters, columns):
+    """Apply filters to dataset - general purpose filter engine"""
+    if not filters:
+        return df
+    return df[filter_mask(df, filters, columns)].reset_index(drop=True)
@@ -0,0 +1,338 @@
+"""
+Glimpsy - Column Indexes and Filter Planner
+Sorted arrays for date and numeric columns and inverted lists for categorical text columns, built
+after ingest, so selective filters only look at the rows that can match
+"""
+
+import bisect
+import numpy as np
+import pandas as pd
+from filters import get_date_columns, is_empty_filter, parse_dates, filter_mask
+
+SORTED = 'sorted'
+INVERTED = 'inverted'
+
+# Above this share of rows, gathering candidates costs more than a vectorized scan
+MAX_SELECTIVITY = 0.2
+
+# Text columns with more distinct values than this share of rows (free text, ids) get no inverted
+# lists: they would cost about as much memory as the column and narrow few filters
+MAX_DISTINCT_RATIO = 0.1
+
+# Text search postings: trigrams of code points packed into one int64
+GRAM = 3
+CODE_BITS = 21  # enough for any Unicode code point
+CODE_MASK = (1 << CODE_BITS) - 1
+
+# Characters expanded into trigrams at once while building, to bound memory on long values
+BLOCK_CHARS = 1 << 22
+
+# Columns with a longer distinct value get no trigram postings: search scans them instead
+MAX_GRAM_KEY_CHARS = 256
+
+
+def position_dtype(row_count):
+    return np.int32 if row_count < 2 ** 31 else np.int64
+
+
+def sorted_index(values, present, row_count):
+    """Present values in ascending order with the row each came from"""
+    rows = np.flatnonzero(present)
+    order = rows[np.argsort(values[rows], kind='stable')].astype(position_dtype(row_count))
+    return {'kind': SORTED, 'values': values[order], 'rows': order}
+
+
+def inverted_index(series, row_count):
+    """Rows of each distinct lowercased value, as the categorical filters compare them, or None
+    for columns with too many distinct values
+
+    Missing values are indexed under '' like filters.match_text treats them. The sorted keys are
+    stored as their UTF-8 bytes end to end ('key_data') and where each one starts ('key_offsets').
+    """
+    codes, uniques = pd.factorize(series)
+    if len(uniques) > MAX_DISTINCT_RATIO * row_count:
+        return None
+    labels = np.append(pd.Index(uniques).astype(str).str.lower().to_numpy(dtype=object), '')
+    codes = np.where(codes < 0, len(labels) - 1, codes)
+    # Lowercasing can merge distinct values; group rows by their final key
+    keys, inverse = np.unique(labels, return_inverse=True)
+    codes = inverse[codes]
+    rows = np.argsort(codes, kind='stable').astype(position_dtype(row_count))
+    offsets = np.searchsorted(codes[rows], np.arange(len(keys) + 1))
+    return {'kind': INVERTED, **encode_keys(keys), 'offsets': offsets, 'rows': rows}
+
+
+def encode_keys(keys):
+    """Strings as their UTF-8 bytes end to end, and the offset of each one"""
+    data = [key.encode() for key in keys]
+    lengths = np.fromiter(map(len, data), dtype=np.int64, count=len(data))
+    return {'key_data': np.frombuffer(b''.join(data), dtype=np.uint8),
+            'key_offsets': np.append(0, np.cumsum(lengths))}
+
+
+class IndexKeys:
+    """The sorted distinct keys of an inverted index, decoded on demand
+
+    UTF-8 bytes sort in code point order, so the encoded keys can be binary searched as they are.
+    """
+
+    def __init__(self, index):
+        self.data = index['key_data']
+        self.offsets = index['key_offsets']
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def find(self, value):
+        """Id of the key equal to value, or None"""
+        encoded = value.encode()
+        i = bisect.bisect_left(self, encoded)
+        return i if i < len(self) and self[i] == encoded else None
+
+    def text(self, ids):
+        """The keys with the given ids, as strings"""
+        return np.array([self[i].decode() for i in ids], dtype=object)
+
+
+def key_chars(keys):
+    """(key count, width) matrix of each key's code points, zero-padded"""
+    keys = np.asarray(keys, dtype=str)
+    width = keys.dtype.itemsize // 4
+    return keys.view(np.uint32).reshape(len(keys), width) if width else np.zeros((len(keys), 0), np.uint32)
+
+
+def encode_grams(chars):
+    """Trigram codes at every position of a code point matrix, and where they are complete"""
+    chars = chars.astype(np.int64)
+    codes = (chars[:, :-2] << (2 * CODE_BITS)) | (chars[:, 1:-1] << CODE_BITS) | chars[:, 2:]
+    return codes, chars[:, 2:] != 0
+
+
+def gram_index(keys):
+    """Trigram postings over the distinct keys of an inverted index
+
+    Returns arrays to add to the index: sorted distinct trigram codes ('grams'), the ids of the keys
+    holding each one ('gram_keys', split by 'gram_offsets') and the keys too short for a trigram.
+    """
+    lengths = np.fromiter(map(len, keys), dtype=np.int64, count=len(keys))
+    width = int(lengths.max()) if len(keys) else 0
+    short_keys = np.flatnonzero(lengths < GRAM)
+    if width < GRAM:
+        empty = np.array([], dtype=np.int64)
+        return {'grams': empty, 'gram_offsets': np.zeros(1, dtype=np.int64),
+                'gram_keys': empty.astype(np.int32), 'short_keys': short_keys.astype(np.int32)}
+
+    codes, key_ids = [], []
+    block = max(1, BLOCK_CHARS // width)
+    for start in range(0, len(keys), block):
+        block_codes, present = encode_grams(key_chars(keys[start:start + block]))
+        rows, _ = np.nonzero(present)
+        codes.append(block_codes[present])
+        key_ids.append(rows + start)
+    codes = np.concatenate(codes)
+    key_ids = np.concatenate(key_ids).astype(np.int32)
+
+    # Each (trigram, key) pair once, ordered by trigram then key
+    order = np.lexsort((key_ids, codes))
+    codes, key_ids = codes[order], key_ids[order]
+    first = np.ones(len(codes), dtype=bool)
+    first[1:] = (codes[1:] != codes[:-1]) | (key_ids[1:] != key_ids[:-1])
+    codes, key_ids = codes[first], key_ids[first]
+    grams, starts = np.unique(codes, return_index=True)
+    return {
+        'grams': grams,
+        'gram_offsets': np.append(starts, len(codes)).astype(np.int64),
+        'gram_keys': key_ids,
+        'short_keys': short_keys.astype(np.int32)
+    }
+
+
+def build_column_index(name, series, date_columns):
+    """Index for one column, or None for columns filters cannot use an index on"""
+    row_count = len(series)
+    if pd.api.types.is_bool_dtype(series):
+        return None
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype=float, na_value=np.nan)
+        return sorted_index(values, ~np.isnan(values), row_count)
+    if name in date_columns:
+        dates = parse_dates(series)
+        if not pd.api.types.is_datetime64_dtype(dates):
+            return None  # timezone-aware or unparseable
+        values = dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        return {**sorted_index(values, dates.notna().to_numpy(), row_count), 'date': True}
+    index = inverted_index(series, row_count)
+    if index is None:
+        return None
+    keys = IndexKeys(index)
+    keys = keys.text(range(len(keys)))
+    if max(map(len, keys)) > MAX_GRAM_KEY_CHARS:
+        return index
+    return {**index, **gram_index(keys)}
+
+
+def build_indexes(read_column, columns):
+    """Index every column of a dataset, reading one column at a time with read_column(name)
+
+    Returns {'row_count': rows indexed, 'columns': {column: index}}.
+    """
+    date_columns = set(get_date_columns(columns))
+    indexes = {'row_count': None, 'columns': {}}
+    for name in columns:
+        series = read_column(name)
+        indexes['row_count'] = len(series)
+        index = build_column_index(name, series, date_columns)
+        if index is not None:
+            indexes['columns'][name] = index
+    return indexes
+
+
+def sorted_range(index, low=None, high=None):
+    """Bounds of the slice of a sorted index with low <= value <= high"""
+    start = np.searchsorted(index['values'], low, side='left') if low is not None else 0
+    stop = np.searchsorted(index['values'], high, side='right') if high is not None else len(index['values'])
+    return start, max(start, stop)
+
+
+def sorted_lookup(index, low=None, high=None):
+    """(row count, rows) with low <= value <= high"""
+    start, stop = sorted_range(index, low, high)
+    return stop - start, lambda: index['rows'][start:stop]
+
+
+def inverted_lookup(index, wanted):
+    """(row count, rows) whose lowercased value is one of wanted"""
+    keys = IndexKeys(index)
+    found = np.array(sorted(i for i in map(keys.find, wanted) if i is not None), dtype=np.int64)
+    offsets = index['offsets']
+    count = int((offsets[found + 1] - offsets[found]).sum())
+    return count, lambda: np.concatenate([index['rows'][offsets[i]:offsets[i + 1]] for i in found]) \
+        if len(found) else index['rows'][:0]
+
+
+def date_bounds(filters):
+    """start_date/end_date as nanosecond timestamps, stopping at the first bound filter_mask rejects"""
+    bounds = {}
+    for key in ('start_date', 'end_date'):
+        if not filters.get(key):
+            continue
+        try:
+            bound = pd.to_datetime(filters[key])
+        except (ValueError, TypeError):
+            break
+        if bound is pd.NaT or bound.tzinfo is not None:
+            break
+        bounds[key] = bound.value
+    return bounds
+
+
+def range_bounds(filter_value):
+    """min/max of a range filter as floats, skipping bounds filter_mask skips"""
+    bounds = {}
+    for key in ('min', 'max'):
+        if filter_value.get(key) is None:
+            continue
+        try:
+            bounds[key] = float(filter_value[key])
+        except (ValueError, TypeError):
+            continue
+    return bounds
+
+
+def predicate_lookups(indexes, filters, columns, df_columns):
+    """(row count, rows) for each filter an index can answer; rows is called on demand
+
+    Only filters that filters.filter_mask would apply are considered, so each lookup returns
+    a superset of the matching rows.
+    """
+    lookups = []
+
+    if filters.get('start_date') or filters.get('end_date'):
+        bounds = date_bounds(filters)
+        for col in get_date_columns(columns):
+            index = indexes.get(col)
+            if bounds and col in df_columns and index is not None and index.get('date'):
+                lookups.append(sorted_lookup(index, bounds.get('start_date'), bounds.get('end_date')))
+
+    for column_name, filter_value in filters.items():
+        if column_name in ('start_date', 'end_date') or column_name not in columns \
+                or column_name not in df_columns or is_empty_filter(filter_value):
+            continue
+        index = indexes.get(column_name)
+        if index is None:
+            continue
+
+        if isinstance(filter_value, dict):
+            bounds = range_bounds(filter_value)
+            if index['kind'] == SORTED and not index.get('date') and bounds:
+                lookups.append(sorted_lookup(index, bounds.get('min'), bounds.get('max')))
+        elif filter_value and index['kind'] == INVERTED:
+            if isinstance(filter_value, list):
+                wanted = {str(v).lower() for v in filter_value}
+                if 'all' in wanted:
+                    continue
+            else:
+                wanted = {str(filter_value).lower()}
+            lookups.append(inverted_lookup(index, wanted))
+    return lookups
+
+
+def plan_candidates(indexes, filters, columns, df):
+    """Rows to check for a filter, from its most selective indexed predicate, or None to scan all"""
+    return candidate_rows(indexes, filters, columns, len(df), df.columns)
+
+
+def candidate_rows(indexes, filters, columns, row_count, available):
+    """Sorted candidate rows of a dataset with row_count rows, of which the available columns are loaded"""
+    if not indexes or not filters or indexes['row_count'] != row_count:
+        return None
+    lookups = predicate_lookups(indexes['columns'], filters, columns, available)
+    if not lookups:
+        return None
+    count, rows = min(lookups, key=lambda lookup: lookup[0])
+    if count > MAX_SELECTIVITY * row_count:
+        return None
+    return np.sort(rows())
+
+
+def add_zone_maps(indexes, group_starts, group_rows):
+    """Add the earliest and latest date in each row group to the date column indexes
+
+    group_starts and group_rows give each row group's first row and live row count, as
+    storage.DatasetLayout numbers them. Groups without dates get an empty range.
+    """
+    row_count = indexes['row_count']
+    nonempty = np.flatnonzero(group_rows > 0)
+    for index in indexes['columns'].values():
+        if not index.get('date'):
+            continue
+        lowest = np.full(row_count, np.iinfo(np.int64).max)
+        highest = np.full(row_count, np.iinfo(np.int64).min)
+        lowest[index['rows']] = index['values']
+        highest[index['rows']] = index['values']
+        zone_min = np.full(len(group_rows), np.iinfo(np.int64).max)
+        zone_max = np.full(len(group_rows), np.iinfo(np.int64).min)
+        if len(nonempty):
+            zone_min[nonempty] = np.minimum.reduceat(lowest, group_starts[nonempty])
+            zone_max[nonempty] = np.maximum.reduceat(highest, group_starts[nonempty])
+        index['zone_min'] = zone_min
+        index['zone_max'] = zone_max
+    return indexes
+
+
+def indexed_filter_mask(indexes, df, filters, columns, scan=filter_mask):
+    """filters.filter_mask, checking only the candidate rows of the most selective index
+
+    The candidates are filtered with the full filter spec, so the result is the same as a scan.
+    scan(df, filters, columns) evaluates the spec, on all rows or on the candidates.
+    """
+    candidates = plan_candidates(indexes, filters, columns, df)
+    if candidates is None:
+        return scan(df, filters, columns)
+    mask = np.zeros(len(df), dtype=bool)
+    subset = df.iloc[candidates]
+    mask[candidates[scan(subset, filters, columns)]] = True
+    return mask
@@ -0,0 +1,158 @@
+"""
+Glimpsy - Streaming Dataset Ingestion
+Reads uploaded CSV/Parquet files in chunks and writes them to the columnar store in bounded memory
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from storage import ROW_GROUP_ROWS, staging_path, discard_staged
+from column_profile import DatasetProfiler
+
+# Rows sampled to estimate the in-memory size of one row
+SAMPLE_ROWS = 1000
+
+# Parsing, dtype conversion and the Arrow copy hold a chunk several times over
+CHUNK_OVERHEAD = 4
+
+MIN_CHUNK_ROWS = 1000
+
+
+def estimate_chunk_rows(file_path, memory_budget):
+    """Number of CSV rows per chunk that keeps a chunk within memory_budget bytes"""
+    sample = pd.read_csv(file_path, nrows=SAMPLE_ROWS)
+    if len(sample) == 0:
+        return MIN_CHUNK_ROWS
+    row_bytes = max(1, sample.memory_usage(index=False, deep=True).sum() / len(sample))
+    return max(MIN_CHUNK_ROWS, int(memory_budget // (row_bytes * CHUNK_OVERHEAD)))
+
+
+def promote_dtype(current, new):
+    """Widen two chunk dtypes to one that holds both, as a whole-file pd.read_csv would"""
+    if current is None or current == new:
+        return new
+    if pd.api.types.is_numeric_dtype(current) and pd.api.types.is_numeric_dtype(new) \
+            and not pd.api.types.is_bool_dtype(current) and not pd.api.types.is_bool_dtype(new):
+        return np.dtype('float64')
+    return np.dtype('object')
+
+
+def infer_csv_dtypes(file_path, chunk_rows):
+    """First pass: agree on one dtype per column across all chunks"""
+    dtypes = {}
+    for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+        for col, dtype in chunk.dtypes.items():
+            dtypes[col] = promote_dtype(dtypes.get(col), dtype)
+    return dtypes
+
+
+def arrow_schema(df):
+    """Arrow schema for a chunk, storing text and all-missing columns as strings"""
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type) or df[field.name].dtype == object:
+            schema = schema.set(i, pa.field(field.name, pa.string()))
+    return schema.remove_metadata()
+
+
+def ingest_csv(file_path, target, memory_budget, profiler, on_progress=None):
+    """Stream a CSV file into a Parquet file, one row group per chunk"""
+    chunk_rows = estimate_chunk_rows(file_path, memory_budget)
+    dtypes = infer_csv_dtypes(file_path, chunk_rows)
+
+    writer = None
+    row_count = 0
+    frame_dtypes = None
+    try:
+        for chunk in pd.read_csv(file_path, chunksize=chunk_rows, dtype=dtypes):
+            chunk.columns = [str(col) for col in chunk.columns]
+            if writer is None:
+                schema = arrow_schema(chunk)
+                frame_dtypes = chunk.dtypes
+                writer = pq.ParquetWriter(target, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False), row_group_size=ROW_GROUP_ROWS)
+            profiler.update(chunk)
+            row_count += len(chunk)
+            if on_progress:
+                on_progress(row_count)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        # Header-only file: no chunks were produced
+        empty = pd.read_csv(file_path, nrows=0)
+        empty.columns = [str(col) for col in empty.columns]
+        empty.to_parquet(target, index=False)
+        profiler.update(empty)
+        frame_dtypes = empty.dtypes
+
+    return frame_dtypes, row_count
+
+
+def ingest_parquet(file_path, target, memory_budget, profiler, on_progress=None):
+    """Copy a Parquet file into the store batch by batch, keeping its schema
+
+    Unnamed index levels pandas stored as __index_level_N__ columns are dropped; named indexes are
+    kept as ordinary columns.
+    """
+    source = pq.ParquetFile(file_path)
+    index_columns = (source.schema_arrow.pandas_metadata or {}).get('index_columns', [])
+    unnamed = {col for col in index_columns if isinstance(col, str) and col.startswith('__index_level_')}
+    schema = pa.schema([field for field in source.schema_arrow if field.name not in unnamed])
+    row_bytes = 1
+    if source.metadata.num_row_groups:
+        group = source.metadata.row_group(0)
+        row_bytes = max(1, group.total_byte_size // max(1, group.num_rows))
+    batch_rows = max(MIN_CHUNK_ROWS, int(memory_budget // (row_bytes * CHUNK_OVERHEAD)))
+
+    row_count = 0
+    with pq.ParquetWriter(target, schema) as writer:
+        for batch in source.iter_batches(batch_size=batch_rows, columns=schema.names):
+            # Without the pandas metadata, so index columns are profiled like the others
+            batch = pa.RecordBatch.from_arrays(batch.columns, schema=schema)
+            writer.write_batch(batch, row_group_size=ROW_GROUP_ROWS)
+            profiler.update(batch.to_pandas())
+            row_count += batch.num_rows
+            if on_progress:
+                on_progress(row_count)
+
+    if row_count == 0:
+        profiler.update(schema.empty_table().to_pandas())
+
+    return schema.empty_table().to_pandas().dtypes, row_count
+
+
+def ingest_file(file_path, file_ext, memory_budget, on_progress=None):
+    """Stream an uploaded file into a staged Parquet file
+
+    Returns a dict with columns, column_types, row_count, profile, profiler and staging_path.
+    The staged file is moved into place with storage.commit_staged once the dataset row exists.
+    """
+    target = staging_path()
+    profiler = DatasetProfiler()
+    try:
+        if file_ext == 'csv':
+            dtypes, row_count = ingest_csv(file_path, target, memory_budget, profiler, on_progress)
+        elif file_ext == 'parquet':
+            dtypes, row_count = ingest_parquet(file_path, target, memory_budget, profiler, on_progress)
+        else:
+            raise ValueError(f'Unsupported file type: {file_ext}')
+    except Exception:
+        discard_staged(target)
+        raise
+
+    column_types = {str(col): str(dtype) for col, dtype in dtypes.items()}
+    profile = profiler.result()
+    for col, column_profile in profile['columns'].items():
+        column_profile['dtype'] = column_types.get(col, column_profile['dtype'])
+
+    return {
+        'columns': [str(col) for col in dtypes.index],
+        'column_types': column_types,
+        'row_count': row_count,
+        'profile': profile,
+        'profiler': profiler,
+        'staging_path': target
+    }
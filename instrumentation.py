@@ -0,0 +1,169 @@
+"""
+Glimpsy - Request Instrumentation
+Per-request phase timings, Prometheus metrics, Server-Timing headers and slow-request cProfile dumps
+"""
+
+import os
+import time
+import random
+import cProfile
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+import db
+
+# Histogram buckets in seconds
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+def escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one series per label set"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            buckets, count, total = self.series.get(labels, ([0] * len(BUCKETS), 0, 0.0))
+            buckets = [n + (value <= bound) for n, bound in zip(buckets, BUCKETS)]
+            self.series[labels] = (buckets, count + 1, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted(self.series.items())
+        for labels, (buckets, count, total) in series:
+            label_text = ','.join(f'{name}="{escape(value)}"' for name, value in zip(self.label_names, labels))
+            for bound, n in zip(BUCKETS, buckets):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    'glimpsy_request_duration_seconds', 'Time spent handling a request',
+    ('endpoint', 'method', 'status')
+)
+PHASE_SECONDS = Histogram(
+    'glimpsy_request_phase_seconds', 'Time spent in each phase of a request',
+    ('endpoint', 'phase')
+)
+
+
+def record_phase(name, seconds):
+    """Add time to a phase of the current request; a no-op outside requests"""
+    if has_request_context() and hasattr(g, 'phases'):
+        g.phases[name] = g.phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    """Time a block as one phase of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+
+def timed(name):
+    """Decorator timing every call of a function as a request phase"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing(phases, total):
+    """Server-Timing header value, durations in milliseconds"""
+    entries = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in phases.items()]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def gauge(name, help_text, value):
+    """Exposition lines for a single unlabelled gauge"""
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value}']
+
+
+def render_metrics(extra_lines=()):
+    """Prometheus text exposition of all request metrics"""
+    lines = REQUEST_SECONDS.render() + PHASE_SECONDS.render() + list(extra_lines)
+    return '\n'.join(lines) + '\n'
+
+
+def timed_json_provider(base):
+    """Subclass of a JSON provider class that counts jsonify's encoding as the serialize phase"""
+    class TimedJSONProvider(base):
+        def response(self, *args, **kwargs):
+            with phase('serialize'):
+                return super().response(*args, **kwargs)
+    return TimedJSONProvider
+
+
+def init_instrumentation(app):
+    """Register the timing hooks on a Flask app
+
+    Settings (app.config): SERVER_TIMING adds a Server-Timing header to every response;
+    PROFILE_SLOW_MS enables cProfile and keeps dumps of requests slower than it, for a
+    PROFILE_SAMPLE_RATE share of requests, in PROFILE_DIR.
+    """
+    app.json = timed_json_provider(type(app.json))(app)
+    db.query_hook = lambda seconds: record_phase('db', seconds)
+
+    @app.before_request
+    def start_request_timer():
+        g.phases = {}
+        g.profiler = None
+        if app.config.get('PROFILE_SLOW_MS') is not None \
+                and random.random() < app.config.get('PROFILE_SAMPLE_RATE', 1.0):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def finish_request_timer(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        phases = g.get('phases', {})
+
+        REQUEST_SECONDS.observe((endpoint, request.method, str(response.status_code)), total)
+        for name, seconds in phases.items():
+            PHASE_SECONDS.observe((endpoint, name), seconds)
+
+        if app.config.get('SERVER_TIMING'):
+            response.headers['Server-Timing'] = server_timing(phases, total)
+
+        profiler = g.get('profiler')
+        if profiler is not None:
+            profiler.disable()
+            if total * 1000 >= app.config['PROFILE_SLOW_MS']:
+                save_profile(profiler, app.config.get('PROFILE_DIR', 'profiles'), endpoint, total)
+        return response
+
+
+def save_profile(profiler, folder, endpoint, total):
+    """Write a cProfile dump named after the endpoint and duration"""
+    os.makedirs(folder, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(folder, f'{stamp}_{endpoint}_{int(total * 1000)}ms_{os.getpid()}.prof')
+    profiler.dump_stats(path)
+    return path
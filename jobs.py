@@ -0,0 +1,62 @@
+"""
+Glimpsy - Background Ingestion Jobs
+Job records live in SQLite so their status survives the worker thread that ran them
+"""
+
+import uuid
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+def create_jobs_table(cursor):
+    """Create the ingest_jobs table"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            filename TEXT,
+            status TEXT NOT NULL,
+            rows_processed INTEGER DEFAULT 0,
+            dataset_id INTEGER,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def fail_interrupted_jobs(cursor):
+    """Mark jobs that were still queued or running when the server stopped as failed"""
+    cursor.execute('''
+        UPDATE ingest_jobs SET status = ?, error = 'Interrupted by server restart',
+                               updated_at = CURRENT_TIMESTAMP
+        WHERE status IN (?, ?)
+    ''', (JOB_FAILED, JOB_QUEUED, JOB_RUNNING))
+
+
+def create_job(conn, kind, filename=None):
+    """Insert a queued job and return its id"""
+    job_id = uuid.uuid4().hex
+    conn.execute('''
+        INSERT INTO ingest_jobs (id, kind, filename, status) VALUES (?, ?, ?, ?)
+    ''', (job_id, kind, filename, JOB_QUEUED))
+    conn.commit()
+    return job_id
+
+
+def update_job(conn, job_id, **fields):
+    """Update status, rows_processed, dataset_id or error of a job"""
+    assignments = ', '.join(f'{key} = ?' for key in fields)
+    conn.execute(f'''
+        UPDATE ingest_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?
+    ''', (*fields.values(), job_id))
+    conn.commit()
+
+
+def get_job(conn, job_id):
+    """Fetch a job as a dict, or None"""
+    job = conn.execute('SELECT * FROM ingest_jobs WHERE id = ?', (job_id,)).fetchone()
+    return dict(job) if job else None
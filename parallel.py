@@ -0,0 +1,71 @@
+"""
+Glimpsy - Partition-Parallel Query Execution
+Splits a dataset frame into row partitions, evaluates filters and partial aggregates on a shared
+thread pool and merges the results, running serially when a frame is too small to be worth splitting
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from filters import date_formats, filter_mask
+
+
+class PartitionPool:
+    """Thread pool that maps a function over row partitions of a DataFrame
+
+    Threads share the frame without copying it; the speedup comes from the NumPy, pandas and
+    Arrow kernels that release the GIL while they run.
+    """
+
+    def __init__(self, workers, min_partition_rows):
+        self.workers = max(1, workers)
+        self.min_partition_rows = max(1, min_partition_rows)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.local = threading.local()
+
+    def partitions(self, row_count):
+        """(start, stop) row bounds of each partition; one partition below 2 * min_partition_rows"""
+        count = min(self.workers, row_count // self.min_partition_rows)
+        if count <= 1:
+            return [(0, row_count)]
+        bounds = np.linspace(0, row_count, count + 1).astype(int)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def get_executor(self):
+        # Created on first use, so processes forked before serving don't inherit its threads
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='glimpsy-query')
+            return self.executor
+
+    def map(self, fn, df):
+        """[fn(partition) for each row partition of df], in row order"""
+        bounds = self.partitions(len(df))
+        # A task that maps again from a pool thread would wait on itself; run it inline
+        if len(bounds) == 1 or getattr(self.local, 'in_pool', False):
+            return [fn(df)]
+
+        def run(start, stop):
+            self.local.in_pool = True
+            try:
+                return fn(df.iloc[start:stop])
+            finally:
+                self.local.in_pool = False
+
+        futures = [self.get_executor().submit(run, start, stop) for start, stop in bounds]
+        return [future.result() for future in futures]
+
+    def filter_mask(self, df, filters, columns):
+        """filters.filter_mask, evaluated per partition"""
+        formats = None
+        if filters and (filters.get('start_date') or filters.get('end_date')):
+            # Settle date formats on the whole frame, not per partition
+            formats = date_formats(df, columns)
+        return np.concatenate(self.map(lambda part: filter_mask(part, filters, columns, formats), df))
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+                self.executor = None
@@ -0,0 +1,219 @@
+"""
+Glimpsy - Lazy Query Plans
+Composes filters, projection, sort, slicing and grouping over a stored dataset, then reads only the
+columns the query uses from the row groups that can hold matching rows
+"""
+
+import copy
+import numpy as np
+import pyarrow as pa
+from filters import get_date_columns, is_empty_filter, filter_mask
+from indexes import candidate_rows, date_bounds, range_bounds
+from aggregate import aggregate_frame
+from cache import normalize_filters
+from storage import DatasetLayout, read_schema
+
+
+def filter_columns(filters, columns):
+    """Columns filters.filter_mask reads for a filter spec"""
+    needed = []
+    if filters.get('start_date') or filters.get('end_date'):
+        needed += get_date_columns(columns)
+    needed += [col for col, value in filters.items()
+               if col in columns and col not in ('start_date', 'end_date') and not is_empty_filter(value)]
+    return list(dict.fromkeys(needed))
+
+
+def merge_columns(*groups):
+    return list(dict.fromkeys(col for group in groups for col in group))
+
+
+class Query:
+    """A lazily composed read of one stored dataset
+
+    Builder methods return a new query and read nothing. rows(), frame() and aggregate() run it:
+    row groups whose statistics rule out the filters are skipped, filter columns are read first,
+    and other columns are read only for the rows that are returned.
+    """
+
+    def __init__(self, dataset_id, columns, indexes=None, masks=None, scan=filter_mask):
+        self.dataset_id = dataset_id
+        self.columns = list(columns)
+        self.indexes = indexes  # column indexes, for candidate rows and date zone maps
+        self.masks = masks  # cache with get_mask/put_mask, shared with in-memory filtering
+        self.scan = scan
+        self.filters = {}
+        self.projection = None
+        self.sort = []
+        self.offset = 0
+        self.limit = None
+        self.grouping = None
+        self.layout = None
+        self.stats = {}
+
+    def derive(self, **changes):
+        query = copy.copy(self)
+        query.__dict__.update(changes)
+        query.stats = {}
+        return query
+
+    def where(self, filters):
+        return self.derive(filters=filters or {})
+
+    def select(self, columns):
+        return self.derive(projection=list(columns) if columns else None)
+
+    def order_by(self, sort):
+        """sort: [(column, ascending)], applied stably like DataFrame.sort_values"""
+        return self.derive(sort=list(sort or []))
+
+    def slice(self, offset=0, limit=None):
+        return self.derive(offset=offset, limit=limit)
+
+    def group_by(self, group_by=None, metrics=None, time_bucket=None):
+        """Group-by, metrics and time bucket as aggregate.aggregate_frame takes them"""
+        return self.derive(grouping={'group_by': group_by, 'metrics': metrics, 'time_bucket': time_bucket})
+
+    def get_layout(self):
+        if self.layout is None:
+            self.layout = DatasetLayout(self.dataset_id)
+        return self.layout
+
+    def current_indexes(self, layout):
+        """The indexes if they were built from the layout's files; stale zone maps or candidate
+        rows would skip matching rows"""
+        if self.indexes is not None and self.indexes.get('signature') == layout.signature:
+            return self.indexes
+        return None
+
+    def prune_groups(self, layout):
+        """Row groups that can hold matching rows, judged from statistics without reading rows"""
+        keep = layout.group_rows > 0
+        schema = read_schema(self.dataset_id)
+        for col, value in self.filters.items():
+            if col not in self.columns or not isinstance(value, dict) or is_empty_filter(value):
+                continue
+            field_type = schema.field(col).type
+            if not (pa.types.is_integer(field_type) or pa.types.is_floating(field_type)):
+                continue
+            bounds = range_bounds(value)
+            if not bounds:
+                continue
+            mins, maxs = layout.group_statistics(col)
+            # NaN statistics compare False, so groups without them are kept
+            if 'min' in bounds:
+                keep &= ~(maxs < bounds['min'])
+            if 'max' in bounds:
+                keep &= ~(mins > bounds['max'])
+
+        indexes = self.current_indexes(layout)
+        if indexes and (self.filters.get('start_date') or self.filters.get('end_date')):
+            bounds = date_bounds(self.filters)
+            for col in get_date_columns(self.columns):
+                index = indexes['columns'].get(col)
+                if index is None or 'zone_min' not in index:
+                    continue
+                if 'start_date' in bounds:
+                    keep &= index['zone_max'] >= bounds['start_date']
+                if 'end_date' in bounds:
+                    keep &= index['zone_min'] <= bounds['end_date']
+        return keep
+
+    def matching_positions(self):
+        """Live positions of the rows matching the filters, ascending, or None for every row"""
+        filter_key = normalize_filters(self.filters, self.columns)
+        if filter_key == '{}':
+            return None
+        layout = self.get_layout()
+        if self.masks is not None:
+            mask = self.masks.get_mask(self.dataset_id, filter_key)
+            if mask is not None and len(mask) == layout.row_count:
+                self.stats['source'] = 'cached mask'
+                return np.flatnonzero(mask)
+
+        keep = self.prune_groups(layout)
+        positions = layout.group_positions(keep)
+        candidates = candidate_rows(self.current_indexes(layout), self.filters, self.columns,
+                                    layout.row_count, self.columns)
+        if candidates is not None:
+            group_of = np.searchsorted(layout.group_starts, candidates, side='right') - 1
+            positions = candidates[keep[group_of]]
+
+        needed = filter_columns(self.filters, self.columns)
+        matched = positions[self.scan(layout.read(positions, needed), self.filters, self.columns)]
+        self.stats.update({
+            'source': 'storage',
+            'row_groups': layout.group_count,
+            'row_groups_read': int(np.unique(np.searchsorted(layout.group_starts, positions, side='right')).size),
+            'rows_scanned': len(positions),
+            'filter_columns': needed
+        })
+
+        if self.masks is not None:
+            mask = np.zeros(layout.row_count, dtype=bool)
+            mask[matched] = True
+            self.masks.put_mask(self.dataset_id, filter_key, mask)
+        return matched
+
+    def rows(self):
+        """(page DataFrame, matching row count): filter, sort, slice, then read the page's columns"""
+        positions = self.matching_positions()
+        layout = self.get_layout()
+        total = layout.row_count if positions is None else len(positions)
+        stop = self.offset + self.limit if self.limit is not None else None
+
+        if self.sort:
+            if positions is None:
+                positions = np.arange(layout.row_count)
+            keys = layout.read(positions, [name for name, _ in self.sort])
+            order = keys.sort_values(
+                by=[name for name, _ in self.sort],
+                ascending=[ascending for _, ascending in self.sort],
+                kind='mergesort',
+                na_position='last'
+            ).index.to_numpy()
+            page = positions[order[self.offset:stop]]
+        elif positions is None:
+            page = np.arange(min(self.offset, total), min(stop if stop is not None else total, total))
+        else:
+            page = positions[self.offset:stop]
+
+        self.stats.setdefault('source', 'storage')
+        self.stats['rows_returned'] = len(page)
+        return layout.read(page, self.projection), total
+
+    def frame(self, columns):
+        """The matching rows, with only the given columns"""
+        positions = self.matching_positions()
+        layout = self.get_layout()
+        if positions is None:
+            positions = np.arange(layout.row_count)
+        self.stats.setdefault('source', 'storage')
+        return layout.read(positions, list(columns))
+
+    def aggregate(self, map_partitions=None):
+        """(aggregate_frame result, matching row count), reading only the key and metric columns"""
+        grouping = self.grouping or {}
+        metrics = grouping.get('metrics')
+        needed = list(grouping.get('group_by') or [])
+        if isinstance(grouping.get('time_bucket'), dict):
+            needed.append(grouping['time_bucket'].get('column'))
+        if isinstance(metrics, dict):
+            needed += list(metrics)
+        elif isinstance(metrics, list):
+            needed += [metric.get('column') for metric in metrics if isinstance(metric, dict)]
+        # Unknown names, and names that aren't strings, are left for aggregate_frame to reject
+        df = self.frame(merge_columns(col for col in needed if isinstance(col, str) and col in self.columns))
+        return aggregate_frame(df, map_partitions=map_partitions, **grouping), len(df)
+
+    def explain(self):
+        """What the last run read, for the plan field of responses"""
+        return {
+            'filters': normalize_filters(self.filters, self.columns),
+            'columns': self.projection or self.columns,
+            'sort': [f"{'' if ascending else '-'}{name}" for name, ascending in self.sort],
+            'offset': self.offset,
+            'limit': self.limit,
+            'group_by': self.grouping,
+            **self.stats
+        }
@@ -0,0 +1,215 @@
+"""
+Glimpsy - What-If Rate Scenarios
+Applies basis-point rate shocks, parallel or per term/segment, to a portfolio and recomputes its interest,
+value and yield with vectorized NumPy, one pass over the rows per scenario
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+MIN_RATE = 0.001  # percent; shocked rates are floored here, as the dashboard does
+TERM_YEARS = {'days': 1 / 365, 'months': 1 / 12, 'years': 1.0}
+METRICS = ['total_principal', 'total_interest', 'total_value', 'avg_rate', 'weighted_rate', 'avg_apy']
+MAX_SCENARIOS = 1000
+
+
+def parse_model(spec, columns):
+    """Validate the rate, principal and term columns a scenario recomputes from"""
+    model = {
+        'rate_column': spec.get('rate_column'),
+        'principal_column': spec.get('principal_column'),
+        'term_column': spec.get('term_column'),
+        'term_unit': str(spec.get('term_unit', 'months')).lower(),
+        'group_by': spec.get('group_by') or None
+    }
+    for key in ('rate_column', 'principal_column', 'term_column'):
+        if not model[key]:
+            raise ValueError(f'{key} is required')
+        if model[key] not in columns:
+            raise ValueError(f'Unknown {key}: {model[key]}')
+    if model['term_unit'] not in TERM_YEARS:
+        raise ValueError(f"term_unit must be one of: {', '.join(TERM_YEARS)}")
+    if model['group_by'] is not None and model['group_by'] not in columns:
+        raise ValueError(f"Unknown group_by column: {model['group_by']}")
+    return model
+
+
+def parse_number(value, name):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+
+
+def parse_scenarios(scenarios, columns):
+    """Normalize scenario specs to {"name", "bps", "shocks"}
+
+    A scenario is a parallel shift in bps plus optional shocks, each adding bps to the rows of one
+    column by value ({"column", "values": {value: bps}}) or by range ({"column", "ranges":
+    [{"min", "max", "bps"}]}, bounds inclusive and optional).
+    """
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError('scenarios must be a non-empty list')
+    if len(scenarios) > MAX_SCENARIOS:
+        raise ValueError(f'At most {MAX_SCENARIOS} scenarios per request')
+
+    parsed = []
+    for i, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict):
+            raise ValueError('Each scenario must be an object')
+        shocks = []
+        for shock in scenario.get('shocks') or []:
+            if not isinstance(shock, dict) or shock.get('column') not in columns:
+                raise ValueError(f"Unknown shock column: {shock.get('column') if isinstance(shock, dict) else shock}")
+            if 'values' in shock:
+                if not isinstance(shock['values'], dict):
+                    raise ValueError('Shock values must map column values to bps')
+                values = {str(value): parse_number(bps, 'Shock bps') for value, bps in shock['values'].items()}
+                shocks.append({'column': shock['column'], 'values': values})
+            elif 'ranges' in shock:
+                if not isinstance(shock['ranges'], list) or not all(isinstance(b, dict) for b in shock['ranges']):
+                    raise ValueError('Shock ranges must be a list of {"min", "max", "bps"} objects')
+                ranges = []
+                for bound in shock['ranges']:
+                    ranges.append({
+                        'min': None if bound.get('min') is None else parse_number(bound['min'], 'Range min'),
+                        'max': None if bound.get('max') is None else parse_number(bound['max'], 'Range max'),
+                        'bps': parse_number(bound.get('bps'), 'Range bps')
+                    })
+                shocks.append({'column': shock['column'], 'ranges': ranges})
+            else:
+                raise ValueError('Each shock needs "values" or "ranges"')
+        parsed.append({
+            'name': str(scenario.get('name') or f'scenario_{i + 1}'),
+            'bps': parse_number(scenario.get('bps', 0), 'bps'),
+            'shocks': shocks
+        })
+    return parsed
+
+
+def scenario_columns(model, scenarios):
+    """Columns a batch of scenarios reads"""
+    columns = [model['rate_column'], model['principal_column'], model['term_column']]
+    columns += [model['group_by']] if model['group_by'] else []
+    columns += [shock['column'] for scenario in scenarios for shock in scenario['shocks']]
+    return list(dict.fromkeys(columns))
+
+
+def scenario_key(scenario):
+    """Canonical JSON of a scenario's shocks, so equal scenarios share a cached result whatever their name"""
+    return json.dumps({'bps': scenario['bps'], 'shocks': scenario['shocks']}, sort_keys=True)
+
+
+class Portfolio:
+    """The arrays every scenario over one filtered frame reuses, extracted once per request"""
+
+    def __init__(self, df, model):
+        self.df = df
+        self.rate = pd.to_numeric(df[model['rate_column']], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        principal = pd.to_numeric(df[model['principal_column']], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        term = pd.to_numeric(df[model['term_column']], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        # Rows missing any input don't count towards the totals, in any scenario
+        self.valid = ~(np.isnan(self.rate) | np.isnan(principal) | np.isnan(term))
+        self.principal = np.where(self.valid, principal, 0.0)
+        self.principal_years = np.where(self.valid, principal * term * TERM_YEARS[model['term_unit']], 0.0)
+        self.shock_cache = {}
+
+        self.groups = None
+        if model['group_by']:
+            codes, uniques = pd.factorize(df[model['group_by']], sort=True)
+            self.labels = [value.item() if isinstance(value, np.generic) else value for value in uniques]
+            self.labels += [None] if (codes < 0).any() else []
+            self.groups = np.where(codes < 0, len(uniques), codes)
+
+    def column_shock(self, shock):
+        """bps added to each row by one shock, computed once per distinct shock"""
+        key = json.dumps(shock, sort_keys=True)
+        if key in self.shock_cache:
+            return self.shock_cache[key]
+        series = self.df[shock['column']]
+        if 'values' in shock:
+            codes, uniques = pd.factorize(series)
+            if pd.api.types.is_numeric_dtype(series):
+                wanted = {}
+                for value, bps in shock['values'].items():
+                    try:
+                        wanted[float(value)] = bps
+                    except ValueError:
+                        continue
+                per_value = [wanted.get(float(value), 0.0) for value in uniques]
+            else:
+                wanted = {value.lower(): bps for value, bps in shock['values'].items()}
+                per_value = [wanted.get(str(value).lower(), 0.0) for value in uniques]
+            values = np.append(np.asarray(per_value, dtype=float), 0.0)[codes]
+        else:
+            numbers = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            values = np.zeros(len(series))
+            for bound in shock['ranges']:
+                inside = ~np.isnan(numbers)
+                if bound['min'] is not None:
+                    inside &= numbers >= bound['min']
+                if bound['max'] is not None:
+                    inside &= numbers <= bound['max']
+                values[inside] += bound['bps']
+        self.shock_cache[key] = values
+        return values
+
+    def shocked_rates(self, scenario):
+        bps = np.full(len(self.rate), scenario['bps'])
+        for shock in scenario['shocks']:
+            bps += self.column_shock(shock)
+        return np.where(self.valid, np.maximum(MIN_RATE, self.rate + bps / 100), 0.0)
+
+    def totals(self, rates, groups=None, group_count=1):
+        """Metric sums per group (one group when groups is None)"""
+        def total(weights):
+            if groups is None:
+                return np.array([weights.sum()])
+            return np.bincount(groups, weights=weights, minlength=group_count)
+
+        count = total(self.valid.astype(float))
+        principal = total(self.principal)
+        interest = total(self.principal_years * rates / 100)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            apy = np.where(self.valid, (1 + rates / 100) ** 12 - 1, 0.0)
+            return {
+                'row_count': count.astype(int),
+                'total_principal': principal,
+                'total_interest': interest,
+                'total_value': principal + interest,
+                'avg_rate': total(rates) / count,
+                'weighted_rate': total(self.principal * rates) / principal,
+                'avg_apy': total(apy) / count
+            }
+
+    def evaluate(self, scenario):
+        """Metrics of one scenario, overall and per group"""
+        rates = self.shocked_rates(scenario)
+        result = {'metrics': metric_values(self.totals(rates), 0)}
+        if self.groups is not None:
+            totals = self.totals(rates, self.groups, len(self.labels))
+            result['groups'] = [{'group': label, **metric_values(totals, i)} for i, label in enumerate(self.labels)]
+        return result
+
+
+def metric_values(totals, i):
+    """JSON-ready metrics at one position, with undefined averages as None"""
+    values = {}
+    for name, array in totals.items():
+        value = array[i].item()
+        values[name] = None if isinstance(value, float) and not np.isfinite(value) else value
+    return values
+
+
+def with_deltas(result, base):
+    """Add each metric's change from the unshocked base to a scenario result"""
+    def delta(metrics, base_metrics):
+        return {name: (None if metrics[name] is None or base_metrics[name] is None
+                       else metrics[name] - base_metrics[name]) for name in METRICS}
+
+    result = {**result, 'delta': delta(result['metrics'], base['metrics'])}
+    if 'groups' in result:
+        result['groups'] = [{**group, 'delta': delta(group, base_group)}
+                            for group, base_group in zip(result['groups'], base['groups'])]
+    return result
@@ -0,0 +1,153 @@
+"""
+Glimpsy - Row Search
+Case-insensitive substring search across every column of a dataset, matching values as the browser's
+table shows them. Categorical text columns use trigram postings over the distinct values in their
+inverted index, so only values sharing the query's trigrams are checked; other columns, including
+free text, check each distinct value.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from indexes import GRAM, CODE_BITS, CODE_MASK, IndexKeys, key_chars, encode_grams
+
+
+def contains(keys, query):
+    """Mask of the keys containing query"""
+    return np.fromiter((query in key for key in keys), dtype=bool, count=len(keys))
+
+
+def postings(index, position):
+    offsets = index['gram_offsets']
+    return index['gram_keys'][offsets[position]:offsets[position + 1]]
+
+
+def matching_keys(index, query):
+    """Ids of the distinct keys of an inverted index that contain query"""
+    keys = IndexKeys(index)
+    grams = index['grams']
+    short = index['short_keys']
+    short = short[contains(keys.text(short), query)]
+    if len(query) < GRAM:
+        # Any longer key holding the query holds it inside one of its trigrams
+        chars = [(grams >> (shift * CODE_BITS)) & CODE_MASK for shift in (2, 1, 0)]
+        wanted = [ord(c) for c in query]
+        hit = np.zeros(len(grams), dtype=bool)
+        for first in range(GRAM - len(query) + 1):
+            match = np.ones(len(grams), dtype=bool)
+            for i, code in enumerate(wanted):
+                match &= chars[first + i] == code
+            hit |= match
+        found = [postings(index, position) for position in np.flatnonzero(hit)]
+        return np.union1d(short, np.unique(np.concatenate(found))) if found else short
+
+    codes, _ = encode_grams(key_chars(np.array([query])))
+    codes = np.unique(codes)
+    positions = np.searchsorted(grams, codes)
+    if (positions >= len(grams)).any() or (grams[np.minimum(positions, len(grams) - 1)] != codes).any():
+        return short
+    lists = sorted((postings(index, position) for position in positions), key=len)
+    candidates = lists[0]
+    for other in lists[1:]:
+        # Postings are sorted: look up the few candidates rather than merging whole lists
+        found = np.searchsorted(other, candidates)
+        candidates = candidates[other[np.minimum(found, len(other) - 1)] == candidates]
+    if len(query) > GRAM:
+        # Sharing every trigram doesn't mean holding them in order
+        candidates = candidates[contains(keys.text(candidates), query)]
+    return np.union1d(short, candidates)
+
+
+def gather_rows(index, key_ids):
+    """Rows of the given keys of an inverted index, concatenated"""
+    offsets = index['offsets']
+    starts = offsets[key_ids].astype(np.int64)
+    lengths = offsets[key_ids + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.array([], dtype=np.int64)
+    # Positions starts[i], ..., starts[i] + lengths[i] - 1 for each key, without a loop
+    shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return index['rows'][np.arange(total) + shifts]
+
+
+# Any part of a number's or a date's text, such as '1.5', '5e-0' or '-01 12:3'
+NUMBER_TEXT = re.compile(r'[-+]?\d*\.?\d*(e[-+]?\d*)?')
+DATE_TEXT = re.compile(r'[\d\-: ]*')
+DAY_NS = 86400 * 10 ** 9
+
+
+def search_columns(df, columns):
+    """Columns searched: every stored column"""
+    return [col for col in columns if col in df.columns]
+
+
+def value_text(uniques):
+    """Lowercased text of distinct values as the table shows them: dates as the API formats them,
+    whole floats without a decimal point, like JavaScript prints them"""
+    values = pd.Index(uniques)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if values.tz is not None:
+            values = values.tz_localize(None)
+        stamps = values.to_numpy(dtype='datetime64[ns]')
+        midnight = stamps.view(np.int64) % DAY_NS == 0
+        text = np.datetime_as_string(stamps, unit='s').astype(object)
+        text[midnight] = np.datetime_as_string(stamps[midnight], unit='D')
+        return pd.Index(text).str.replace('T', ' ', regex=False)
+    if pd.api.types.is_float_dtype(values):
+        numbers = values.to_numpy(dtype=float)
+        whole = np.isfinite(numbers) & (np.abs(numbers) < 2 ** 53) & (numbers == np.floor(numbers))
+        text = numbers.astype(object)
+        text[whole] = numbers[whole].astype(np.int64).astype(str)
+        text[~whole] = numbers[~whole].astype(str)
+        return pd.Index(text)
+    return values.astype(str).str.lower()
+
+
+def scan_column(series, query):
+    """Mask of a column's rows whose text contains query, checking each distinct value once"""
+    numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+    dates = pd.api.types.is_datetime64_any_dtype(series)
+    if (numeric and not NUMBER_TEXT.fullmatch(query)) or (dates and not DATE_TEXT.fullmatch(query)):
+        return np.zeros(len(series), dtype=bool)
+    codes, uniques = pd.factorize(series)
+    hits = value_text(uniques).str.contains(query, regex=False)
+    return np.append(hits, False)[codes]
+
+
+def normalize_query(query):
+    return str(query or '').strip().lower()
+
+
+def indexed_search(indexes, df, query, columns):
+    """Sorted rows with a value containing query, from the trigram postings of text columns
+
+    Columns without them (numbers, dates, booleans, free text) are scanned. Returns None when the indexes are
+    missing or don't cover the current rows.
+    """
+    if not indexes or indexes['row_count'] != len(df):
+        return None
+    found = []
+    for col in search_columns(df, columns):
+        index = indexes['columns'].get(col)
+        if index is not None and 'grams' in index:
+            found.append(gather_rows(index, matching_keys(index, query)))
+        else:
+            found.append(np.flatnonzero(scan_column(df[col], query)))
+    return np.unique(np.concatenate(found)) if found else np.array([], dtype=np.int64)
+
+
+def search_mask(df, query, columns):
+    """Mask of rows with a value containing query, by scanning each column's distinct values"""
+    mask = np.zeros(len(df), dtype=bool)
+    for col in search_columns(df, columns):
+        mask |= scan_column(df[col], query)
+    return mask
+
+
+def search_rows(indexes, df, query, columns):
+    """Sorted positions of the rows of df matching query, using indexes when they are current"""
+    rows = indexed_search(indexes, df, query, columns)
+    if rows is None:
+        rows = np.flatnonzero(search_mask(df, query, columns))
+    return rows
@@ -0,0 +1,128 @@
+"""
+Glimpsy - Production Server
+Pre-forks worker processes that accept connections on one shared socket. Workers load datasets
+lazily and memory-map them, so loaded data is shared between workers instead of copied
+
+Usage: python serve.py --workers 8 --port 5000
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+
+# Workers share datasets through memory-mapped Arrow files; must be set before app is imported
+os.environ['GLIMPSY_SHARED_FRAMES'] = 'true'
+
+import app
+from werkzeug.serving import make_server
+
+RESTART_DELAY = 1.0  # seconds between restarts of a worker that died, so a crash loop can't spin
+
+
+def listen(host, port, backlog=128):
+    """Open the listening socket every worker accepts on"""
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(host, port, sock):
+    """Serve requests with a thread per connection until told to stop"""
+    server = make_server(host, port, app.app, threaded=True, fd=sock.fileno())
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        app.ingest_executor.shutdown(wait=True)
+        app.query_pool.shutdown()
+
+
+def run_scheduler():
+    """Run the API ingestion rules; one process schedules them so no rule runs twice at once"""
+    signal.signal(signal.SIGTERM, lambda *_: app.ingestion_scheduler.stop())
+    app.ingestion_scheduler.run_forever()
+
+
+def spawn(target, *args):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            target(*args)
+        except SystemExit as e:
+            code = e.code or 0
+        except BaseException:
+            code = 1
+        os._exit(code)
+    return pid
+
+
+def serve(host, port, workers):
+    """Fork workers and keep that many running until interrupted"""
+    sock = listen(host, port)
+    children = {spawn(run_worker, host, port, sock): 'Worker' for _ in range(workers)}
+    if app.app.config['API_INGEST']:
+        children[spawn(run_scheduler)] = 'Scheduler'
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        kind = children.pop(pid, None)
+        if kind and not stopping:
+            print(f'{kind} {pid} exited; starting a replacement', file=sys.stderr)
+            time.sleep(RESTART_DELAY)
+            if kind == 'Worker':
+                children[spawn(run_worker, host, port, sock)] = kind
+            else:
+                children[spawn(run_scheduler)] = kind
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('GLIMPSY_WORKERS', os.cpu_count() or 1)))
+    args = parser.parse_args()
+
+    app.init_db()
+    print("=" * 50)
+    print("Glimpsy Production Server")
+    print("=" * 50)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} worker process(es)")
+    print("Press Ctrl+C to stop the server")
+    print("=" * 50)
+
+    if not hasattr(os, 'fork') or args.workers <= 1:
+        # No fork on Windows: one process with a thread per request
+        if app.app.config['API_INGEST']:
+            app.ingestion_scheduler.start()
+        make_server(args.host, args.port, app.app, threaded=True).serve_forever()
+        return
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == '__main__':
+    main()
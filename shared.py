@@ -0,0 +1,111 @@
+"""
+Glimpsy - Shared Memory-Mapped Datasets
+Keeps an uncompressed Arrow IPC copy of each dataset that worker processes memory-map, so their
+DataFrames point at the same page-cache pages instead of each holding a private copy
+"""
+
+import os
+import json
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from storage import STORE_FOLDER, dataset_lock, iter_batches, layout_signature, read_schema
+
+# Text stays in the mapped Arrow buffers instead of becoming per-process Python strings
+STRING_TYPES = {pa.string(): pd.StringDtype('pyarrow'), pa.large_string(): pd.StringDtype('pyarrow')}
+
+# Rows read at a time while copying a column into the Arrow file
+SHARED_BATCH_ROWS = 65536
+
+
+def shared_path(dataset_id):
+    return os.path.join(STORE_FOLDER, f'{dataset_id}.arrow')
+
+
+def shared_column(dataset_id, field):
+    """One stored column as a single Arrow chunk that converts to pandas without copies
+
+    Missing floats become NaN values rather than nulls: a column with a null bitmap has to be
+    copied to fill in NaN when it is converted to NumPy.
+    """
+    chunks = [batch.column(0) for batch in iter_batches(dataset_id, SHARED_BATCH_ROWS, [field.name])]
+    array = pa.chunked_array(chunks, type=field.type).combine_chunks().cast(field.type)
+    if pa.types.is_floating(field.type) and array.null_count:
+        array = pc.fill_null(array, float('nan'))
+    return array
+
+
+def write_shared(dataset_id):
+    """Write the dataset's Arrow file from its stored rows, tagged with the layout signature it
+    was made from
+
+    Every column must be one contiguous chunk: pandas joins a column split across record batches
+    into a private copy, which is what mapping the file is meant to avoid. Columns are copied
+    one at a time into their own single-chunk files, then mapped to write the one record batch,
+    so only one column is ever held in memory. Holds the dataset lock, so the files can't change
+    while they are copied.
+    """
+    with dataset_lock(dataset_id):
+        signature = layout_signature(dataset_id)
+        schema = read_schema(dataset_id).with_metadata({'glimpsy_signature': json.dumps(signature)})
+        path = shared_path(dataset_id)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        column_paths = [f'{tmp_path}.{i}' for i in range(len(schema))]
+        try:
+            columns = []
+            for field, column_path in zip(schema, column_paths):
+                array = shared_column(dataset_id, field)
+                with pa.OSFile(column_path, 'wb') as sink:
+                    with pa.ipc.new_file(sink, pa.schema([field])) as writer:
+                        writer.write_batch(pa.record_batch([array], schema=pa.schema([field])))
+                del array
+                columns.append(pa.ipc.open_file(pa.memory_map(column_path)).get_batch(0).column(0))
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    writer.write_batch(pa.record_batch(columns, schema=schema))
+            os.replace(tmp_path, path)
+        finally:
+            for column_path in column_paths + [tmp_path]:
+                if os.path.exists(column_path):
+                    os.remove(column_path)
+    return signature
+
+
+def refresh_shared(dataset_id):
+    """Rewrite a dataset's Arrow file after its rows changed, if workers have mapped it
+
+    Called by the process that changed the rows, under the dataset lock, so workers find the
+    file current instead of each rebuilding it.
+    """
+    if os.path.exists(shared_path(dataset_id)):
+        write_shared(dataset_id)
+
+
+def map_frame(dataset_id, signature):
+    """DataFrame backed by the memory-mapped Arrow file, or None if it is missing or stale"""
+    path = shared_path(dataset_id)
+    if not os.path.exists(path):
+        return None
+    source = pa.memory_map(path)
+    reader = pa.ipc.open_file(source)
+    metadata = reader.schema.metadata or {}
+    if json.loads(metadata.get(b'glimpsy_signature', b'null')) != signature:
+        return None
+    # Columns reference the mapping; it stays open for as long as the frame is alive
+    return reader.read_all().to_pandas(split_blocks=True, types_mapper=STRING_TYPES.get)
+
+
+def load_shared_frame(dataset_id, signature):
+    """Memory-map a dataset, writing its Arrow file first if it is missing or out of date"""
+    df = map_frame(dataset_id, signature)
+    if df is None:
+        with dataset_lock(dataset_id):
+            # Another worker may have written it while this one waited for the lock
+            signature = layout_signature(dataset_id)
+            df = map_frame(dataset_id, signature)
+            if df is None:
+                signature = write_shared(dataset_id)
+                df = map_frame(dataset_id, signature)
+    return df
+
@@ -0,0 +1,536 @@
+"""
+Glimpsy - Columnar Dataset Storage
+Each dataset is stored as a Parquet file, keeping the dtypes pandas inferred at upload time.
+Appended rows go to extra part files and replaced rows are masked by per-part deletion
+files until the dataset is compacted.
+"""
+
+import os
+import io
+import glob
+import json
+import uuid
+import pickle
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover threads of one process
+    fcntl = None
+
+STORE_FOLDER = 'store'
+
+# Rows per Parquet row group: small enough for row group statistics to skip most of a dataset
+ROW_GROUP_ROWS = 65536
+
+os.makedirs(STORE_FOLDER, exist_ok=True)
+
+
+def dataset_path(dataset_id):
+    """Path of the Parquet file holding a dataset's rows"""
+    return os.path.join(STORE_FOLDER, f'{dataset_id}.parquet')
+
+
+def part_paths(dataset_id):
+    """Files holding a dataset's rows, in row order: the base file, then appended parts"""
+    parts = sorted(glob.glob(os.path.join(STORE_FOLDER, f'{dataset_id}.part-*.parquet')))
+    return [dataset_path(dataset_id)] + parts
+
+
+def next_part_path(dataset_id):
+    """Path for the next appended part of a dataset"""
+    parts = part_paths(dataset_id)[1:]
+    number = int(parts[-1].rsplit('.part-', 1)[1].split('.')[0]) + 1 if parts else 1
+    return os.path.join(STORE_FOLDER, f'{dataset_id}.part-{number:04d}.parquet')
+
+
+def deleted_path(part_path):
+    """Sidecar file listing the row positions of a part that were replaced"""
+    return part_path[:-len('.parquet')] + '.deleted.npy'
+
+
+def read_deleted(part_path):
+    """Sorted deleted row positions of a part, or None when none were deleted"""
+    path = deleted_path(part_path)
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+
+def write_deleted(part_path, positions):
+    """Add row positions to a part's deletion file"""
+    existing = read_deleted(part_path)
+    if existing is not None:
+        positions = np.concatenate([existing, positions])
+    path = deleted_path(part_path)
+    tmp_path = f'{path}.tmp.npy'
+    np.save(tmp_path, np.unique(np.asarray(positions, dtype=np.int64)))
+    os.replace(tmp_path, path)
+
+
+def live_rows(part_rows, deleted):
+    """Boolean mask of a part's rows that were not deleted"""
+    keep = np.ones(part_rows, dtype=bool)
+    keep[deleted] = False
+    return keep
+
+
+_thread_locks = {}
+_held_locks = threading.local()
+
+
+@contextmanager
+def dataset_lock(dataset_id):
+    """Exclusive lock for changing a dataset's files, held across threads and worker processes
+
+    A thread already holding the lock can take it again, so writers can call the readers below.
+    """
+    held = _held_locks.__dict__.setdefault('ids', set())
+    if dataset_id in held:
+        yield
+        return
+    with _thread_locks.setdefault(dataset_id, threading.Lock()):
+        held.add(dataset_id)
+        try:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(STORE_FOLDER, f'{dataset_id}.lock'), 'w') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            held.discard(dataset_id)
+
+
+def open_parts(dataset_id):
+    """[(path, open ParquetFile, deleted positions or None)] for a dataset's files, in row order
+
+    Listed and opened under the dataset lock, so an append or compaction never shows half its
+    files and deletions. Open files stay readable after a compaction replaces or removes them.
+    """
+    with dataset_lock(dataset_id):
+        return [(path, pq.ParquetFile(path), read_deleted(path)) for path in part_paths(dataset_id)]
+
+
+def column_types(df):
+    """Map each column to the name of its pandas dtype"""
+    return {str(col): str(dtype) for col, dtype in df.dtypes.items()}
+
+
+def write_frame(dataset_id, df):
+    """Write a DataFrame to the columnar store, replacing any existing file"""
+    path = dataset_path(dataset_id)
+    tmp_path = f'{path}.tmp'
+    try:
+        df.to_parquet(tmp_path, index=False, row_group_size=ROW_GROUP_ROWS)
+    except (TypeError, ValueError):
+        # Mixed-type object columns cannot be encoded by Arrow; store them as text
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        df.to_parquet(tmp_path, index=False, row_group_size=ROW_GROUP_ROWS)
+    os.replace(tmp_path, path)
+    return path
+
+
+def staging_path():
+    """Unique path for a dataset file that is still being written"""
+    return os.path.join(STORE_FOLDER, f'.staging-{uuid.uuid4().hex}.parquet')
+
+
+def commit_staged(staged_path, dataset_id):
+    """Move a fully written staging file into place as a dataset's file"""
+    os.replace(staged_path, dataset_path(dataset_id))
+
+
+def commit_part(staged_path, dataset_id):
+    """Move a fully written staging file into place as a dataset's next part"""
+    path = next_part_path(dataset_id)
+    os.replace(staged_path, path)
+    return path
+
+
+def discard_staged(staged_path):
+    """Remove a staging file left by a failed ingest"""
+    if staged_path and os.path.exists(staged_path):
+        os.remove(staged_path)
+
+
+def read_part(source, deleted, columns=None):
+    """Read one opened part file, without its deleted rows"""
+    df = source.read(columns=columns, use_pandas_metadata=True).to_pandas()
+    if deleted is not None:
+        df = df[live_rows(len(df), deleted)]
+    return df
+
+
+def read_frame(dataset_id, columns=None):
+    """Read a dataset from the columnar store into a DataFrame"""
+    parts = open_parts(dataset_id)
+    if len(parts) == 1 and parts[0][2] is None:
+        return read_part(parts[0][1], None, columns)
+    return pd.concat([read_part(source, deleted, columns) for _, source, deleted in parts], ignore_index=True)
+
+
+def iter_batches(dataset_id, batch_rows, columns=None):
+    """Read a dataset's live rows as Arrow record batches of at most batch_rows rows"""
+    for _, source, deleted in open_parts(dataset_id):
+        keep = live_rows(source.metadata.num_rows, deleted) if deleted is not None else None
+        start = 0
+        for batch in source.iter_batches(batch_size=batch_rows, columns=columns):
+            rows = batch.num_rows
+            if keep is not None:
+                batch = batch.filter(pa.array(keep[start:start + rows]))
+            start += rows
+            yield batch
+
+
+def iter_frames(dataset_id, batch_rows, columns=None):
+    """Read a dataset from the columnar store in batches of at most batch_rows rows"""
+    produced = False
+    for batch in iter_batches(dataset_id, batch_rows, columns):
+        produced = True
+        yield batch.to_pandas()
+    if not produced:
+        # Always yield one frame so callers can still see the columns
+        yield read_schema(dataset_id, columns).empty_table().to_pandas()
+
+
+def read_rows(part_path, positions):
+    """Read rows of a part by position, decoding only the row groups that hold them"""
+    source = pq.ParquetFile(part_path)
+    sizes = np.array([source.metadata.row_group(i).num_rows for i in range(source.metadata.num_row_groups)])
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    groups = np.unique(np.searchsorted(starts, positions, side='right') - 1)
+    offsets = np.zeros(len(sizes), dtype=np.int64)
+    offsets[groups] = np.concatenate([[0], np.cumsum(sizes[groups])[:-1]])
+    group_of = np.searchsorted(starts, positions, side='right') - 1
+    table = source.read_row_groups(groups.tolist())
+    return table.take(positions - starts[group_of] + offsets[group_of]).to_pandas()
+
+
+class DatasetLayout:
+    """Parts, row groups and deletions of a stored dataset, addressed by live row position
+
+    Live positions number the rows in the order read_frame returns them: parts in order,
+    deleted rows skipped. Row groups are numbered across parts in the same order.
+    """
+
+    def __init__(self, dataset_id):
+        self.dataset_id = dataset_id
+        self.parts = []
+        group_starts, group_rows = [], []
+        offset = 0
+        with dataset_lock(dataset_id):
+            # Taken with the parts, to check derived data such as indexes against
+            self.signature = layout_signature(dataset_id)
+            parts = open_parts(dataset_id)
+        for path, source, deleted in parts:
+            metadata = source.metadata
+            sizes = np.array([metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)], dtype=np.int64)
+            starts = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+            live = live_rows(metadata.num_rows, deleted) if deleted is not None else None
+            if live is None:
+                live_before = np.concatenate([[0], np.cumsum(sizes)])
+            else:
+                live_before = np.concatenate([[0], np.cumsum(live)])[np.append(starts, metadata.num_rows)]
+            live_count = int(live_before[-1])
+            self.parts.append({
+                'path': path, 'source': source, 'sizes': sizes, 'starts': starts, 'offset': offset,
+                'live_count': live_count, 'live_index': np.flatnonzero(live) if live is not None else None
+            })
+            group_starts.append(offset + live_before[:-1])
+            group_rows.append(np.diff(live_before))
+            offset += live_count
+        self.row_count = offset
+        self.group_starts = np.concatenate(group_starts).astype(np.int64)
+        self.group_rows = np.concatenate(group_rows).astype(np.int64)
+
+    @property
+    def group_count(self):
+        return len(self.group_rows)
+
+    def group_statistics(self, column):
+        """(min, max) of a column in every row group, NaN where a group has no statistics"""
+        mins, maxs = [], []
+        for part in self.parts:
+            metadata = part['source'].metadata
+            names = [metadata.row_group(0).column(j).path_in_schema
+                     for j in range(metadata.num_columns)] if metadata.num_row_groups else []
+            for i in range(metadata.num_row_groups):
+                stats = metadata.row_group(i).column(names.index(column)).statistics \
+                    if column in names else None
+                known = stats is not None and stats.has_min_max
+                mins.append(stats.min if known else np.nan)
+                maxs.append(stats.max if known else np.nan)
+        return np.array(mins, dtype=float), np.array(maxs, dtype=float)
+
+    def group_positions(self, groups):
+        """Live positions of the rows in the given row groups, ascending"""
+        groups = np.flatnonzero(groups) if groups.dtype == bool else np.asarray(groups)
+        if not len(groups):
+            return np.array([], dtype=np.int64)
+        starts, rows = self.group_starts[groups], self.group_rows[groups]
+        total = int(rows.sum())
+        return np.arange(total) + np.repeat(starts - np.cumsum(rows) + rows, rows)
+
+    def read(self, positions, columns=None):
+        """Rows at live positions, in the order given, decoding only the row groups that hold them"""
+        positions = np.asarray(positions, dtype=np.int64)
+        inverse = None
+        if len(positions) > 1 and (np.diff(positions) <= 0).any():
+            positions, inverse = np.unique(positions, return_inverse=True)
+
+        frames = []
+        for part in self.parts:
+            lo, hi = np.searchsorted(positions, [part['offset'], part['offset'] + part['live_count']])
+            if lo == hi:
+                continue
+            local = positions[lo:hi] - part['offset']
+            physical = part['live_index'][local] if part['live_index'] is not None else local
+            group_of = np.searchsorted(part['starts'], physical, side='right') - 1
+            groups = np.unique(group_of)
+            table = part['source'].read_row_groups(groups.tolist(), columns=columns)
+            if len(physical) < table.num_rows:
+                # Row offsets of each group within the groups just read
+                read_offsets = np.zeros(len(part['sizes']), dtype=np.int64)
+                read_offsets[groups] = np.concatenate([[0], np.cumsum(part['sizes'][groups])[:-1]])
+                table = table.take(physical - part['starts'][group_of] + read_offsets[group_of])
+            frames.append(table.to_pandas())
+
+        if not frames:
+            return read_schema(self.dataset_id, columns).empty_table().to_pandas()
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        if inverse is not None:
+            df = df.iloc[inverse].reset_index(drop=True)
+        return df
+
+
+def iter_part_columns(dataset_id, columns):
+    """Yield (part path, DataFrame of columns) for every part, including deleted rows"""
+    for part, source, _ in open_parts(dataset_id):
+        yield part, source.read(columns=columns, use_pandas_metadata=True).to_pandas()
+
+
+def compact_frame(dataset_id):
+    """Rewrite a dataset's parts and deletions as a single base file
+
+    Runs under the dataset lock, so readers see either the old files or the compacted one.
+    """
+    with dataset_lock(dataset_id):
+        df = read_frame(dataset_id)
+        parts = part_paths(dataset_id)
+        write_frame(dataset_id, df)
+        for part in parts:
+            if part != parts[0] and os.path.exists(part):
+                os.remove(part)
+            if os.path.exists(deleted_path(part)):
+                os.remove(deleted_path(part))
+    return df
+
+
+def read_schema(dataset_id, columns=None):
+    """Arrow schema of a stored dataset, optionally limited to some columns"""
+    schema = pq.read_schema(dataset_path(dataset_id)).remove_metadata()
+    if columns:
+        schema = pa.schema([schema.field(col) for col in columns])
+    return schema
+
+
+def delete_frame(dataset_id):
+    """Remove a dataset's files (base, parts, deletions, profiler state) from the columnar store"""
+    for path in glob.glob(os.path.join(STORE_FOLDER, f'{dataset_id}.*')):
+        os.remove(path)
+
+
+def layout_signature(dataset_id):
+    """Identifies the current files of a dataset, so derived data can tell when it is stale"""
+    signature = []
+    with dataset_lock(dataset_id):
+        for part in part_paths(dataset_id):
+            stat = os.stat(part)
+            deleted = read_deleted(part)
+            signature.append([os.path.basename(part), stat.st_size, stat.st_mtime_ns,
+                              0 if deleted is None else len(deleted)])
+    return signature
+
+
+INDEX_ALIGNMENT = 64
+
+# Saved with each array file; files of another format are ignored like stale ones
+ARRAYS_FORMAT = 2
+
+
+def indexes_path(dataset_id):
+    return os.path.join(STORE_FOLDER, f'{dataset_id}.indexes.bin')
+
+
+def rollups_path(dataset_id):
+    return os.path.join(STORE_FOLDER, f'{dataset_id}.rollups.bin')
+
+
+def write_arrays(path, entries, signature):
+    """Save {'row_count', 'columns': {name: {key: array or JSON value}}} as raw arrays in one file
+    that readers can memory-map
+
+    Layout: an 8-byte manifest length, the JSON manifest (format, signature, row count and each
+    array's dtype, shape and offset), then the arrays, each aligned to INDEX_ALIGNMENT bytes.
+    """
+    arrays = []
+    manifest = {'format': ARRAYS_FORMAT, 'signature': signature, 'row_count': entries['row_count'],
+                'columns': {}}
+    for column, index in entries['columns'].items():
+        entry = manifest['columns'][column] = {'arrays': {}, 'attrs': {}}
+        for key, value in index.items():
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value)
+                entry['arrays'][key] = {'dtype': value.dtype.str, 'shape': list(value.shape), 'offset': None}
+                arrays.append((entry['arrays'][key], value))
+            else:
+                entry['attrs'][key] = value
+
+    def aligned(offset):
+        return -(-offset // INDEX_ALIGNMENT) * INDEX_ALIGNMENT
+
+    # Offsets depend on the manifest size, which depends on the offsets; reserve room for them
+    header = 8 + len(json.dumps(manifest)) + 32 * len(arrays) + INDEX_ALIGNMENT
+    offset = aligned(header)
+    for spec, value in arrays:
+        spec['offset'] = offset
+        offset = aligned(offset + value.nbytes)
+    encoded = json.dumps(manifest).encode()
+
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(len(encoded).to_bytes(8, 'little'))
+        f.write(encoded)
+        for spec, value in arrays:
+            f.seek(spec['offset'])
+            f.write(value.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_arrays(path, signature):
+    """Arrays saved by write_arrays, memory-mapped, with the signature they were saved for,
+    or None if missing or stale"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        length = int.from_bytes(f.read(8), 'little')
+        manifest = json.loads(f.read(length))
+    if manifest.get('format') != ARRAYS_FORMAT or manifest['signature'] != signature:
+        return None
+    data = np.memmap(path, dtype=np.uint8, mode='r')
+    columns = {}
+    for column, entry in manifest['columns'].items():
+        index = dict(entry['attrs'])
+        for key, spec in entry['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            index[key] = data[spec['offset']:spec['offset'] + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+        columns[column] = index
+    return {'signature': manifest['signature'], 'row_count': manifest['row_count'], 'columns': columns}
+
+
+def write_indexes(dataset_id, indexes, signature):
+    """Save column indexes for readers to memory-map"""
+    write_arrays(indexes_path(dataset_id), indexes, signature)
+
+
+def read_indexes(dataset_id, signature):
+    """A dataset's saved column indexes as memory-mapped arrays, or None if missing or stale"""
+    return read_arrays(indexes_path(dataset_id), signature)
+
+
+def write_rollups(dataset_id, rollups, signature):
+    """Save time-series rollups, keyed like downsample.build_rollups returns them"""
+    write_arrays(rollups_path(dataset_id), rollups, signature)
+
+
+def read_rollups(dataset_id, signature):
+    """A dataset's saved time-series rollups, memory-mapped, or None if missing or stale"""
+    return read_arrays(rollups_path(dataset_id), signature)
+
+
+def profiler_path(dataset_id):
+    """Path of a dataset's pickled column profiler state, kept so appends can update the profile"""
+    return os.path.join(STORE_FOLDER, f'{dataset_id}.profiler.pkl')
+
+
+def write_profiler(dataset_id, profiler):
+    path = profiler_path(dataset_id)
+    with open(f'{path}.tmp', 'wb') as f:
+        pickle.dump(profiler, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def read_profiler(dataset_id):
+    """A dataset's saved profiler, or None for datasets ingested before profiler state was kept"""
+    path = profiler_path(dataset_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def json_ready(df):
+    """Object-dtype copy of df with dates as strings and missing values as empty strings"""
+    out = df.copy()
+    for col in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = out[col].dt.strftime('%Y-%m-%d %H:%M:%S').str.replace(' 00:00:00', '', regex=False)
+    return out.astype(object).where(out.notna(), '')
+
+
+def frame_to_records(df):
+    """Convert a DataFrame to JSON-ready records, with missing values as empty strings"""
+    return json_ready(df).to_dict('records')
+
+
+def frame_to_columns(df):
+    """Convert a DataFrame to JSON-ready {column: [values]}, without repeating keys per row"""
+    out = json_ready(df)
+    return {col: out[col].tolist() for col in out.columns}
+
+
+def records_to_frame(records, columns):
+    """Rebuild a typed DataFrame from legacy JSON records, inferring dtypes like pd.read_csv"""
+    if not records:
+        return pd.DataFrame(columns=columns)
+    buffer = io.StringIO()
+    pd.DataFrame(records, columns=columns).to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+
+def migrate_json_datasets(conn):
+    """Move datasets still stored as per-row JSON in dataset_records into the columnar store"""
+    legacy = conn.execute('''
+        SELECT id, columns FROM datasets WHERE storage_format = 'json'
+    ''').fetchall()
+
+    for dataset in legacy:
+        dataset_id = dataset['id']
+        columns = json.loads(dataset['columns'])
+        records = conn.execute('''
+            SELECT record_data FROM dataset_records WHERE dataset_id = ? ORDER BY id
+        ''', (dataset_id,)).fetchall()
+        df = records_to_frame([json.loads(record['record_data']) for record in records], columns)
+        write_frame(dataset_id, df)
+
+        conn.execute('''
+            UPDATE datasets SET storage_format = 'parquet', column_types = ?, row_count = ?
+            WHERE id = ?
+        ''', (json.dumps(column_types(df)), len(df), dataset_id))
+        conn.execute('DELETE FROM dataset_records WHERE dataset_id = ?', (dataset_id,))
+        conn.commit()
+
+    return len(legacy)
@@ -0,0 +1,50 @@
+"""
+Shared fixtures: every test runs in its own scratch directory, which holds the store, the
+uploads and the database
+"""
+
+import io
+import os
+import pytest
+import db
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('store')
+    os.makedirs('uploads')
+    # Pooled connections point at the previous test's database
+    db.reset_pool()
+    return tmp_path
+
+
+@pytest.fixture
+def glimpsy(workdir, monkeypatch):
+    """The app module over an empty database and cache
+
+    Indexes are not built in the background, so a test's files can't be written after it ends;
+    tests that need them call index_dataset.
+    """
+    import app
+    from cache import DatasetCache
+    monkeypatch.setattr(app, 'dataset_cache', DatasetCache(app.DATASET_CACHE_BUDGET))
+    monkeypatch.setitem(app.app.config, 'BUILD_INDEXES', False)
+    app.init_db()
+    return app
+
+
+@pytest.fixture
+def client(glimpsy):
+    return glimpsy.app.test_client()
+
+
+@pytest.fixture
+def upload(client):
+    """Upload a DataFrame as CSV, waiting for the ingest; returns the dataset id"""
+    def upload(df, name='data'):
+        body = io.BytesIO(df.to_csv(index=False).encode())
+        response = client.post('/api/datasets', data={'file': (body, f'{name}.csv'), 'wait': 'true'})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['id']
+    return upload
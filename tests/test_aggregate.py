@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+from aggregate import aggregate_frame, parse_metrics
+
+
+@pytest.fixture
+def sales():
+    return pd.DataFrame({
+        'region': ['north', 'south', 'north', 'south', None],
+        'amount': [10, 20, 30, 'n/a', 50],
+        'order_date': ['2024-01-15', '2024-01-20', '2024-02-03', '2024-03-31', '2024-04-01'],
+    })
+
+
+def test_count_by_default(sales):
+    result = aggregate_frame(sales)
+    assert result.to_dict('records') == [{'count': 5}]
+
+
+def test_group_by_with_metrics(sales):
+    result = aggregate_frame(sales, group_by=['region'], metrics=[
+        {'column': 'amount', 'op': 'sum'},
+        {'column': 'amount', 'op': 'mean', 'as': 'average'},
+        {'column': 'amount', 'op': 'count'},
+    ])
+    records = result.to_dict('records')
+    assert records[:2] == [
+        {'region': 'north', 'amount_sum': 40.0, 'average': 20.0, 'amount_count': 2},
+        {'region': 'south', 'amount_sum': 20.0, 'average': 20.0, 'amount_count': 2},
+    ]
+    # Missing keys are a group of their own
+    assert pd.isna(records[2]['region']) and records[2]['amount_sum'] == 50.0
+
+
+def test_metric_mapping_and_percentiles(sales):
+    result = aggregate_frame(sales, metrics={'amount': ['median', 'p90', 'max']})
+    assert result.iloc[0].to_dict() == {'amount_median': 25.0, 'amount_p90': 44.0, 'amount_max': 50.0}
+
+
+def test_time_buckets(sales):
+    result = aggregate_frame(sales, time_bucket={'column': 'order_date', 'interval': 'month'})
+    assert result.to_dict('records') == [
+        {'order_date': '2024-01-01', 'count': 2},
+        {'order_date': '2024-02-01', 'count': 1},
+        {'order_date': '2024-03-01', 'count': 1},
+        {'order_date': '2024-04-01', 'count': 1},
+    ]
+    result = aggregate_frame(sales, time_bucket={'column': 'order_date', 'interval': 'quarter'})
+    assert result['order_date'].tolist() == ['2024-01-01', '2024-04-01']
+
+
+def test_partitioned_results_match_one_pass(sales):
+    def halves(fn, df):
+        return [fn(df.iloc[:2]), fn(df.iloc[2:])]
+
+    spec = {'group_by': ['region'], 'metrics': {'amount': ['sum', 'mean', 'min', 'max', 'count']}}
+    pd.testing.assert_frame_equal(aggregate_frame(sales, map_partitions=halves, **spec),
+                                  aggregate_frame(sales, **spec))
+
+
+def test_empty_input_yields_one_row_of_totals(sales):
+    result = aggregate_frame(sales.iloc[:0], metrics={'amount': ['sum', 'mean']})
+    assert result.to_dict('records') == [{'amount_sum': 0, 'amount_mean': None}]
+
+
+@pytest.mark.parametrize('metrics, error', [
+    ([{'column': 'amount', 'op': 'mode'}], 'Unknown metric op: mode'),
+    ([{'op': 'sum'}], 'Metric sum needs a column'),
+    ([{'column': 'missing', 'op': 'sum'}], 'Unknown metric column: missing'),
+    (['amount'], 'Each metric must be an object with "column" and "op"'),
+])
+def test_invalid_metrics(metrics, error):
+    with pytest.raises(ValueError, match=error):
+        parse_metrics(metrics, ['amount'])
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'group_by': ['missing']}, 'Unknown group_by columns: missing'),
+    ({'time_bucket': 'month'}, 'time_bucket must be an object with column and interval'),
+    ({'time_bucket': {'column': 'order_date', 'interval': 'hour'}}, 'Time bucket interval must be one of'),
+])
+def test_aggregate_endpoint_rejects_bad_specs(client, upload, sales, body, error):
+    dataset_id = upload(sales)
+    response = client.post(f'/api/datasets/{dataset_id}/aggregate', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith(error)
+
+
+def test_aggregate_endpoint_filters_first(client, upload, sales):
+    dataset_id = upload(sales)
+    response = client.post(f'/api/datasets/{dataset_id}/aggregate', json={
+        'filters': {'region': ['north']},
+        'metrics': [{'column': 'amount', 'op': 'sum'}],
+    })
+    body = response.get_json()
+    assert body['source_row_count'] == 2
+    assert body['data'] == [{'amount_sum': 40.0}]
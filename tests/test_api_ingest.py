@@ -0,0 +1,164 @@
+import json
+import asyncio
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pytest
+import storage
+import api_ingest
+from api_ingest import (claim_rule, create_rule, format_records, get_rule, is_due, page_params, page_url,
+                        parse_formatting, parse_rule, run_rule, update_rule)
+
+RECORDS = [{'id': i, 'info': {'name': f'item {i}'}, 'price': str(i * 1.5), 'seen': '2024-03-0%d' % (i % 9 + 1)}
+           for i in range(25)]
+
+
+def rule_row(**constraints):
+    return {'name': 'r', 'api_url': 'https://example.com/items', 'formatting_rules': None,
+            'constraints': json.dumps({'key': 'id', **constraints})}
+
+
+@pytest.mark.parametrize('row, message', [
+    ({'api_url': 'ftp://example.com'}, 'http or https URL'),
+    ({'constraints': '{'}, 'constraints is not valid JSON'),
+    ({'constraints': json.dumps({'key': 'id', 'mode': 'append'})}, 'Rules must upsert'),
+    ({'constraints': json.dumps({})}, 'Rules need key columns'),
+    ({'constraints': json.dumps({'key': 'id', 'pagination': {'type': 'offset'}})}, 'needs a page size'),
+    ({'constraints': json.dumps({'key': 'id', 'concurrency': 0})}, 'concurrency must be positive'),
+    ({'formatting_rules': json.dumps({'types': {'x': 'money'}})}, 'Type of x must be one of'),
+])
+def test_invalid_rules(row, message):
+    with pytest.raises(ValueError, match=message):
+        parse_rule({**rule_row(), **row})
+
+
+def test_parsed_defaults():
+    rule = parse_rule(rule_row(pagination={'type': 'offset', 'size': 10, 'size_param': 'limit'}))
+    assert rule['key'] == ['id'] and rule['mode'] == 'upsert'
+    assert rule['pagination']['param'] == 'offset' and rule['pagination']['start'] == 0
+    assert page_params(rule['pagination'], 2) == {'offset': 20, 'limit': 10}
+    assert page_url('https://x.io/a?q=1&offset=5', {'offset': 20}) == 'https://x.io/a?q=1&offset=20'
+
+
+def test_format_records():
+    formatting = parse_formatting({
+        'rename': {'info.name': 'name'},
+        'types': {'price': 'float', 'id': 'int', 'seen': 'date', 'flag': 'bool'},
+        'defaults': {'region': 'none'},
+        'required': ['name'],
+    })
+    records = RECORDS[:2] + [{'id': 'x', 'info': {}, 'price': 'n/a'}]
+    df = format_records(records, formatting)
+    # The record without a name is dropped
+    assert df['name'].tolist() == ['item 0', 'item 1']
+    assert df['price'].tolist() == [0.0, 1.5] and df['seen'].tolist() == ['2024-03-01', '2024-03-02']
+    assert df['region'].tolist() == ['none', 'none'] and df['flag'].isna().all()
+    assert format_records([], formatting).empty
+
+
+def test_claims_and_stale_runs(glimpsy):
+    conn = glimpsy.get_db_connection()
+    rule_id = create_rule(conn, {'name': 'r', 'api_url': 'https://example.com'})
+    assert claim_rule(conn, rule_id)['last_status'] == 'running'
+    assert claim_rule(conn, rule_id) is None
+    # A run whose heartbeat stopped is taken to have died
+    update_rule(conn, rule_id, heartbeat_at='2000-01-01 00:00:00')
+    assert claim_rule(conn, rule_id) is not None
+    conn.close()
+
+
+def test_is_due():
+    now = datetime(2024, 1, 1, 12, 0, 0)
+    rule = {**rule_row(interval_seconds=600), 'last_run_at': '2024-01-01 11:55:00', 'last_status': 'completed'}
+    assert not is_due(rule, now)
+    assert is_due({**rule, 'last_run_at': '2024-01-01 11:50:00'}, now)
+    assert is_due({**rule, 'last_status': 'running'}, now)
+    assert is_due({**rule, 'last_run_at': None}, now)
+
+
+@pytest.fixture
+def api():
+    """A paginated JSON API on localhost: /items?page=N&size=M, with a records envelope"""
+    class Handler(BaseHTTPRequestHandler):
+        records = RECORDS
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path != '/items':
+                self.send_response(404)
+                self.end_headers()
+                return
+            query = {key: int(values[0]) for key, values in parse_qs(parts.query).items()}
+            start = (query['page'] - 1) * query['size']
+            body = json.dumps({'data': {'items': Handler.records[start:start + query['size']]}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', Handler
+    server.shutdown()
+
+
+def create_api_rule(glimpsy, url, **constraints):
+    conn = glimpsy.get_db_connection()
+    rule_id = create_rule(conn, {
+        'name': 'items', 'api_url': url,
+        'constraints': {'key': 'id', 'records_path': 'data.items', 'concurrency': 3, 'retries': 0,
+                        'pagination': {'type': 'page', 'size': 4, 'size_param': 'size'}, **constraints},
+        'formatting_rules': {'rename': {'info.name': 'name'}, 'types': {'price': 'float'}},
+    })
+    conn.close()
+    return rule_id
+
+
+def test_run_pages_into_a_dataset_and_upsert_on_later_runs(glimpsy, api, monkeypatch):
+    url, handler = api
+    rule_id = create_api_rule(glimpsy, f'{url}/items')
+    result = asyncio.run(run_rule(glimpsy.get_db_connection, rule_id, glimpsy.write_api_batch, batch_rows=10))
+    assert result['status'] == 'completed' and result['rows'] == 25 and result['batches'] == 3
+    # 6 full pages, a short one, and pages fetched ahead that are dropped
+    assert result['pages'] == 7
+    df = storage.read_frame(result['dataset_id'])
+    assert df['id'].tolist() == list(range(25))
+    assert df['name'].tolist()[:2] == ['item 0', 'item 1']
+
+    monkeypatch.setattr(handler, 'records', [{**RECORDS[3], 'price': '99'}] + RECORDS[:3])
+    again = asyncio.run(run_rule(glimpsy.get_db_connection, rule_id, glimpsy.write_api_batch))
+    assert again['dataset_id'] == result['dataset_id']
+    df = storage.read_frame(result['dataset_id'])
+    assert len(df) == 25 and df.loc[df['id'] == 3, 'price'].tolist() == [99.0]
+
+    conn = glimpsy.get_db_connection()
+    rule = get_rule(conn, rule_id)
+    conn.close()
+    assert (rule['last_status'], rule['last_row_count'], rule['dataset_id']) == ('completed', 4, result['dataset_id'])
+
+
+def test_failed_runs_are_recorded(glimpsy, api, monkeypatch):
+    monkeypatch.setattr(api_ingest, 'RETRY_DELAY', 0)
+    url, _ = api
+    rule_id = create_api_rule(glimpsy, f'{url}/missing', retries=1)
+    result = asyncio.run(run_rule(glimpsy.get_db_connection, rule_id, glimpsy.write_api_batch))
+    assert result['status'] == 'failed' and 'returned HTTP 404' in result['error']
+    conn = glimpsy.get_db_connection()
+    assert get_rule(conn, rule_id)['last_status'] == 'failed'
+    conn.close()
+
+
+def test_rules_endpoints(client):
+    response = client.post('/api/ingestion-rules', json={'name': 'r', 'api_url': 'https://example.com'})
+    assert response.status_code == 400 and 'key columns' in response.get_json()['error']
+    response = client.post('/api/ingestion-rules', json={'name': 'r', 'api_url': 'https://example.com',
+                                                         'constraints': {'key': 'id'}})
+    assert response.status_code == 201 and response.get_json()['constraints'] == {'key': 'id'}
+    assert client.post('/api/ingestion-rules/999/run').status_code == 404
+    assert [rule['name'] for rule in client.get('/api/ingestion-rules').get_json()] == ['r']
@@ -0,0 +1,124 @@
+import io
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+import storage
+from append import align_delta, dedupe_delta, replaced_rows
+from cache import normalize_filters
+from filters import filter_mask
+
+COLUMNS = ['id', 'region', 'amount']
+
+
+@pytest.fixture
+def base():
+    return pd.DataFrame({'id': [1, 2, 3, 4], 'region': ['n', 's', 'n', 's'], 'amount': [10, 20, 30, 40]})
+
+
+def post(client, dataset_id, df, **form):
+    body = io.BytesIO(df.to_csv(index=False).encode())
+    return client.post(f'/api/datasets/{dataset_id}/append', data={'file': (body, 'delta.csv'), **form})
+
+
+def test_append_adds_a_part(client, upload, base):
+    dataset_id = upload(base)
+    response = post(client, dataset_id, pd.DataFrame({'id': [5], 'region': ['e'], 'amount': [50]}))
+    assert response.get_json() == {'id': dataset_id, 'mode': 'append', 'appended': 1, 'replaced': 0, 'row_count': 5}
+    assert len(storage.part_paths(dataset_id)) == 2
+    assert storage.read_frame(dataset_id)['id'].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_upsert_masks_replaced_rows(client, upload, base):
+    dataset_id = upload(base)
+    delta = pd.DataFrame({'id': [2, 6, 2], 'region': ['x', 'w', 'y'], 'amount': [0, 60, 21]})
+    body = post(client, dataset_id, delta, mode='upsert', key='id').get_json()
+    # The last row of a duplicated key wins
+    assert (body['appended'], body['replaced'], body['row_count']) == (2, 1, 5)
+    df = storage.read_frame(dataset_id)
+    assert df['id'].tolist() == [1, 3, 4, 6, 2]
+    assert df.loc[df['id'] == 2, 'region'].tolist() == ['y']
+    # The base file is masked rather than rewritten
+    assert storage.read_deleted(storage.dataset_path(dataset_id)).tolist() == [1]
+
+    profile = client.get(f'/api/datasets/{dataset_id}/profile').get_json()
+    assert profile['row_count'] == 5
+
+
+def test_upserting_a_replaced_row_again(client, upload, base):
+    dataset_id = upload(base)
+    for amount in (21, 22):
+        post(client, dataset_id, pd.DataFrame({'id': [2], 'region': ['s'], 'amount': [amount]}),
+             mode='upsert', key='id')
+    df = storage.read_frame(dataset_id)
+    assert df['id'].tolist() == [1, 3, 4, 2] and df['amount'].tolist() == [10, 30, 40, 22]
+
+
+def test_cached_frame_and_masks_are_updated(glimpsy, client, upload, base):
+    dataset_id = upload(base)
+    glimpsy.dataset_cache.put_frame(dataset_id, storage.read_frame(dataset_id))
+    filters = {'region': ['n']}
+    assert client.post(f'/api/datasets/{dataset_id}/filter', json={'filters': filters}).get_json()['total_count'] == 2
+
+    post(client, dataset_id, pd.DataFrame({'id': [3, 7], 'region': ['s', 'n'], 'amount': [31, 70]}),
+         mode='upsert', key='id')
+    stored = storage.read_frame(dataset_id)
+    cached = glimpsy.dataset_cache.get_frame(dataset_id)
+    assert cached is not None
+    tm.assert_frame_equal(cached, stored)
+    mask = glimpsy.dataset_cache.get_mask(dataset_id, normalize_filters(filters, COLUMNS))
+    assert mask.tolist() == filter_mask(stored, filters, COLUMNS).tolist()
+    body = client.post(f'/api/datasets/{dataset_id}/filter', json={'filters': filters}).get_json()
+    assert sorted(row['id'] for row in body['data']) == [1, 7]
+
+
+def test_compacts_after_many_parts(glimpsy, client, upload, base, monkeypatch):
+    monkeypatch.setattr(glimpsy, 'APPEND_COMPACT_PARTS', 2)
+    dataset_id = upload(base)
+    for i in (1, 5):
+        post(client, dataset_id, pd.DataFrame({'id': [i], 'region': ['n'], 'amount': [i]}), mode='upsert', key='id')
+    # The third part is folded into one file along with the deleted rows
+    assert storage.part_paths(dataset_id) == [storage.dataset_path(dataset_id)]
+    assert storage.read_deleted(storage.dataset_path(dataset_id)) is None
+    assert storage.read_frame(dataset_id)['id'].tolist() == [2, 3, 4, 1, 5]
+
+
+@pytest.mark.parametrize('delta, form, message', [
+    (pd.DataFrame({'id': [5], 'amount': [1]}), {}, 'missing columns: region'),
+    (pd.DataFrame({'id': [5], 'region': ['n'], 'amount': [1], 'x': [0]}), {}, 'unexpected columns: x'),
+    (pd.DataFrame({'id': ['five'], 'region': ['n'], 'amount': [1]}), {}, 'column types'),
+    (pd.DataFrame({'id': [5], 'region': ['n'], 'amount': [1]}), {'mode': 'upsert'}, 'Upserts need key columns'),
+    (pd.DataFrame({'id': [5], 'region': ['n'], 'amount': [1]}), {'mode': 'merge'}, 'mode must be one of'),
+])
+def test_rejected_deltas(client, upload, base, delta, form, message):
+    dataset_id = upload(base)
+    response = post(client, dataset_id, delta, **form)
+    assert response.status_code == 400 and message in response.get_json()['error']
+    assert len(storage.read_frame(dataset_id)) == 4
+
+
+def test_numeric_looking_text_is_kept_as_text(workdir, base):
+    storage.write_frame(1, base)
+    table = align_delta(pd.DataFrame({'amount': [5], 'id': [5], 'region': [7]}), COLUMNS, storage.read_schema(1))
+    assert table.column_names == COLUMNS and table.column('region').to_pylist() == ['7']
+
+
+def test_replaced_rows_skip_deleted_rows(workdir, base):
+    storage.write_frame(1, base)
+    storage.write_deleted(storage.dataset_path(1), np.array([0]))
+    delta = dedupe_delta(pd.DataFrame({'id': [1, 3, 3]}), ['id'])
+    assert delta['id'].tolist() == [1, 3]
+    deletions, positions = replaced_rows(1, delta, ['id'])
+    # Row 0 (id 1) is already deleted; id 3 is the second live row
+    assert {path: rows.tolist() for path, rows in deletions.items()} == {storage.dataset_path(1): [2]}
+    assert positions.tolist() == [1]
+    with pytest.raises(ValueError, match='Key columns not in the dataset: nope'):
+        dedupe_delta(delta, ['nope'])
+
+
+def test_multi_column_keys(workdir, base):
+    storage.write_frame(1, base)
+    delta = pd.DataFrame({'id': [1, 2], 'region': ['n', 'n']})
+    deletions, positions = replaced_rows(1, delta, ['id', 'region'])
+    assert positions.tolist() == [0]
+    assert [rows.tolist() for rows in deletions.values()] == [[0]]
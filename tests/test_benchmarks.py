@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks'))
+
+from synthetic import SHAPES, make_dataset  # noqa: E402
+
+SAMPLES = {'finance': 'finance_portfolio.csv', 'sales': 'sales_data.csv', 'health': 'health_metrics.csv'}
+
+
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_shapes_match_the_samples(shape):
+    sample = pd.read_csv(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'samples', SAMPLES[shape]))
+    df = make_dataset(shape, 50)
+    assert list(df.columns) == list(sample.columns)
+    assert len(df) == 50
+    assert pd.to_datetime(df['Date'], format='%Y-%m-%d').notna().all()
+
+
+def test_seeded_and_widened():
+    pd.testing.assert_frame_equal(make_dataset('sales', 20, seed=3), make_dataset('sales', 20, seed=3))
+    assert not make_dataset('sales', 20, seed=3).equals(make_dataset('sales', 20, seed=4))
+    df = make_dataset('health', 10, extra_columns=2)
+    assert list(df.columns[-2:]) == ['Metric_1', 'Metric_2']
+
+
+def test_unknown_shape():
+    with pytest.raises(ValueError, match='Unknown shape'):
+        make_dataset('retail', 10)
+
+
+def test_benchmark_run(glimpsy, tmp_path, monkeypatch):
+    import api_benchmark
+    monkeypatch.setattr(api_benchmark.tempfile, 'mkdtemp', lambda prefix: str(tmp_path))
+    args = argparse.Namespace(shape='finance', rows=200, extra_columns=0, format='parquet', seed=0,
+                              iterations=2, upload_iterations=1, export_iterations=1)
+    report = api_benchmark.run(args)
+    assert report['config']['rows'] == 200
+    for name in ('upload', 'get_cold', 'get', 'filter', 'aggregate', 'export_csv', 'comparison_diff'):
+        result = report['results'][name]
+        assert result['p50_ms'] <= result['max_ms'] and result['response_bytes'] > 0
+    assert report['results']['get']['iterations'] == 2
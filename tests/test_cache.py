@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+from cache import DatasetCache, entry_size, normalize_filters
+
+
+def mask(size):
+    return np.zeros(size, dtype=bool)
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = DatasetCache(250)
+    cache.put_mask(1, 'a', mask(100))
+    cache.put_mask(1, 'b', mask(100))
+    assert cache.get_mask(1, 'a') is not None  # now the most recent
+    cache.put_mask(1, 'c', mask(100))
+
+    assert cache.get_mask(1, 'b') is None
+    assert cache.get_mask(1, 'a') is not None and cache.get_mask(1, 'c') is not None
+    stats = cache.stats()
+    assert stats['bytes_used'] == 200 and stats['evictions'] == 1
+
+
+def test_values_over_the_budget_are_not_cached():
+    cache = DatasetCache(50)
+    cache.put_mask(1, 'big', mask(100))
+    assert cache.get_mask(1, 'big') is None
+    assert cache.stats()['bytes_used'] == 0
+
+
+def test_invalidate_drops_everything_derived_from_a_dataset():
+    cache = DatasetCache(10 ** 6)
+    cache.put_frame(1, pd.DataFrame({'x': [1]}))
+    cache.put_mask(1, 'a', mask(1))
+    cache.put_frame(2, pd.DataFrame({'x': [2]}))
+    cache.put_comparison(9, 'spec', {'rows': mask(1)}, dataset_ids=[1, 2])
+
+    cache.invalidate(1)
+
+    assert cache.get_frame(1) is None and cache.get_mask(1, 'a') is None
+    assert cache.get_comparison(9, 'spec') is None
+    assert cache.get_frame(2) is not None
+
+
+def test_sync_drops_values_when_the_revision_changes():
+    cache = DatasetCache(10 ** 6)
+    cache.sync(1, 0)
+    cache.put_frame(1, pd.DataFrame({'x': [1]}))
+    cache.sync(1, 0)
+    assert cache.get_frame(1) is not None
+    cache.sync(1, 1)
+    assert cache.get_frame(1) is None
+
+
+def test_update_dataset_replaces_or_drops_entries():
+    cache = DatasetCache(10 ** 6)
+    cache.put_frame(1, pd.DataFrame({'x': [1]}))
+    cache.put_mask(1, 'a', mask(1))
+    cache.update_dataset(1, lambda key, value: pd.DataFrame({'x': [1, 2]}) if key[0] == 'frame' else None)
+    assert cache.get_frame(1)['x'].tolist() == [1, 2]
+    assert cache.get_mask(1, 'a') is None
+
+
+def test_equivalent_filters_share_a_key():
+    columns = ['region', 'amount']
+    assert normalize_filters({'region': ['North', 'south'], 'ignored': ['x']}, columns) == \
+        normalize_filters({'region': ['SOUTH', 'north'], 'amount': ''}, columns)
+    assert normalize_filters({}, columns) == '{}'
+
+
+def test_entry_size():
+    df = pd.DataFrame({'x': np.arange(10, dtype=np.int64)})
+    assert entry_size(df) == df.memory_usage(index=True, deep=True).sum()
+    assert entry_size(mask(10)) == 10
+    assert entry_size({'a': mask(10), 'b': mask(5)}) > 15
+    # Scenario results are plain lists and dicts of numbers
+    assert entry_size({'groups': [{'total': 1.0}] * 100}) > 100 * 8
+
+
+def test_memory_mapped_arrays_are_free(tmp_path):
+    path = tmp_path / 'values.bin'
+    np.arange(1000, dtype=np.int64).tofile(path)
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    assert entry_size(mapped) == 0
+    assert entry_size({'values': mapped[8:].view(np.int64)}) < 1000
+
+
+def test_cached_frames_are_dropped_when_a_dataset_is_deleted(glimpsy, client, upload):
+    dataset_id = upload(pd.DataFrame({'x': [1, 2]}))
+    glimpsy.dataset_cache.put_frame(dataset_id, pd.DataFrame({'x': [1, 2]}))
+    client.delete(f'/api/datasets/{dataset_id}')
+    assert glimpsy.dataset_cache.get_frame(dataset_id) is None
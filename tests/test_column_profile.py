@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from column_profile import TRACKED_VALUES, DatasetProfiler, profile_frame
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'amount': [1.0, 2.0, 3.0, None, 4.0],
+        'region': ['north', 'south', 'north', 'north', None],
+        'created_at': ['2024-01-02', '2024-03-04', None, '2024-02-01', '2023-12-31'],
+        'active': [True, False, True, True, False],
+    })
+
+
+def test_numeric_profile(df):
+    profile = profile_frame(df)['columns']['amount']
+    assert profile['kind'] == 'numeric'
+    assert (profile['count'], profile['null_count'], profile['distinct_count']) == (4, 1, 4)
+    assert (profile['min'], profile['max'], profile['mean']) == (1.0, 4.0, 2.5)
+    assert profile['quantiles']['p50'] == 2.5
+    assert not profile['quantiles_approximate']
+
+
+def test_text_profile_has_top_values(df):
+    profile = profile_frame(df)['columns']['region']
+    assert profile['kind'] == 'text'
+    assert profile['top_values'] == [{'value': 'north', 'count': 3}, {'value': 'south', 'count': 1}]
+    assert (profile['min'], profile['max']) == ('north', 'south')
+
+
+def test_date_like_text_is_profiled_as_dates(df):
+    profile = profile_frame(df)['columns']['created_at']
+    assert profile['kind'] == 'date'
+    assert (profile['min'], profile['max']) == ('2023-12-31T00:00:00', '2024-03-04T00:00:00')
+
+
+def test_boolean_profile(df):
+    assert profile_frame(df)['columns']['active']['kind'] == 'boolean'
+
+
+def test_chunked_profile_matches_one_pass(df):
+    profiler = DatasetProfiler()
+    for start in range(0, len(df), 2):
+        profiler.update(df.iloc[start:start + 2])
+    assert profiler.result() == profile_frame(df)
+
+
+def test_high_cardinality_counts_are_approximate():
+    values = pd.DataFrame({'id': np.arange(5 * TRACKED_VALUES).astype(str)})
+    profiler = DatasetProfiler()
+    for start in range(0, len(values), TRACKED_VALUES):
+        profiler.update(values.iloc[start:start + TRACKED_VALUES])
+    profile = profiler.result()['columns']['id']
+    assert profile['top_values_approximate']
+    assert abs(profile['distinct_count'] - len(values)) < 0.1 * len(values)
+
+
+def test_removed_rows_leave_the_counts(df):
+    profiler = DatasetProfiler()
+    profiler.update(df)
+    profiler.remove(df.iloc[:2])
+    result = profiler.result()
+    assert result['row_count'] == 3
+    region = result['columns']['region']
+    assert region['top_values'] == [{'value': 'north', 'count': 2}]
+    assert region['range_approximate']
+    assert result['columns']['amount']['mean'] == 3.5
+
+
+def test_profile_endpoint_serves_the_ingest_profile(client, upload, df):
+    dataset_id = upload(df)
+    body = client.get(f'/api/datasets/{dataset_id}/profile').get_json()
+    assert body['columns'] == list(df.columns)
+    assert body['row_count'] == 5
+    assert body['column_profiles']['region']['top_values'][0] == {'value': 'north', 'count': 3}
+    assert body['column_profiles']['amount']['dtype'] == 'float64'
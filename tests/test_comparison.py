@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+from comparison import compare_frames, diff_details
+
+
+@pytest.fixture
+def before():
+    return pd.DataFrame({
+        'loan': ['a', 'b', 'c', 'c'],
+        'branch': ['east', 'west', 'east', 'east'],
+        'balance': [100.0, 200.0, 50.0, 25.0],
+        'active': [True, True, False, False],
+    })
+
+
+@pytest.fixture
+def after():
+    return pd.DataFrame({
+        'loan': ['a', 'c', 'd'],
+        'branch': ['east', 'east', 'west'],
+        'balance': [100.0, 80.0, 10.0],
+        'active': [True, True, True],
+    })
+
+
+def test_keys_are_classified_by_status(before, after):
+    result = compare_frames(before, after, ['loan'])
+    keys = result['keys'].set_index('loan')
+    assert keys['status'].to_dict() == {'a': 'unchanged', 'b': 'removed', 'c': 'changed', 'd': 'added'}
+    # Duplicate keys are summed first
+    assert keys.loc['c', 'balance_1'] == 75.0 and keys.loc['c', 'balance_delta'] == 5.0
+    assert keys.loc['b', 'balance_delta'] == -200.0 and keys.loc['d', 'balance_delta'] == 10.0
+
+
+def test_summary(before, after):
+    summary = compare_frames(before, after, ['loan'])['summary']
+    # Booleans are not summed as numbers
+    assert summary['numeric_columns'] == ['balance']
+    assert summary['keys'] == {'added': 1, 'removed': 1, 'changed': 1, 'unchanged': 1}
+    assert summary['rows'] == {'dataset1': 4, 'dataset2': 3}
+    assert summary['totals']['balance'] == {'dataset1': 375.0, 'dataset2': 190.0, 'delta': -185.0}
+
+
+def test_group_totals(before, after):
+    groups = compare_frames(before, after, ['loan'], group_by='branch')['groups'].set_index('branch')
+    assert groups['balance_delta'].to_dict() == {'east': 5.0, 'west': -190.0}
+
+
+def test_missing_key_column(before, after):
+    with pytest.raises(ValueError, match='Column nope must exist in both datasets'):
+        compare_frames(before, after, ['nope'])
+
+
+def test_details_are_paged_by_status(before, after):
+    keys = compare_frames(before, after, ['loan'])['keys']
+    page, total = diff_details(keys, offset=1, limit=2)
+    assert total == 4 and page['loan'].tolist() == ['b', 'c']
+    page, total = diff_details(keys, status='added')
+    assert total == 1 and page['loan'].tolist() == ['d']
+
+
+@pytest.fixture
+def comparison_id(client, upload, before, after):
+    first, second = upload(before), upload(after)
+    response = client.post('/api/portfolio-comparisons',
+                           json={'dataset1_id': first, 'dataset2_id': second, 'key_column': 'loan'})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_diff_endpoint(client, comparison_id):
+    body = client.get(f'/api/portfolio-comparisons/{comparison_id}/diff?status=changed').get_json()
+    assert body['summary']['keys']['changed'] == 1
+    assert body['details']['total_count'] == 1
+    assert body['details']['data'][0]['loan'] == 'c'
+
+
+@pytest.mark.parametrize('query', ['offset=-1', 'limit=0', 'limit=x', 'status=gone'])
+def test_diff_endpoint_rejects_bad_paging(client, comparison_id, query):
+    assert client.get(f'/api/portfolio-comparisons/{comparison_id}/diff?{query}').status_code == 400
@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+import pytest
+import db
+
+
+@pytest.fixture
+def database(workdir):
+    conn = db.connect('test.db')
+    conn.execute(db.WAL_PRAGMA)
+    conn.execute('CREATE TABLE parent (id INTEGER PRIMARY KEY)')
+    conn.execute('CREATE TABLE child (id INTEGER PRIMARY KEY, parent_id INTEGER REFERENCES parent(id) ON DELETE CASCADE)')
+    conn.commit()
+    conn.release()
+    return 'test.db'
+
+
+def test_connections_are_reused_across_threads(database, monkeypatch):
+    opened = []
+    connect = db.connect
+    monkeypatch.setattr(db, 'connect', lambda path: opened.append(path) or connect(path))
+
+    def request():
+        conn = db.get_connection(database)
+        conn.execute('SELECT 1').fetchone()
+        conn.close()
+
+    for _ in range(20):
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+    assert opened == [database]
+
+
+def test_busy_connections_are_not_shared(database):
+    first = db.get_connection(database)
+    second = db.get_connection(database)
+    assert first is not second
+    first.close()
+    second.close()
+
+
+def test_close_rolls_back_and_returns_once(database):
+    conn = db.get_connection(database)
+    conn.execute('INSERT INTO parent (id) VALUES (1)')
+    conn.close()
+    conn.close()  # a second close must not hand the connection out twice
+
+    first = db.get_connection(database)
+    second = db.get_connection(database)
+    assert first is not second
+    assert first.execute('SELECT COUNT(*) FROM parent').fetchone()[0] == 0
+    first.close()
+    second.close()
+
+
+def test_idle_connections_are_bounded(database, monkeypatch):
+    monkeypatch.setattr(db, 'POOL_SIZE', 2)
+    db.reset_pool()
+    conns = [db.get_connection(database) for _ in range(4)]
+    for conn in conns:
+        conn.close()
+    assert db._pools[database].qsize() == 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        conns[-1].execute('SELECT 1')
+
+
+def test_pragmas(database):
+    conn = db.get_connection(database)
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    conn.execute('INSERT INTO parent (id) VALUES (1)')
+    conn.execute('INSERT INTO child (parent_id) VALUES (1)')
+    conn.execute('DELETE FROM parent')
+    assert conn.execute('SELECT COUNT(*) FROM child').fetchone()[0] == 0
+    conn.close()
+
+
+def test_statement_time_is_reported(database, monkeypatch):
+    conn = db.get_connection(database)
+    timings = []
+    monkeypatch.setattr(db, 'query_hook', timings.append)
+    conn.execute('SELECT 1').fetchall()
+    conn.close()
+    assert len(timings) == 2 and all(seconds >= 0 for seconds in timings)
+
+
+def test_app_database_has_its_indexes(glimpsy):
+    conn = glimpsy.get_db_connection()
+    names = {row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    conn.close()
+    assert {'idx_dataset_records_dataset_id', 'idx_datasets_created_at'} <= names
@@ -0,0 +1,128 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from downsample import (DAY_NS, ROLLUP_BUCKETS, build_rollup, format_times, lttb, minmax, parse_series_params,
+                        rollup_points)
+
+ROWS = 5000
+COLUMNS = ['Date', 'Value', 'Region']
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.integers(0, 365 * DAY_NS, ROWS))
+    values = np.sin(np.arange(ROWS) / 300) + rng.normal(0, 0.05, ROWS)
+    values[1234] = 40.0
+    values[4321] = -40.0
+    return times, values
+
+
+def reference_lttb(x, y, threshold):
+    """Straight loop over the buckets, as the algorithm is usually written"""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    kept, a = [0], 0
+    for i in range(threshold - 2):
+        start, stop = int(i * every) + 1, int((i + 1) * every) + 1
+        next_stop = min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        area = [abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) for j in range(start, stop)]
+        a = start + int(np.argmax(area))
+        kept.append(a)
+    return kept + [n - 1]
+
+
+def test_lttb_matches_the_reference(series):
+    times, values = series
+    kept = lttb(times, values, 100)
+    assert len(kept) == 100 and kept[0] == 0 and kept[-1] == ROWS - 1
+    assert kept.tolist() == reference_lttb((times - times[0]) / 1e9, values, 100)
+    assert {1234, 4321} <= set(kept.tolist())
+    assert lttb(times[:50], values[:50], 100).tolist() == list(range(50))
+
+
+def test_minmax_keeps_each_buckets_extremes(series):
+    times, values = series
+    kept = minmax(times, values, times[0], times[-1], 50)
+    assert np.all(np.diff(kept) > 0) and len(kept) <= 100
+    buckets = np.clip(((times - times[0]) / (times[-1] - times[0]) * 50).astype(int), 0, 49)
+    for bucket in (0, 17, 49):
+        rows = np.flatnonzero(buckets == bucket)
+        assert values[kept[np.isin(kept, rows)]].max() == values[rows].max()
+        assert values[kept[np.isin(kept, rows)]].min() == values[rows].min()
+    assert minmax(times[:0], values[:0], 0, 0, 10).tolist() == []
+
+
+def test_rollups_keep_extremes_at_every_level(series):
+    times, values = series
+    rollup = build_rollup(times, values)
+    assert rollup['buckets'] == [ROLLUP_BUCKETS, ROLLUP_BUCKETS // 4, ROLLUP_BUCKETS // 16]
+    for width in (10, 500, 2000):
+        points = rollup_points(rollup, None, None, width)
+        assert points[1].max() == 40.0 and points[1].min() == -40.0
+        assert np.all(np.diff(points[0]) >= 0)
+    # Zoomed in further than the finest level can show
+    assert rollup_points(rollup, times[0], times[10], 1000) is None
+    lo, hi = times[1000], times[3000]
+    points = rollup_points(rollup, lo, hi, 20)
+    assert points[0].min() >= lo and points[0].max() <= hi and 40.0 in points[1]
+
+
+def test_rollup_skips_missing_values(series):
+    times, values = series
+    values = values.copy()
+    values[::2] = np.nan
+    rollup = build_rollup(times, values)
+    assert not np.isnan(rollup_points(rollup, None, None, 10)[1]).any()
+
+
+def test_format_times():
+    assert format_times(np.array([0, DAY_NS])) == ['1970-01-01', '1970-01-02']
+    assert format_times(np.array([0, 10 ** 9])) == ['1970-01-01T00:00:00', '1970-01-01T00:00:01']
+    assert format_times(np.array([10 ** 6])) == ['1970-01-01T00:00:00.001']
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'x': 'Region', 'y': 'Value'}, 'x must be a date column'),
+    ({'y': 'Nope'}, 'Unknown y column'),
+    ({'y': 'Value', 'width': 2}, 'width must be between'),
+    ({'y': 'Value', 'method': 'mean'}, 'method must be one of'),
+    ({'y': 'Value', 'start': '2024-02-01', 'end': '2024-01-01'}, 'start must not be after end'),
+    ({'y': 'Value', 'start': 'soon'}, 'start must be a date'),
+])
+def test_invalid_params(args, message):
+    with pytest.raises(ValueError, match=message):
+        parse_series_params(args, COLUMNS)
+
+
+@pytest.fixture
+def dataset_id(upload, series):
+    times, values = series
+    return upload(pd.DataFrame({
+        'Date': pd.to_datetime(times).strftime('%Y-%m-%d %H:%M:%S'),
+        'Value': values.round(6),
+        'Region': np.where(np.arange(ROWS) % 2, 'North', 'South'),
+    }))
+
+
+def chart(client, dataset_id, **args):
+    response = client.get(f'/api/datasets/{dataset_id}/series', query_string={'y': 'Value', **args})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_series_endpoint_sources(glimpsy, client, dataset_id):
+    rows = chart(client, dataset_id, width=100)
+    assert rows['source'] == 'rows' and rows['x'] == 'Date' and rows['point_count'] == 100
+
+    glimpsy.index_dataset(dataset_id)
+    rollup = chart(client, dataset_id, width=100, method='minmax')
+    assert rollup['source'] == 'rollup'
+    assert max(rollup['data']['y']) == 40.0 and min(rollup['data']['y']) == -40.0
+
+    # Filters read the rows in range through the date index
+    filtered = chart(client, dataset_id, width=100, filters=json.dumps({'Region': ['North']}))
+    assert filtered['source'] == 'rows' and filtered['point_count'] == 100
+    assert client.get(f'/api/datasets/{dataset_id}/series?y=Value&width=1').status_code == 400
@@ -0,0 +1,76 @@
+import gzip
+import json
+import pandas as pd
+import pyarrow as pa
+import pytest
+from encoding import FastJSONProvider, MIN_COMPRESS_BYTES, frame_to_arrow
+
+
+@pytest.fixture
+def dataset_id(upload):
+    return upload(pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=200).strftime('%Y-%m-%d'),
+        'Region': ['North', 'South'] * 100,
+        'Amount': [float(i) for i in range(200)],
+    }))
+
+
+def test_layouts_carry_the_same_rows(client, dataset_id):
+    records = client.get(f'/api/datasets/{dataset_id}').get_json()
+    columns = client.get(f'/api/datasets/{dataset_id}?layout=columns').get_json()
+    assert 'layout' not in records and columns['layout'] == 'columns'
+    assert columns['data']['Amount'] == [row['Amount'] for row in records['data']]
+    assert columns['total_count'] == records['total_count']
+
+    response = client.get(f'/api/datasets/{dataset_id}?layout=arrow')
+    assert response.mimetype == 'application/vnd.apache.arrow.stream'
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.column('Region').to_pylist() == [row['Region'] for row in records['data']]
+    metadata = json.loads(table.schema.metadata[b'glimpsy'])
+    assert metadata['total_count'] == records['total_count']
+
+
+def test_layout_from_accept_header(client, dataset_id):
+    response = client.get(f'/api/datasets/{dataset_id}', headers={'Accept': 'application/vnd.glimpsy.columns+json'})
+    assert response.get_json()['layout'] == 'columns'
+    assert 'Accept' in response.vary
+
+
+def test_unknown_layout(client, dataset_id):
+    response = client.get(f'/api/datasets/{dataset_id}?layout=xml')
+    assert response.status_code == 400 and 'layout must be one of' in response.get_json()['error']
+
+
+def test_filter_and_aggregate_layouts(client, dataset_id):
+    body = client.post(f'/api/datasets/{dataset_id}/filter?layout=columns',
+                       json={'filters': {'Region': ['North']}}).get_json()
+    assert set(body['data']['Region']) == {'North'}
+    body = client.post(f'/api/datasets/{dataset_id}/aggregate?layout=columns',
+                       json={'group_by': ['Region'], 'metrics': {'Amount': ['sum']}}).get_json()
+    assert body['layout'] == 'columns'
+
+
+def test_gzip(client, dataset_id):
+    plain = client.get(f'/api/datasets/{dataset_id}')
+    assert 'Content-Encoding' not in plain.headers and 'Accept-Encoding' in plain.vary
+    response = client.get(f'/api/datasets/{dataset_id}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get('/api/datasets', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < MIN_COMPRESS_BYTES
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_json_provider(glimpsy):
+    provider = FastJSONProvider(glimpsy.app)
+    assert json.loads(provider.dumps({'b': 1, 'a': [1.5, None]})) == {'a': [1.5, None], 'b': 1}
+    # Integers beyond 64 bits fall back to the stdlib encoder
+    assert json.loads(provider.dumps({'n': 2 ** 70})) == {'n': 2 ** 70}
+
+
+def test_arrow_without_metadata():
+    table = pa.ipc.open_stream(frame_to_arrow(pd.DataFrame({'x': [1, 2]}))).read_all()
+    assert table.schema.metadata is None and table.column('x').to_pylist() == [1, 2]
@@ -0,0 +1,74 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+import storage
+
+
+@pytest.fixture
+def rows():
+    return pd.DataFrame({
+        'region': ['north', 'south', 'north', np.nan],
+        'amount': [1.5, 2.0, None, 4.0],
+        'count': [1, 2, 3, 4],
+    })
+
+
+def export(client, dataset_id, **args):
+    response = client.get(f'/api/datasets/{dataset_id}/export', query_string=args)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.is_streamed
+    return response
+
+
+@pytest.mark.parametrize('cached', [False, True])
+def test_csv_export_streams_every_batch(glimpsy, client, upload, rows, monkeypatch, cached):
+    monkeypatch.setattr(glimpsy, 'EXPORT_BATCH_ROWS', 3)
+    dataset_id = upload(rows, name='sales')
+    if cached:
+        glimpsy.dataset_cache.put_frame(dataset_id, storage.read_frame(dataset_id))
+
+    response = export(client, dataset_id)
+    assert response.headers['Content-Disposition'] == 'attachment; filename="sales_export.csv"'
+    tm.assert_frame_equal(pd.read_csv(io.BytesIO(response.get_data())), rows)
+
+
+def test_filters_and_columns(client, upload, rows):
+    dataset_id = upload(rows)
+    response = export(client, dataset_id, filters=json.dumps({'region': ['north']}), columns='count')
+    assert response.get_data(as_text=True).splitlines() == ['count', '1', '3']
+
+
+def test_ndjson_export(client, upload, rows):
+    dataset_id = upload(rows)
+    lines = export(client, dataset_id, format='ndjson').get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines][2:] == [
+        {'region': 'north', 'amount': None, 'count': 3},
+        {'region': None, 'amount': 4.0, 'count': 4},
+    ]
+
+
+def test_parquet_export_keeps_the_stored_schema(glimpsy, client, upload, rows, monkeypatch):
+    monkeypatch.setattr(glimpsy, 'EXPORT_BATCH_ROWS', 2)
+    dataset_id = upload(rows)
+    data = export(client, dataset_id, format='parquet').get_data()
+    tm.assert_frame_equal(pd.read_parquet(io.BytesIO(data)), storage.read_frame(dataset_id))
+
+
+def test_unknown_format_or_columns(client, upload, rows):
+    dataset_id = upload(rows)
+    assert client.get(f'/api/datasets/{dataset_id}/export?format=xlsx').status_code == 400
+    assert client.get(f'/api/datasets/{dataset_id}/export?columns=nope').status_code == 400
+
+
+@pytest.mark.filterwarnings('ignore:Parsing dates in %d/%m/%Y format')
+def test_batches_parse_dates_with_one_format(glimpsy, client, upload, monkeypatch):
+    monkeypatch.setattr(glimpsy, 'EXPORT_BATCH_ROWS', 2)
+    # Day first, as the first value shows; the second batch starts with an ambiguous date
+    dataset_id = upload(pd.DataFrame({'trade_date': ['13/01/2024', '31/01/2024', '02/01/2024', '05/02/2024'],
+                                      'n': [1, 2, 3, 4]}))
+    filters = json.dumps({'start_date': '2024-01-01', 'end_date': '2024-01-31'})
+    response = export(client, dataset_id, filters=filters, columns='n')
+    assert response.get_data(as_text=True).splitlines() == ['n', '1', '2', '3']
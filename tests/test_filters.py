@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+from filters import apply_filters, filter_mask, get_date_columns, parse_dates
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'region': ['North', 'south', 'East', None, 'north'],
+        'amount': [10, 25.5, '40', 'n/a', 100],
+        'order_date': ['2024-01-05', '2024-02-10', 'not a date', '2024-03-01', None],
+        'code': [1, 2, 3, 4, 5],
+    })
+
+
+def mask(df, filters):
+    return filter_mask(df, filters, list(df.columns)).tolist()
+
+
+def test_no_filters_keep_every_row(df):
+    assert mask(df, {}) == [True] * 5
+    assert mask(df, None) == [True] * 5
+
+
+def test_categorical_filter_is_case_insensitive(df):
+    assert mask(df, {'region': ['NORTH', 'east']}) == [True, False, True, False, True]
+
+
+def test_all_or_empty_list_skips_the_filter(df):
+    assert mask(df, {'region': ['All']}) == [True] * 5
+    assert mask(df, {'region': []}) == [True] * 5
+    assert mask(df, {'region': ''}) == [True] * 5
+
+
+def test_missing_values_match_the_empty_string(df):
+    assert mask(df, {'region': ['']}) == [False, False, False, True, False]
+
+
+def test_single_value_matches_exactly(df):
+    assert mask(df, {'region': 'South'}) == [False, True, False, False, False]
+    assert mask(df, {'code': 3}) == [False, False, True, False, False]
+
+
+def test_range_filter_coerces_numbers(df):
+    assert mask(df, {'amount': {'min': 20, 'max': '50'}}) == [False, True, True, False, False]
+    assert mask(df, {'amount': {'min': 'bad'}}) == [True] * 5
+
+
+def test_date_range_applies_to_date_like_columns(df):
+    result = mask(df, {'start_date': '2024-02-01', 'end_date': '2024-03-31'})
+    assert result == [False, True, False, True, False]
+    assert mask(df, {'start_date': 'whenever'}) == [True] * 5
+
+
+def test_unknown_columns_are_ignored(df):
+    assert mask(df, {'missing': ['x']}) == [True] * 5
+
+
+def test_date_columns_are_found_by_name():
+    assert get_date_columns(['order_date', 'Created_At', 'amount', 'timestamp']) == \
+        ['order_date', 'Created_At', 'timestamp']
+
+
+def test_parse_dates_retries_values_the_inferred_format_rejects():
+    parsed = parse_dates(pd.Series(['2024-01-05', 'March 3, 2024', '', None]))
+    assert parsed.tolist()[:2] == [pd.Timestamp('2024-01-05'), pd.Timestamp('2024-03-03')]
+    assert parsed.isna().tolist() == [False, False, True, True]
+
+
+def test_parse_dates_uses_a_given_format():
+    parsed = parse_dates(pd.Series(['01/02/2024', '03/04/2024']), '%d/%m/%Y')
+    assert parsed.tolist() == [pd.Timestamp('2024-02-01'), pd.Timestamp('2024-04-03')]
+
+
+def test_apply_filters_returns_matching_rows_renumbered(df):
+    result = apply_filters(df, {'region': ['north']}, list(df.columns))
+    assert result['code'].tolist() == [1, 5]
+    assert result.index.tolist() == [0, 1]
+
+
+def test_filter_endpoint_returns_matching_rows(client, upload):
+    dataset_id = upload(pd.DataFrame({'region': ['north', 'south', 'north'], 'sales': [1, 2, 3]}))
+    response = client.post(f'/api/datasets/{dataset_id}/filter', json={'filters': {'region': ['North']}})
+    body = response.get_json()
+    assert body['row_count'] == 2 and body['original_count'] == 3
+    assert [row['sales'] for row in body['data']] == [1, 3]
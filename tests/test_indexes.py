@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+import storage
+from filters import filter_mask
+from indexes import (INVERTED, SORTED, IndexKeys, build_indexes, candidate_rows, indexed_filter_mask,
+                     inverted_index)
+
+ROWS = 2000
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    amount = rng.uniform(0, 1000, ROWS).round(2)
+    amount[::50] = np.nan
+    region = rng.choice(['North', 'north', 'South', 'East', 'Wést', None], ROWS).astype(object)
+    return pd.DataFrame({
+        'Date': pd.date_range('2023-01-01', periods=ROWS, freq='h').strftime('%Y-%m-%d %H:%M'),
+        'Region': region,
+        'Code': [f'c{i}' for i in range(ROWS)],
+        'Amount': amount,
+        'Active': rng.random(ROWS) < 0.5,
+    })
+
+
+@pytest.fixture
+def indexes(frame):
+    return build_indexes(lambda col: frame[col], list(frame.columns))
+
+
+def test_index_kinds(indexes):
+    columns = indexes['columns']
+    assert indexes['row_count'] == ROWS
+    assert columns['Amount']['kind'] == SORTED and columns['Date'].get('date')
+    assert columns['Region']['kind'] == INVERTED
+    # Booleans, and text with a distinct value on most rows, are not indexed
+    assert 'Active' not in columns and 'Code' not in columns
+
+
+def test_inverted_keys_are_lowercased_and_encoded(frame, indexes):
+    index = indexes['columns']['Region']
+    keys = IndexKeys(index)
+    assert list(keys.text(range(len(keys)))) == ['', 'east', 'north', 'south', 'wést']
+    assert index['key_data'].dtype == np.uint8
+    north = keys.find('north')
+    rows = index['rows'][index['offsets'][north]:index['offsets'][north + 1]]
+    assert sorted(rows) == list(np.flatnonzero(frame['Region'].str.lower() == 'north'))
+    assert keys.find('west') is None
+
+
+def test_distinct_ratio_threshold():
+    # One distinct value per 10 rows is the most an inverted index is built for
+    assert inverted_index(pd.Series([f'v{i % 10}' for i in range(100)]), 100)['kind'] == INVERTED
+    assert inverted_index(pd.Series([f'v{i % 11}' for i in range(100)]), 100) is None
+
+
+@pytest.mark.parametrize('filters', [
+    {'Region': ['north']},
+    {'Region': 'EAST'},
+    {'Region': ['Wést', 'South'], 'Amount': {'min': 100}},
+    {'Amount': {'min': 10, 'max': 50}},
+    {'Amount': {'min': 'x', 'max': 20}},
+    {'start_date': '2023-02-01', 'end_date': '2023-02-03'},
+    {'start_date': '2023-02-01', 'Region': ['all']},
+    {'Region': ['nowhere']},
+])
+def test_indexed_mask_equals_scan(frame, indexes, filters):
+    columns = list(frame.columns)
+    expected = filter_mask(frame, filters, columns)
+    assert indexed_filter_mask(indexes, frame, filters, columns).tolist() == expected.tolist()
+
+
+def test_unselective_or_stale_indexes_scan(frame, indexes):
+    columns = list(frame.columns)
+    assert candidate_rows(indexes, {'Amount': {'min': 0}}, columns, ROWS, columns) is None
+    assert candidate_rows(indexes, {'Amount': {'max': 10}}, columns, ROWS + 1, columns) is None
+    assert len(candidate_rows(indexes, {'Amount': {'max': 10}}, columns, ROWS, columns)) < 0.02 * ROWS
+
+
+def test_indexes_are_built_in_the_background(glimpsy, upload, frame, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(glimpsy, 'schedule_index_build', scheduled.append)
+    dataset_id = upload(frame)
+    assert scheduled == [dataset_id]
+    assert glimpsy.dataset_indexes(dataset_id) is None
+
+
+def test_saved_indexes_round_trip(glimpsy, client, upload, frame):
+    dataset_id = upload(frame)
+    built = glimpsy.index_dataset(dataset_id)
+    glimpsy.dataset_cache.clear()
+    loaded = glimpsy.dataset_indexes(dataset_id)
+    assert loaded['row_count'] == built['row_count'] == ROWS
+    for name, index in built['columns'].items():
+        for key, value in index.items():
+            np.testing.assert_array_equal(loaded['columns'][name][key], value)
+
+    body = client.post(f'/api/datasets/{dataset_id}/filter',
+                       json={'filters': {'Region': ['east']}, 'explain': True, 'limit': 5}).get_json()
+    assert body['total_count'] == int((frame['Region'] == 'East').sum())
+    assert body['plan']['rows_scanned'] == body['total_count']
+
+
+def test_changed_rows_invalidate_saved_indexes(glimpsy, upload, frame):
+    dataset_id = upload(frame)
+    glimpsy.index_dataset(dataset_id)
+    storage.write_frame(dataset_id, frame.head(10))
+    glimpsy.dataset_cache.clear()
+    assert glimpsy.dataset_indexes(dataset_id) is None
@@ -0,0 +1,77 @@
+import os
+import io
+import pandas as pd
+import pandas.testing as tm
+import pyarrow.parquet as pq
+import pytest
+from ingest import MIN_CHUNK_ROWS, ingest_file
+
+
+def ingest(path, ext, progress=None):
+    # The smallest budget, so every chunk is MIN_CHUNK_ROWS rows
+    return ingest_file(str(path), ext, memory_budget=1, on_progress=progress)
+
+
+def test_csv_chunks_agree_on_the_whole_file_dtypes(workdir):
+    rows = 3 * MIN_CHUNK_ROWS + 10
+    df = pd.DataFrame({
+        'id': range(rows),
+        # Integers until the last chunk, which has a decimal
+        'amount': [1] * (rows - 1) + [2.5],
+        # Numbers, then text in the last chunk
+        'code': ['7'] * (rows - 1) + ['x7'],
+    })
+    df.to_csv('upload.csv', index=False)
+    progress = []
+
+    result = ingest('upload.csv', 'csv', progress.append)
+
+    expected = pd.read_csv('upload.csv')
+    tm.assert_frame_equal(pd.read_parquet(result['staging_path']), expected)
+    assert result['row_count'] == rows
+    assert result['column_types'] == {'id': 'int64', 'amount': 'float64', 'code': 'object'}
+    assert progress == [MIN_CHUNK_ROWS, 2 * MIN_CHUNK_ROWS, 3 * MIN_CHUNK_ROWS, rows]
+    assert pq.ParquetFile(result['staging_path']).metadata.num_row_groups == 4
+
+
+def test_header_only_csv(workdir):
+    with open('empty.csv', 'w') as f:
+        f.write('a,b\n')
+    result = ingest('empty.csv', 'csv')
+    assert result['row_count'] == 0
+    assert result['columns'] == ['a', 'b']
+
+
+@pytest.mark.parametrize('index', [None, [10, 20, 30]])
+def test_parquet_drops_the_stored_pandas_index(workdir, index):
+    df = pd.DataFrame({'x': [1, 2, 3], 'y': ['a', 'b', 'c']}, index=index)
+    df.to_parquet('upload.parquet')
+    result = ingest('upload.parquet', 'parquet')
+    assert result['columns'] == ['x', 'y']
+    tm.assert_frame_equal(pd.read_parquet(result['staging_path']), df.reset_index(drop=True))
+
+
+def test_parquet_keeps_a_named_index_as_a_column(workdir):
+    df = pd.DataFrame({'x': [1, 2]}, index=pd.Index(['a', 'b'], name='key'))
+    df.to_parquet('upload.parquet')
+    result = ingest('upload.parquet', 'parquet')
+    assert result['columns'] == ['x', 'key']
+    assert result['profile']['columns']['key']['dtype'] == 'object'
+
+
+def test_unsupported_files_leave_no_staging_file(workdir):
+    with open('notes.txt', 'w') as f:
+        f.write('hello')
+    with pytest.raises(ValueError):
+        ingest('notes.txt', 'txt')
+    assert not [name for name in os.listdir('store') if name.startswith('.staging-')]
+
+
+def test_parquet_upload(client):
+    buffer = io.BytesIO()
+    pd.DataFrame({'x': [1.5, 2.5]}, index=[5, 6]).to_parquet(buffer)
+    buffer.seek(0)
+    response = client.post('/api/datasets', data={'file': (buffer, 'values.parquet'), 'wait': 'true'})
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['columns'] == ['x'] and body['row_count'] == 2
@@ -0,0 +1,73 @@
+import os
+import pandas as pd
+import pytest
+from flask import Flask
+from instrumentation import Histogram, BUCKETS, escape, phase, server_timing
+
+
+def test_histogram_is_cumulative():
+    histogram = Histogram('h_seconds', 'Help', ('endpoint',))
+    for value in (0.003, 0.02, 60.0):
+        histogram.observe(('e',), value)
+    lines = histogram.render()
+    assert lines[:2] == ['# HELP h_seconds Help', '# TYPE h_seconds histogram']
+    buckets = [int(line.split()[-1]) for line in lines if line.startswith('h_seconds_bucket')]
+    assert len(buckets) == len(BUCKETS) + 1
+    assert buckets[0] == 1 and buckets[-2] == 2 and buckets[-1] == 3
+    assert 'h_seconds_count{endpoint="e"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    assert escape('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+
+def test_phases_add_up():
+    app = Flask(__name__)
+    with app.test_request_context():
+        from flask import g
+        g.phases = {}
+        with phase('load'):
+            pass
+        with phase('load'):
+            pass
+        assert list(g.phases) == ['load'] and g.phases['load'] >= 0
+    # Outside a request phases are not recorded
+    with phase('load'):
+        pass
+
+
+def test_server_timing_header():
+    assert server_timing({'db': 0.0015}, 0.01) == 'db;dur=1.50, total;dur=10.00'
+
+
+def test_metrics_endpoint(client, upload):
+    dataset_id = upload(pd.DataFrame({'x': [1, 2]}))
+    client.get(f'/api/datasets/{dataset_id}')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'glimpsy_request_duration_seconds_count{endpoint="get_dataset",method="GET",status="200"}' in body
+    assert 'glimpsy_request_phase_seconds_count{endpoint="get_dataset",phase="serialize"}' in body
+    # Statement time comes from the pooled connection's timing cursor
+    assert 'glimpsy_request_phase_seconds_count{endpoint="get_dataset",phase="db"}' in body
+    assert '# TYPE glimpsy_cache_hits gauge' in body
+
+
+def test_server_timing_and_profiles(glimpsy, client, upload, monkeypatch, tmp_path):
+    dataset_id = upload(pd.DataFrame({'x': [1, 2]}))
+    assert 'Server-Timing' not in client.get(f'/api/datasets/{dataset_id}').headers
+
+    monkeypatch.setitem(glimpsy.app.config, 'SERVER_TIMING', True)
+    monkeypatch.setitem(glimpsy.app.config, 'PROFILE_SLOW_MS', 0.0)
+    monkeypatch.setitem(glimpsy.app.config, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    header = client.get(f'/api/datasets/{dataset_id}').headers['Server-Timing']
+    assert header.split(', ')[-1].startswith('total;dur=')
+    profiles = os.listdir(tmp_path / 'profiles')
+    assert len(profiles) == 1 and '_get_dataset_' in profiles[0]
+
+
+@pytest.mark.parametrize('rate, expected', [(0.0, False), (1.0, True)])
+def test_profile_sample_rate(glimpsy, client, monkeypatch, tmp_path, rate, expected):
+    monkeypatch.setitem(glimpsy.app.config, 'PROFILE_SLOW_MS', 0.0)
+    monkeypatch.setitem(glimpsy.app.config, 'PROFILE_SAMPLE_RATE', rate)
+    monkeypatch.setitem(glimpsy.app.config, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    client.get('/api/datasets')
+    assert os.path.isdir(tmp_path / 'profiles') == expected
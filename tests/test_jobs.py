@@ -0,0 +1,57 @@
+import io
+import os
+import time
+from jobs import JOB_COMPLETED, JOB_FAILED, JOB_RUNNING, create_job, get_job, update_job
+
+
+def wait_for_job(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        if job['status'] in (JOB_COMPLETED, JOB_FAILED) or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_upload_runs_as_a_background_job(client):
+    body = io.BytesIO(b'a,b\n1,x\n2,y\n3,z\n')
+    response = client.post('/api/datasets', data={'file': (body, 'rows.csv'), 'name': 'rows'})
+    assert response.status_code == 202
+    accepted = response.get_json()
+    assert accepted['status_url'] == f"/api/jobs/{accepted['job_id']}"
+
+    job = wait_for_job(client, accepted['job_id'])
+    assert job['status'] == JOB_COMPLETED
+    assert job['rows_processed'] == 3 and job['kind'] == 'upload' and job['filename'] == 'rows.csv'
+    dataset = client.get(f"/api/datasets/{job['dataset_id']}").get_json()
+    assert dataset['name'] == 'rows' and dataset['total_count'] == 3
+
+
+def test_failed_ingest_records_the_error_and_removes_the_upload(client):
+    body = io.BytesIO(b'not parquet at all')
+    accepted = client.post('/api/datasets', data={'file': (body, 'broken.parquet')}).get_json()
+
+    job = wait_for_job(client, accepted['job_id'])
+    assert job['status'] == JOB_FAILED
+    assert job['error'].startswith('Error reading file')
+    assert job['dataset_id'] is None
+    assert os.listdir('uploads') == []
+
+
+def test_unknown_job(client):
+    assert client.get('/api/jobs/nope').status_code == 404
+
+
+def test_jobs_interrupted_by_a_restart_are_failed(glimpsy):
+    conn = glimpsy.get_db_connection()
+    job_id = create_job(conn, 'upload', 'big.csv')
+    update_job(conn, job_id, status=JOB_RUNNING, rows_processed=500)
+    conn.close()
+
+    glimpsy.init_db()
+
+    conn = glimpsy.get_db_connection()
+    job = get_job(conn, job_id)
+    conn.close()
+    assert job['status'] == JOB_FAILED and job['error'] == 'Interrupted by server restart'
+    assert job['rows_processed'] == 500
@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+import storage
+
+
+@pytest.fixture
+def dataset_id(upload):
+    return upload(pd.DataFrame({
+        'name': ['d', 'a', 'c', 'b', 'e'],
+        'score': [3, 1, None, 1, 2],
+        'team': ['x', 'y', 'x', 'y', 'x'],
+    }))
+
+
+@pytest.fixture(params=['storage', 'memory'])
+def source(request, glimpsy, dataset_id):
+    """Read pages from storage, or from the dataset's frame once it is cached"""
+    if request.param == 'memory':
+        glimpsy.dataset_cache.put_frame(dataset_id, storage.read_frame(dataset_id))
+    return request.param
+
+
+def page(client, dataset_id, **args):
+    response = client.get(f'/api/datasets/{dataset_id}', query_string=args)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_offset_and_limit(client, dataset_id, source):
+    body = page(client, dataset_id, offset=1, limit=2)
+    assert [row['name'] for row in body['data']] == ['a', 'c']
+    assert body['total_count'] == 5 and body['offset'] == 1 and body['limit'] == 2
+
+
+def test_sort_is_stable_with_missing_values_last(client, dataset_id, source):
+    body = page(client, dataset_id, sort='score')
+    assert [row['name'] for row in body['data']] == ['a', 'b', 'e', 'd', 'c']
+    body = page(client, dataset_id, sort='-score,name')
+    assert [row['name'] for row in body['data']] == ['d', 'e', 'a', 'b', 'c']
+
+
+def test_columns_are_projected(client, dataset_id, source):
+    body = page(client, dataset_id, columns='team,name', limit=1)
+    assert body['data'] == [{'team': 'x', 'name': 'd'}]
+    assert body['columns'] == ['name', 'score', 'team']
+
+
+def test_filtered_pages(client, dataset_id, source):
+    response = client.post(f'/api/datasets/{dataset_id}/filter',
+                           json={'filters': {'team': ['x']}, 'sort': '-name', 'limit': 2})
+    body = response.get_json()
+    assert body['total_count'] == 3
+    assert [row['name'] for row in body['data']] == ['e', 'd']
+
+
+@pytest.mark.parametrize('args, error', [
+    ({'offset': -1}, 'offset and limit must not be negative'),
+    ({'limit': 'ten'}, 'offset and limit must be integers'),
+    ({'sort': 'missing'}, 'Unknown sort column: missing'),
+    ({'columns': 'name,missing'}, 'Unknown columns: missing'),
+])
+def test_invalid_page_params(client, dataset_id, args, error):
+    response = client.get(f'/api/datasets/{dataset_id}', query_string=args)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+
+
+def test_pages_come_from_the_expected_source(client, dataset_id, source):
+    plan = page(client, dataset_id, limit=1, explain='true')['plan']
+    assert (plan.get('source') == 'memory') == (source == 'memory')
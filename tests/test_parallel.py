@@ -0,0 +1,77 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from aggregate import aggregate_frame
+from filters import filter_mask
+from parallel import PartitionPool
+
+pytestmark = pytest.mark.filterwarnings('ignore:Parsing dates in %d/%m/%Y format')
+
+
+@pytest.fixture
+def pool():
+    pool = PartitionPool(4, 100)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    rows = 1000
+    # Day-first dates: a partition starting at 02/03/2021 would guess month-first on its own
+    dates = pd.Timestamp('2021-01-13') + pd.to_timedelta(rng.integers(0, 200, rows), unit='D')
+    dates = dates.strftime('%d/%m/%Y').to_numpy()
+    dates[0] = '13/01/2021'
+    dates[250] = '02/03/2021'
+    return pd.DataFrame({
+        'Date': dates,
+        'Region': rng.choice(['North', 'South', 'East'], rows),
+        'Amount': rng.uniform(0, 100, rows),
+    })
+
+
+def test_partitions(pool):
+    assert pool.partitions(150) == [(0, 150)]
+    assert pool.partitions(250) == [(0, 125), (125, 250)]
+    bounds = pool.partitions(1001)
+    assert len(bounds) == 4 and bounds[0][0] == 0 and bounds[-1][1] == 1001
+    assert all(stop == start for (_, stop), (start, _) in zip(bounds, bounds[1:]))
+
+
+def test_map_keeps_row_order_and_runs_on_threads(pool, frame):
+    threads = set()
+
+    def first_row(part):
+        threads.add(threading.current_thread().name)
+        return part.index[0]
+
+    assert pool.map(first_row, frame) == [0, 250, 500, 750]
+    assert all(name.startswith('glimpsy-query') for name in threads)
+
+
+def test_nested_map_runs_inline(pool, frame):
+    assert pool.map(lambda part: len(pool.map(len, part)), frame) == [1, 1, 1, 1]
+
+
+@pytest.mark.parametrize('filters', [
+    {'Region': ['North']},
+    {'Amount': {'min': 20, 'max': 40}},
+    {'start_date': '2021-03-01', 'end_date': '2021-04-01'},
+    {'start_date': '2021-03-02', 'Region': ['East', 'South']},
+])
+def test_filter_mask_equals_serial(pool, frame, filters):
+    columns = list(frame.columns)
+    assert pool.filter_mask(frame, filters, columns).tolist() == filter_mask(frame, filters, columns).tolist()
+
+
+@pytest.mark.parametrize('spec', [
+    {'group_by': ['Region'], 'metrics': {'Amount': ['count', 'sum', 'mean', 'min', 'max']}},
+    {'metrics': {'Amount': ['sum', 'p50']}},
+    {'group_by': ['Region'], 'metrics': {'Amount': ['sum']}, 'time_bucket': {'column': 'Date', 'interval': 'month'}},
+])
+def test_aggregate_equals_serial(pool, frame, spec):
+    parallel = aggregate_frame(frame, map_partitions=pool.map, **spec)
+    serial = aggregate_frame(frame, **spec)
+    pd.testing.assert_frame_equal(parallel, serial, check_exact=False)
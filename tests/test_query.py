@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+import storage
+from aggregate import aggregate_frame
+from cache import DatasetCache
+from filters import filter_mask
+from indexes import add_zone_maps, build_indexes
+from query import Query, filter_columns
+
+ROWS = 1000
+COLUMNS = ['Date', 'Region', 'Amount', 'Units']
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    amount = np.arange(ROWS, dtype=float)
+    amount[::13] = np.nan
+    return pd.DataFrame({
+        # Sorted dates and amounts, so row groups have narrow ranges to prune by
+        'Date': pd.date_range('2023-01-01', periods=ROWS, freq='D').strftime('%Y-%m-%d'),
+        'Region': rng.choice(['North', 'South', 'East'], ROWS),
+        'Amount': amount,
+        'Units': rng.integers(0, 20, ROWS),
+    })
+
+
+@pytest.fixture
+def stored(workdir, frame, monkeypatch):
+    monkeypatch.setattr(storage, 'ROW_GROUP_ROWS', 100)
+    storage.write_frame(1, frame)
+    storage.write_deleted(storage.dataset_path(1), np.array([5, 500]))
+    return frame.drop(index=[5, 500]).reset_index(drop=True)
+
+
+def indexed_query(dataset_id=1, masks=None):
+    layout = storage.DatasetLayout(dataset_id)
+    indexes = build_indexes(lambda col: storage.read_frame(dataset_id, [col])[col], COLUMNS)
+    add_zone_maps(indexes, layout.group_starts, layout.group_rows)
+    indexes['signature'] = layout.signature
+    return Query(dataset_id, COLUMNS, indexes=indexes, masks=masks)
+
+
+FILTERS = [
+    {},
+    {'Region': ['North']},
+    {'Amount': {'min': 150, 'max': 320}},
+    {'start_date': '2024-06-01', 'end_date': '2024-06-30', 'Region': 'east'},
+    {'Amount': {'min': 'x'}, 'Units': {'max': 3}},
+]
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('indexed', [False, True])
+def test_rows_match_in_memory(stored, filters, indexed):
+    query = indexed_query() if indexed else Query(1, COLUMNS)
+    expected = stored[filter_mask(stored, filters, COLUMNS)]
+    expected = expected.sort_values(['Units', 'Amount'], ascending=[False, True], kind='mergesort',
+                                    na_position='last')
+    page, total = query.where(filters).order_by([('Units', False), ('Amount', True)]) \
+        .select(['Region', 'Amount']).slice(3, 7).rows()
+    assert total == len(expected)
+    pd.testing.assert_frame_equal(page.reset_index(drop=True),
+                                  expected[['Region', 'Amount']].iloc[3:10].reset_index(drop=True))
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_aggregate_matches_in_memory(stored, filters):
+    spec = {'group_by': ['Region'], 'metrics': {'Amount': ['sum', 'p50'], 'Units': ['max']}}
+    result, count = Query(1, COLUMNS).where(filters).group_by(**spec).aggregate()
+    filtered = stored[filter_mask(stored, filters, COLUMNS)]
+    assert count == len(filtered)
+    pd.testing.assert_frame_equal(result, aggregate_frame(filtered, **spec))
+
+
+def test_statistics_skip_row_groups(stored):
+    query = Query(1, COLUMNS).where({'Amount': {'min': 150, 'max': 320}})
+    query.rows()
+    stats = query.explain()
+    assert stats['row_groups'] == 10 and stats['row_groups_read'] == 3
+    assert stats['filter_columns'] == ['Amount']
+
+
+def test_zone_maps_and_candidates_narrow_reads(stored):
+    query = indexed_query().where({'start_date': '2024-06-01', 'end_date': '2024-06-30'})
+    _, total = query.rows()
+    assert total == 30 and query.explain()['rows_scanned'] == 30
+
+
+def test_stale_indexes_are_ignored(stored, frame):
+    query = indexed_query()
+    storage.write_frame(1, frame.iloc[::-1].reset_index(drop=True))
+    # The old zone maps would skip the last row group, which now holds these dates
+    _, total = query.where({'start_date': '2023-01-01', 'end_date': '2023-01-10'}).rows()
+    assert total == 10
+
+
+def test_masks_are_shared_with_the_cache(stored):
+    cache = DatasetCache(1 << 20)
+    filters = {'Region': ['South']}
+    Query(1, COLUMNS, masks=cache).where(filters).rows()
+    query = Query(1, COLUMNS, masks=cache).where(filters)
+    _, total = query.rows()
+    assert query.explain()['source'] == 'cached mask'
+    assert total == int((stored['Region'] == 'South').sum())
+
+
+def test_filter_columns():
+    assert filter_columns({'start_date': '2024-01-01', 'Region': [], 'Units': {'max': 3}, 'x': 1}, COLUMNS) \
+        == ['Date', 'Units']
+
+
+@pytest.mark.parametrize('resident', [False, True])
+@pytest.mark.parametrize('metrics', [
+    [{'column': ['Amount'], 'op': 'sum'}],
+    {'Nope': ['sum']},
+])
+def test_bad_metrics_are_rejected_on_both_paths(glimpsy, client, upload, frame, resident, metrics):
+    dataset_id = upload(frame)
+    if resident:
+        glimpsy.dataset_cache.put_frame(dataset_id, storage.read_frame(dataset_id))
+    response = client.post(f'/api/datasets/{dataset_id}/aggregate', json={'metrics': metrics})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_lazy_and_resident_endpoints_agree(glimpsy, client, upload, frame):
+    dataset_id = upload(frame)
+    requests = [
+        ('post', f'/api/datasets/{dataset_id}/filter', {'filters': {'Region': ['North']}, 'sort': '-Amount',
+                                                        'offset': 2, 'limit': 5}),
+        ('post', f'/api/datasets/{dataset_id}/aggregate', {'filters': {'Units': {'min': 5}}, 'group_by': ['Region'],
+                                                           'metrics': {'Amount': ['mean']}}),
+    ]
+    lazy = [getattr(client, method)(url, json=body).get_json() for method, url, body in requests]
+    glimpsy.dataset_cache.put_frame(dataset_id, storage.read_frame(dataset_id))
+    resident = [getattr(client, method)(url, json=body).get_json() for method, url, body in requests]
+    assert lazy == resident
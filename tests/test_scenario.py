@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import pytest
+import storage
+from scenario import MIN_RATE, Portfolio, parse_model, parse_scenarios, with_deltas
+
+MODEL = {'rate_column': 'Rate', 'principal_column': 'Principal', 'term_column': 'Term', 'term_unit': 'years'}
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'Rate': [2.0, 4.0, 0.1, np.nan],
+        'Principal': [1000.0, 3000.0, 500.0, 100.0],
+        'Term': [1, 2, 1, 1],
+        'Segment': ['Retail', 'Corporate', None, 'Retail'],
+    })
+
+
+def evaluate(frame, scenario, **model):
+    model = parse_model({**MODEL, **model}, list(frame.columns))
+    [scenario] = parse_scenarios([scenario], list(frame.columns))
+    return Portfolio(frame, model).evaluate(scenario)
+
+
+def test_unshocked_totals(frame):
+    metrics = evaluate(frame, {})['metrics']
+    # The row without a rate is left out of every total
+    assert metrics['row_count'] == 3 and metrics['total_principal'] == 4500.0
+    assert metrics['total_interest'] == pytest.approx(1000 * 0.02 + 3000 * 2 * 0.04 + 500 * 0.001)
+    assert metrics['total_value'] == pytest.approx(4500.0 + metrics['total_interest'])
+    assert metrics['avg_rate'] == pytest.approx((2.0 + 4.0 + 0.1) / 3)
+    assert metrics['weighted_rate'] == pytest.approx((2000 + 12000 + 50) / 4500)
+
+
+def test_parallel_shift_is_floored(frame):
+    metrics = evaluate(frame, {'bps': -300})['metrics']
+    assert metrics['avg_rate'] == pytest.approx((MIN_RATE + 1.0 + MIN_RATE) / 3)
+
+
+def test_value_and_range_shocks_add_up(frame):
+    scenario = {'bps': 10, 'shocks': [
+        {'column': 'Segment', 'values': {'retail': 100}},
+        {'column': 'Term', 'ranges': [{'min': 2, 'bps': 50}, {'max': 1, 'bps': -5}]},
+    ]}
+    groups = {group['group']: group for group in evaluate(frame, scenario, group_by='Segment')['groups']}
+    assert list(groups) == ['Corporate', 'Retail', None]
+    assert groups['Retail']['avg_rate'] == pytest.approx(2.0 + 1.05)
+    assert groups['Corporate']['avg_rate'] == pytest.approx(4.0 + 0.6)
+    assert groups[None]['avg_rate'] == pytest.approx(0.15)
+
+
+def test_numeric_value_shocks_match_numbers(frame):
+    metrics = evaluate(frame, {'shocks': [{'column': 'Term', 'values': {'2': 100, 'x': 5}}]})['metrics']
+    assert metrics['avg_rate'] == pytest.approx((2.0 + 5.0 + 0.1) / 3)
+
+
+def test_deltas_and_empty_groups(frame):
+    base = evaluate(frame.iloc[:0], {})
+    assert base['metrics']['row_count'] == 0 and base['metrics']['avg_rate'] is None
+    shocked = with_deltas(evaluate(frame, {'bps': 100}), evaluate(frame, {}))
+    assert shocked['delta']['avg_rate'] == pytest.approx(1.0)
+    assert shocked['delta']['total_principal'] == 0
+
+
+@pytest.mark.parametrize('spec, scenarios, message', [
+    ({'rate_column': None}, [{}], 'rate_column is required'),
+    ({'term_column': 'Nope'}, [{}], 'Unknown term_column: Nope'),
+    ({'term_unit': 'weeks'}, [{}], 'term_unit must be one of'),
+    ({}, [], 'scenarios must be a non-empty list'),
+    ({}, [{'bps': 'x'}], 'bps must be a number'),
+    ({}, [{'shocks': [{'column': 'Nope', 'values': {}}]}], 'Unknown shock column: Nope'),
+    ({}, [{'shocks': [{'column': 'Term'}]}], 'needs "values" or "ranges"'),
+])
+def test_invalid_specs(frame, spec, scenarios, message):
+    with pytest.raises(ValueError, match=message):
+        parse_model({**MODEL, **spec}, list(frame.columns))
+        parse_scenarios(scenarios, list(frame.columns))
+
+
+@pytest.mark.parametrize('resident', [False, True])
+def test_scenarios_endpoint(glimpsy, client, upload, frame, resident):
+    dataset_id = upload(frame)
+    if resident:
+        glimpsy.dataset_cache.put_frame(dataset_id, storage.read_frame(dataset_id))
+    body = client.post(f'/api/datasets/{dataset_id}/scenarios', json={
+        **MODEL, 'filters': {'Segment': ['Retail']},
+        'scenarios': [{'name': 'up', 'bps': 100}, {'name': 'same', 'bps': 100}],
+    }).get_json()
+    assert body['row_count'] == 2 and body['original_count'] == 4
+    assert body['base']['metrics']['avg_rate'] == 2.0
+    up, same = body['scenarios']
+    assert (up['name'], up['metrics']['avg_rate'], up['delta']['avg_rate']) == ('up', 3.0, 1.0)
+    assert same['metrics'] == up['metrics']
+
+    response = client.post(f'/api/datasets/{dataset_id}/scenarios', json={**MODEL, 'scenarios': 'x'})
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from indexes import MAX_GRAM_KEY_CHARS, build_indexes
+from search import scan_column, search_mask, search_rows, value_text
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    rows = 600
+    return pd.DataFrame({
+        'Product': rng.choice(['Widget A', 'Widget B', 'Gadget X', 'Ünïcode Ω', 'ab', None], rows),
+        'Amount': rng.choice([1.5, 3.0, 250.0, np.nan], rows),
+        'Units': rng.integers(0, 50, rows),
+        'Date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 40, rows), unit='D'),
+    })
+
+
+@pytest.fixture
+def indexes(frame):
+    return build_indexes(lambda col: frame[col], list(frame.columns))
+
+
+@pytest.mark.parametrize('query', ['w', 'ab', 'get', 'widget a', 'dget x', 'ω', 'ïco', 'zzz', '1.5', '25', '2024-02', '-01-0'])
+def test_indexed_search_equals_scan(frame, indexes, query):
+    columns = list(frame.columns)
+    assert 'grams' in indexes['columns']['Product']
+    expected = np.flatnonzero(search_mask(frame, query, columns))
+    assert search_rows(indexes, frame, query, columns).tolist() == expected.tolist()
+    assert search_rows(None, frame, query, columns).tolist() == expected.tolist()
+
+
+def test_trigrams_in_the_wrong_order_do_not_match():
+    df = pd.DataFrame({'Name': ['abcab'] * 5 + ['other'] * 45})
+    indexes = build_indexes(lambda col: df[col], ['Name'])
+    assert search_rows(indexes, df, 'bcabc', ['Name']).tolist() == []
+    assert search_rows(indexes, df, 'cab', ['Name']).tolist() == list(range(5))
+
+
+def test_values_as_the_table_shows_them():
+    assert list(value_text(pd.Index([3.0, 1.5, np.nan]))) == ['3', '1.5', 'nan']
+    dates = pd.DatetimeIndex([pd.Timestamp('2024-01-02'), pd.Timestamp('2024-01-02 10:30')])
+    assert list(value_text(dates)) == ['2024-01-02', '2024-01-02 10:30:00']
+    assert scan_column(pd.Series([3.0, 30.5]), '3.0').tolist() == [False, False]
+    # Text that can't be part of a number or a date skips those columns
+    assert not scan_column(pd.Series([1, 2]), 'x').any()
+
+
+def test_long_values_are_scanned(frame):
+    long = frame.assign(Notes=np.where(np.arange(len(frame)) % 100 == 0, 'x' * MAX_GRAM_KEY_CHARS + 'needle', 'n'))
+    indexes = build_indexes(lambda col: long[col], list(long.columns))
+    assert 'grams' not in indexes['columns']['Notes']
+    assert search_rows(indexes, long, 'needle', list(long.columns)).tolist() == list(range(0, len(long), 100))
+
+
+def test_search_endpoint(glimpsy, client, upload, frame):
+    dataset_id = upload(frame)
+    glimpsy.index_dataset(dataset_id)
+    body = client.get(f'/api/datasets/{dataset_id}/search?q=WIDGET&limit=5').get_json()
+    assert body['query'] == 'widget' and body['original_count'] == len(frame)
+    assert body['total_count'] == int(frame['Product'].str.startswith('Widget').sum())
+    assert len(body['data']) == 5 and all('Widget' in row['Product'] for row in body['data'])
+
+    assert client.get(f'/api/datasets/{dataset_id}/search?q=%20').status_code == 400
@@ -0,0 +1,91 @@
+import io
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+import shared
+import storage
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    amount = rng.uniform(0, 100, 1000)
+    amount[::7] = np.nan
+    return pd.DataFrame({
+        'id': np.arange(1000),
+        'amount': amount,
+        'region': rng.choice(['n', 's', 'e'], 1000),
+    })
+
+
+@pytest.fixture
+def stored(workdir, frame, monkeypatch):
+    """Dataset 1 split over two parts and several read batches, with a deleted row"""
+    monkeypatch.setattr(shared, 'SHARED_BATCH_ROWS', 128)
+    storage.write_frame(1, frame.iloc[:600])
+    staged = storage.staging_path()
+    frame.iloc[600:].to_parquet(staged, index=False)
+    storage.commit_part(staged, 1)
+    storage.write_deleted(storage.dataset_path(1), np.array([3]))
+    return frame.drop(index=3).reset_index(drop=True)
+
+
+def mapped_ranges(path):
+    """Address ranges of this process mapped from path"""
+    ranges = []
+    with open('/proc/self/maps') as maps:
+        for line in maps:
+            if line.rstrip().endswith(os.path.abspath(path)):
+                start, stop = line.split()[0].split('-')
+                ranges.append((int(start, 16), int(stop, 16)))
+    return ranges
+
+
+def test_file_holds_one_chunk_per_column(stored):
+    shared.write_shared(1)
+    reader = pa.ipc.open_file(pa.memory_map(shared.shared_path(1)))
+    assert reader.num_record_batches == 1
+    assert reader.get_batch(0).num_rows == len(stored)
+    # No scratch files are left behind
+    assert [name for name in os.listdir('store') if name.startswith('1.arrow')] == ['1.arrow']
+
+
+def test_mapped_frame_matches_storage(stored):
+    signature = shared.write_shared(1)
+    df = shared.map_frame(1, signature)
+    pd.testing.assert_frame_equal(df.astype({'region': object}), stored)
+    assert df['region'].dtype == pd.StringDtype('pyarrow')
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason='needs /proc')
+def test_numeric_columns_point_into_the_mapping(stored):
+    df = shared.map_frame(1, shared.write_shared(1))
+    ranges = mapped_ranges(shared.shared_path(1))
+    assert ranges
+    for name in ('id', 'amount'):
+        address = df[name].to_numpy().__array_interface__['data'][0]
+        assert any(start <= address < stop for start, stop in ranges), name
+
+
+def test_stale_file_is_rewritten(stored):
+    signature = shared.write_shared(1)
+    storage.write_deleted(storage.dataset_path(1), np.array([3, 4]))
+    assert shared.map_frame(1, storage.layout_signature(1)) is None
+    df = shared.load_shared_frame(1, storage.layout_signature(1))
+    assert len(df) == len(stored) - 1
+    assert storage.layout_signature(1) != signature
+
+
+def test_appends_refresh_the_shared_file(glimpsy, client, upload, frame, monkeypatch):
+    monkeypatch.setitem(glimpsy.app.config, 'SHARED_FRAMES', True)
+    dataset_id = upload(frame)
+    assert client.get(f'/api/datasets/{dataset_id}?limit=1').get_json()['total_count'] == 1000
+    assert os.path.exists(shared.shared_path(dataset_id))
+
+    body = io.BytesIO(frame.head(5).to_csv(index=False).encode())
+    client.post(f'/api/datasets/{dataset_id}/append', data={'file': (body, 'delta.csv')})
+    df = shared.map_frame(dataset_id, storage.layout_signature(dataset_id))
+    assert df is not None and len(df) == 1005
+    assert client.get(f'/api/datasets/{dataset_id}?limit=1').get_json()['total_count'] == 1005
@@ -0,0 +1,68 @@
+import os
+import json
+import sqlite3
+import pandas as pd
+import pandas.testing as tm
+import storage
+
+
+def test_write_and_read_frame_keeps_types(workdir):
+    df = pd.DataFrame({
+        'id': [1, 2, 3],
+        'amount': [1.5, None, 3.25],
+        'name': ['a', 'b', None],
+        'active': [True, False, True],
+        'created': pd.to_datetime(['2024-01-01', '2024-02-01', '2024-03-01']),
+    })
+    storage.write_frame(7, df)
+    tm.assert_frame_equal(storage.read_frame(7), df)
+    tm.assert_frame_equal(storage.read_frame(7, columns=['name', 'id']), df[['name', 'id']])
+
+
+def test_mixed_object_columns_are_stored_as_text(workdir):
+    df = pd.DataFrame({'mixed': [1, 'two', None]})
+    storage.write_frame(1, df)
+    assert storage.read_frame(1)['mixed'].tolist() == ['1', 'two', None]
+
+
+def test_upload_stores_rows_in_parquet_not_records(glimpsy, client, upload):
+    df = pd.DataFrame({'region': ['north', 'south'], 'sales': [10, 20]})
+    dataset_id = upload(df)
+
+    assert os.path.exists(storage.dataset_path(dataset_id))
+    conn = glimpsy.get_db_connection()
+    assert conn.execute('SELECT COUNT(*) FROM dataset_records').fetchone()[0] == 0
+    dataset = conn.execute('SELECT * FROM datasets WHERE id = ?', (dataset_id,)).fetchone()
+    conn.close()
+    assert dataset['storage_format'] == 'parquet'
+    assert json.loads(dataset['column_types']) == {'region': 'object', 'sales': 'int64'}
+
+    body = client.get(f'/api/datasets/{dataset_id}').get_json()
+    assert body['data'] == [{'region': 'north', 'sales': 10}, {'region': 'south', 'sales': 20}]
+
+
+def test_delete_removes_stored_files(client, upload):
+    dataset_id = upload(pd.DataFrame({'x': [1, 2]}))
+    assert client.delete(f'/api/datasets/{dataset_id}').status_code == 200
+    assert not [name for name in os.listdir('store') if name.startswith(f'{dataset_id}.')]
+    assert client.get(f'/api/datasets/{dataset_id}').status_code == 404
+
+
+def test_legacy_json_datasets_are_migrated(glimpsy):
+    conn = sqlite3.connect('glimpsy.db')
+    conn.execute('''
+        INSERT INTO datasets (name, filename, file_path, file_type, columns, row_count, storage_format)
+        VALUES ('legacy', 'legacy.csv', 'uploads/legacy.csv', 'csv', ?, 2, 'json')
+    ''', (json.dumps(['city', 'population']),))
+    for record in ({'city': 'Oslo', 'population': 700000}, {'city': 'Bergen', 'population': 290000}):
+        conn.execute('INSERT INTO dataset_records (dataset_id, record_data) VALUES (1, ?)', (json.dumps(record),))
+    conn.commit()
+    conn.row_factory = sqlite3.Row
+
+    assert storage.migrate_json_datasets(conn) == 1
+    dataset = conn.execute('SELECT storage_format, row_count FROM datasets WHERE id = 1').fetchone()
+    assert tuple(dataset) == ('parquet', 2)
+    assert conn.execute('SELECT COUNT(*) FROM dataset_records').fetchone()[0] == 0
+    conn.close()
+    tm.assert_frame_equal(storage.read_frame(1),
+                          pd.DataFrame({'city': ['Oslo', 'Bergen'], 'population': [700000, 290000]}))